@@ -33,31 +33,95 @@ openfrescopy.dll functionality.
 
 Usage:
     import openfrescopy as opf
+
+Set OPENFRESCOPY_LAZY=1 before the first import to defer loading the
+compiled extensions until the first command is used, and call
+opf.startup_report() to see how long each loading step took.
 """
 
-# Import from the openfresco submodule, which contains the compiled
-# OpenFrescoPy.pyd and DLLs. The submodule handles its own DLL path setup.
-try:
-    from . import openfresco as _openfresco_module
-    _core = _openfresco_module
-except Exception as e:
-    # Store error for debugging if needed, but don't fail the package import
-    _import_error = e
-    _core = None
+import os as _os
+
+from ._loader import LAZY as _LAZY
+from ._loader import phase as _phase
+from ._loader import startup_report, startup_timings
+
+_core = None
+_loaded = False
+
+
+def _load():
+    """Import the openfresco submodule once and return it (or None)."""
+    global _core, _loaded, _import_error
+    if _loaded:
+        return _core
+    _loaded = True
+
+    # Import from the openfresco submodule, which contains the compiled
+    # OpenFrescoPy.pyd and DLLs. The submodule handles its own DLL path setup.
+    try:
+        from . import openfresco as _openfresco_module
+        _core = _openfresco_module
+        if _core._load() is None:
+            _import_error = _core._import_error
+            _core = None
+    except Exception as e:
+        # Store error for debugging if needed, but don't fail the package import
+        _import_error = e
+        _core = None
+    return _core
+
+
+def __getattr__(name):
+    # Resolve OpenFrescoPy commands on first access and cache them here.
+    # Submodules (opensees, openfresco, ...) are found by the import system
+    # and must not trigger loading the core extension when probed.
+    if name.startswith('_') and name != '__all__':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    here = _os.path.dirname(__file__)
+    if (_os.path.isdir(_os.path.join(here, name)) or
+            _os.path.isfile(_os.path.join(here, name + '.py'))):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    core = _load()
+    if core is None:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r} (OpenFrescoPy "
+            f"could not be imported: {globals().get('_import_error')})")
+    if name == '__all__':
+        return ['startup_report', 'startup_timings'] + [
+            n for n in dir(core._core) if not n.startswith('_')]
+    with _phase('openfrescopy', 'export'):
+        try:
+            value = getattr(core, name)
+        except AttributeError:
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}") from None
+        globals()[name] = value
+    return value
+
+
+def __dir__():
+    names = set(globals())
+    core = _load()
+    if core is not None:
+        names.update(n for n in dir(core._core) if not n.startswith('_'))
+    return sorted(names)
+
 
 # If the core module was successfully imported, expose its public API.
 # This allows users to import directly from the package instead of the
 # internal module. Example: from openfrescopy import function_name
-if _core is not None:
-    # Get the set of names already in this module's namespace (to avoid
-    # exposing imports like Path, os, sys, etc.)
-    _existing_names = set(globals().keys())
-    
-    # Iterate through all attributes in the core module
-    for _name in dir(_core):
-        # Only expose public attributes (those not starting with underscore)
-        # and exclude names that are already in this module's namespace
-        if (not _name.startswith('_') and 
-            _name not in _existing_names):
-            # Add each public attribute to this module's global namespace
-            globals()[_name] = getattr(_core, _name)
\ No newline at end of file
+# In lazy mode this is skipped and __getattr__ resolves names on first use.
+if not _LAZY and _load() is not None:
+    with _phase('openfrescopy', 'export'):
+        # Get the set of names already in this module's namespace (to avoid
+        # exposing imports like Path, os, sys, etc.)
+        _existing_names = set(globals().keys())
+
+        # Iterate through all attributes in the core module
+        for _name in dir(_core):
+            # Only expose public attributes (those not starting with underscore)
+            # and exclude names that are already in this module's namespace
+            if (not _name.startswith('_') and 
+                _name not in _existing_names):
+                # Add each public attribute to this module's global namespace
+                globals()[_name] = getattr(_core, _name)
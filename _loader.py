@@ -0,0 +1,91 @@
+# openfrescopy/_loader.py
+"""
+Lazy-loading switch and import-time profile shared by the package loaders.
+
+By default the openfresco and opensees submodules import their compiled
+extensions and export every command when they are imported. Setting the
+environment variable OPENFRESCOPY_LAZY=1 before the first import defers all
+of that work to the first command that is actually used, and each command is
+then resolved and cached on first access. This keeps short-lived worker
+processes that never touch a given extension from paying for it.
+
+Every loader step (path setup, extension import, loadPackage, export) is
+timed here, and startup_report() summarizes those timings.
+
+Usage:
+    import openfrescopy as opf
+    print(opf.startup_report())
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+# Defer loading the compiled extensions until the first command is used
+LAZY = os.environ.get('OPENFRESCOPY_LAZY', '').strip().lower() not in (
+    '', '0', 'false', 'no', 'off')
+
+# Which OpenSees implementation openfrescopy.opensees uses: 'native' (the
+# compiled opensees.pyd with OpenFrescoPy), 'python' (the NumPy stand-in in
+# openfrescopy.pysim) or 'auto' (native if it loads, python otherwise)
+BACKEND = os.environ.get('OPENFRESCOPY_BACKEND', 'auto').strip().lower()
+if BACKEND not in ('auto', 'native', 'python'):
+    BACKEND = 'auto'
+
+# Accumulated loader timings: {module: {phase: [seconds, count]}}
+_timings = {}
+
+
+def record(module, name, seconds):
+    """Add the duration of one loader phase to the import-time profile."""
+    phases = _timings.setdefault(module, {})
+    entry = phases.setdefault(name, [0.0, 0])
+    entry[0] += seconds
+    entry[1] += 1
+
+
+@contextmanager
+def phase(module, name):
+    """Time the enclosed block as one loader phase of the given module."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(module, name, time.perf_counter() - start)
+
+
+def startup_timings():
+    """
+    Return the import-time profile as {module: {phase: seconds}}.
+
+    In lazy mode the 'export' phase is the total time spent resolving
+    commands on first access, accumulated over all resolved names.
+    """
+    return {module: {name: entry[0] for name, entry in phases.items()}
+            for module, phases in _timings.items()}
+
+
+def startup_report():
+    """
+    Return a printable summary of how long each loader phase took.
+
+    The report lists, per module, the time spent setting up the DLL search
+    paths, importing the compiled extension, loading the OpenFrescoPy package
+    into OpenSees and exporting the commands into the module namespace.
+    Phases that have not run yet (e.g. in lazy mode before the first command)
+    are not listed.
+    """
+    mode = 'lazy' if LAZY else 'eager'
+    lines = [f'openfrescopy startup ({mode} mode)',
+             '{:<14}{:<20}{:>12}{:>8}'.format(
+                 'module', 'phase', 'time [ms]', 'calls')]
+    total = 0.0
+    for module, phases in _timings.items():
+        for name, (seconds, count) in phases.items():
+            total += seconds
+            lines.append('{:<14}{:<20}{:>12.3f}{:>8d}'.format(
+                module, name, 1000.0*seconds, count))
+    if len(lines) == 2:
+        lines.append('(no extension has been loaded yet)')
+    lines.append('{:<34}{:>12.3f}'.format('total', 1000.0*total))
+    return '\n'.join(lines)
@@ -0,0 +1,30 @@
+# openfrescopy/benchmarks/__init__.py
+"""
+Performance benchmarks for openfrescopy.
+
+The suite scales the OneBayFrame example up to a configurable number of
+frame copies and measures:
+
+    import     cold import time of openfrescopy and openfrescopy.opensees
+               (including loading the backend), median over fresh processes
+    model      model build time, analysis steps per second and the memory
+               high-water mark after import, build and run
+    recorders  write and read throughput of the text and binary recorders
+
+against the native backend, or against the Python stand-in backend when the
+Windows binaries are absent ('auto'). Results are JSON files that record
+the interpreter, platform and revision they were measured with and can be
+compared between runs, e.g. across the py310-py314 builds:
+
+    python -m openfrescopy.benchmarks run --sizes 1 10 100 -o base.json
+    python -m openfrescopy.benchmarks run --sizes 1 10 100 -o new.json
+    python -m openfrescopy.benchmarks compare base.json new.json
+
+compare exits with status 1 if any metric got worse by more than the
+threshold (10% by default).
+"""
+
+from .compare import compare, report
+from .suite import SCHEMA, load, run_suite, save
+
+__all__ = ['SCHEMA', 'compare', 'load', 'report', 'run_suite', 'save']
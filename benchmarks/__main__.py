@@ -0,0 +1,60 @@
+# openfrescopy/benchmarks/__main__.py
+"""Command line interface of the benchmark suite (see the package doc)."""
+
+import argparse
+import json
+import sys
+
+from .compare import compare, report
+from .suite import load, run_suite, save
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m openfrescopy.benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='run the benchmarks')
+    run.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100],
+                     help='numbers of one bay frame copies')
+    run.add_argument('--steps', type=int, default=500,
+                     help='analysis steps per model run')
+    run.add_argument('--backends', nargs='+', default=['auto'],
+                     choices=['auto', 'native', 'python'])
+    run.add_argument('--import-repeat', type=int, default=5)
+    run.add_argument('--recorder-rows', type=int, default=2000)
+    run.add_argument('--only', nargs='+', default=None,
+                     choices=['import', 'model', 'recorders'])
+    run.add_argument('-o', '--output', default=None,
+                     help='write the results to this JSON file '
+                          '(default: standard output)')
+
+    cmp = commands.add_parser('compare', help='compare two result files')
+    cmp.add_argument('base')
+    cmp.add_argument('new')
+    cmp.add_argument('--threshold', type=float, default=0.10,
+                     help='relative change that counts (default 0.10)')
+    cmp.add_argument('--json', action='store_true',
+                     help='print the comparison as JSON')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        log = (lambda text: print(text, file=sys.stderr, flush=True))
+        results = run_suite(args.sizes, args.steps, args.backends,
+                            args.import_repeat, args.recorder_rows,
+                            benchmarks=args.only, log=log)
+        if args.output:
+            save(results, args.output)
+        else:
+            print(json.dumps(results, indent=2))
+        return 0
+
+    rows = compare(load(args.base), load(args.new), args.threshold)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(report(rows))
+    return 1 if any(r['change'] == 'worse' for r in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# openfrescopy/benchmarks/_worker.py
+"""
+Benchmark tasks, each run in a fresh process by openfrescopy.benchmarks.
+
+    python -m openfrescopy.benchmarks._worker <task> '<json options>'
+
+prints one JSON object with the measurements on its last line. The backend
+is selected by OPENFRESCOPY_BACKEND in the environment of the process.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def peak_rss_mb():
+    """High-water mark of the resident set size of this process in MB."""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD),
+                        ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(),
+            ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize/2.0**20
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak/2.0**20 if sys.platform == 'darwin' else peak/2.0**10
+
+
+def model(copies, steps):
+    """Build time, step throughput and memory of the scaled model."""
+    import openfrescopy.opensees as ops
+
+    from .model import DT, build
+
+    backend = _backend(ops)
+    rss_import = peak_rss_mb()
+    t0 = time.perf_counter()
+    build(ops, copies)
+    # Let the first step pay for the lazy setup of the analysis, as any
+    # run does, but keep it out of the throughput
+    status = ops.analyze(1, DT)
+    t1 = time.perf_counter()
+    rss_build = peak_rss_mb()
+    # Count the steps that converged, so a failed run does not report the
+    # rate of steps it never took
+    done = 0
+    while status == 0 and done < steps:
+        status = ops.analyze(1, DT)
+        if status == 0:
+            done += 1
+    t2 = time.perf_counter()
+    result = {
+        'backend': backend,
+        'status': status,
+        'steps': done,
+        'nodes': 4*copies,
+        'elements': 3*copies,
+        'metrics': {
+            'build_s': t1 - t0,
+            'steps_per_s': done/(t2 - t1) if t2 > t1 else 0.0,
+            'rss_import_mb': rss_import,
+            'rss_build_mb': rss_build,
+            'rss_peak_mb': peak_rss_mb(),
+        },
+    }
+    ops.wipeExp()
+    ops.wipe()
+    return result
+
+
+def recorders(copies, steps, fmt):
+    """Write and read throughput of the text or binary recorders."""
+    import numpy as np
+
+    import openfrescopy.opensees as ops
+    from openfrescopy.recorders import open_recording
+
+    from .model import DT, build, recorder_args
+
+    backend = _backend(ops)
+    build(ops, copies)
+    for i in range(10):
+        ops.analyze(1, DT)
+    folder = tempfile.mkdtemp(prefix='ofp-bench-')
+    try:
+        suffix = '.out' if fmt == 'text' else '.bin'
+        args = recorder_args(copies, os.path.join(folder, fmt), suffix)
+        paths = [a[2] for a in args]
+        # record() samples the current state without analyzing, so only
+        # the recorders are timed; closing them includes the final flush
+        t0 = time.perf_counter()
+        if fmt == 'text':
+            for a in args:
+                ops.recorder(*a)
+            for i in range(steps):
+                ops.record()
+            ops.remove('recorders')
+        else:
+            recs = [ops.binary_recorder(*a) for a in args]
+            for i in range(steps):
+                ops.record()
+            for rec in recs:
+                ops.remove_binary_recorder(rec)
+        t1 = time.perf_counter()
+        size = sum(os.path.getsize(p) for p in paths)
+        values = 0
+        for path in paths:
+            if fmt == 'text':
+                data = np.loadtxt(path, ndmin=2)
+            else:
+                data = np.array(open_recording(path).data)
+            values += data.size
+        t2 = time.perf_counter()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+        ops.wipeExp()
+        ops.wipe()
+    mb = size/2.0**20
+    return {
+        'backend': backend,
+        'rows': steps,
+        'values': values,
+        'bytes': size,
+        'metrics': {
+            'write_mb_s': mb/(t1 - t0),
+            'read_mb_s': mb/(t2 - t1),
+            'write_rows_s': steps/(t1 - t0),
+            'read_values_s': values/(t2 - t1),
+        },
+    }
+
+
+def _backend(ops):
+    backend = ops.backend()
+    if backend is None:
+        raise SystemExit('openfrescopy.opensees: no backend could be loaded')
+    return backend
+
+
+TASKS = {'model': model, 'recorders': recorders}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    task, options = argv[0], json.loads(argv[1]) if len(argv) > 1 else {}
+    print(json.dumps(TASKS[task](**options)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# openfrescopy/benchmarks/compare.py
+"""
+Compare two benchmark result files.
+
+Metrics are matched by benchmark id and name. Whether a change is a
+regression depends on the metric: times and memory should go down,
+throughputs up. A change counts only when it exceeds the relative
+threshold, which should be above the run-to-run noise of the machine.
+"""
+
+# Metric name suffix -> True if larger values are better
+_HIGHER_IS_BETTER = (('_per_s', True), ('_mb_s', True), ('_rows_s', True),
+                     ('_values_s', True), ('_mb', False), ('_s', False))
+
+
+def higher_is_better(metric):
+    for suffix, higher in _HIGHER_IS_BETTER:
+        if metric.endswith(suffix):
+            return higher
+    raise ValueError(f'unknown metric {metric!r}')
+
+
+def compare(base, new, threshold=0.10):
+    """
+    Return the rows of a comparison of two results dicts.
+
+    Each row is a dict with the benchmark 'id', the 'metric', the 'base'
+    and 'new' values, their 'ratio' (new/base) and the 'change': 'better',
+    'worse' or 'same' (within threshold). Benchmarks missing from either
+    side, or without metrics, are left out.
+    """
+    old = {r['id']: r for r in base['results'] if 'metrics' in r}
+    rows = []
+    for entry in new['results']:
+        before = old.get(entry['id'])
+        if before is None or 'metrics' not in entry:
+            continue
+        for metric, value in entry['metrics'].items():
+            reference = before['metrics'].get(metric)
+            if reference is None:
+                continue
+            ratio = value/reference if reference else float('inf')
+            higher = higher_is_better(metric)
+            change = 'same'
+            if ratio > 1.0 + threshold:
+                change = 'better' if higher else 'worse'
+            elif ratio < 1.0/(1.0 + threshold):
+                change = 'worse' if higher else 'better'
+            rows.append({'id': entry['id'], 'metric': metric,
+                         'base': reference, 'new': value, 'ratio': ratio,
+                         'change': change})
+    return rows
+
+
+def report(rows):
+    """Format comparison rows as a text table."""
+    width = max([len(r['id']) for r in rows] + [9]) + 2
+    lines = ['{:<{w}}{:<20}{:>12}{:>12}{:>8}  {}'.format(
+        'benchmark', 'metric', 'base', 'new', 'ratio', 'change', w=width)]
+    for r in rows:
+        lines.append('{:<{w}}{:<20}{:>12.4g}{:>12.4g}{:>8.2f}  {}'.format(
+            r['id'], r['metric'], r['base'], r['new'], r['ratio'],
+            '' if r['change'] == 'same' else r['change'], w=width))
+    return '\n'.join(lines)
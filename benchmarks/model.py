@@ -0,0 +1,97 @@
+# openfrescopy/benchmarks/model.py
+"""
+Scaled-up OneBayFrame model for the benchmarks.
+
+build() creates `copies` independent copies of the one bay frame of
+examples/OneBayFrame/OpenSees/OneBayFrame_Local.py: per copy 4 nodes, two
+experimental twoNodeLink columns with SimUniaxialMaterials controls (Steel02
+and Elastic) and a truss beam. All copies share one ground motion, by
+default a synthetic record shipped with the package so the benchmarks do
+not depend on the example files. The OneBayFrame_Benchmark.py example
+builds the same model with the El Centro record of the examples instead.
+"""
+
+import numpy as np
+
+# Analysis time step of the example
+DT = 20.0/1024.0
+# Sampling interval of the ground motion
+GM_DT = 0.02
+
+
+def ground_motion(duration=40.0):
+    """Return a deterministic El Centro-like acceleration record in g."""
+    t = np.arange(0.0, duration, GM_DT)
+    envelope = np.minimum(t/2.0, 1.0)*np.exp(-np.maximum(t - 10.0, 0.0)/8.0)
+    accel = (0.20*np.sin(2.0*np.pi*1.6*t) + 0.12*np.sin(2.0*np.pi*3.1*t) +
+             0.06*np.sin(2.0*np.pi*6.7*t + 0.4))
+    return envelope*accel
+
+
+def build(ops, copies, record=None):
+    """
+    Build `copies` one bay frames and the transient analysis.
+
+    record is an optional file of ground accelerations in g, sampled at
+    GM_DT, used instead of ground_motion().
+    """
+    ops.wipe()
+    ops.model('BasicBuilder', '-ndm', 2, '-ndf', 2)
+    ops.uniaxialMaterial('Steel02', 1, 1.5, 2.8, 0.01, 18.5, 0.925, 0.15,
+                         0.0, 1.0, 0.0, 1.0)
+    ops.uniaxialMaterial('Elastic', 2, 5.6)
+    ops.uniaxialMaterial('Elastic', 3, 2.0*100.0/1.0)
+    for c in range(copies):
+        n, e = 4*c, 3*c
+        ops.node(n + 1, 0.0, 0.0)
+        ops.node(n + 2, 100.0, 0.0)
+        ops.node(n + 3, 0.0, 54.0, '-mass', 0.04, 0.04)
+        ops.node(n + 4, 100.0, 54.0, '-mass', 0.02, 0.02)
+        ops.fix(n + 1, 1, 1)
+        ops.fix(n + 2, 1, 1)
+        ops.fix(n + 3, 0, 1)
+        ops.fix(n + 4, 0, 1)
+        for k, mat in ((1, 1), (2, 2)):
+            tag = 2*c + k
+            ops.expControl('SimUniaxialMaterials', tag, mat)
+            ops.expSetup('OneActuator', tag, '-control', tag, 1,
+                         '-sizeTrialOut', 1, 1)
+            ops.expSite('LocalSite', tag, tag)
+        ops.expElement('twoNodeLink', e + 1, n + 1, n + 3, '-dir', 2,
+                       '-site', 2*c + 1, '-initStif', 2.8)
+        ops.expElement('twoNodeLink', e + 2, n + 2, n + 4, '-dir', 2,
+                       '-site', 2*c + 2, '-initStif', 5.6)
+        ops.element('truss', e + 3, n + 3, n + 4, 1.0, 3)
+    if record is None:
+        ops.timeSeries('Path', 1, '-dt', GM_DT, '-values',
+                       *ground_motion().tolist(), '-factor', 386.1)
+    else:
+        ops.timeSeries('Path', 1, '-filePath', str(record), '-dt', GM_DT,
+                       '-factor', 386.1)
+    ops.pattern('UniformExcitation', 1, 1, '-accel', 1)
+    ops.rayleigh(1.010017396536, 0.0, 0.0, 0.0)
+    ops.system('BandGeneral')
+    ops.numberer('Plain')
+    ops.constraints('Plain')
+    ops.test('EnergyIncr', 1.0e-6, 10)
+    ops.integrator('NewmarkExplicit', 0.5)
+    ops.algorithm('Linear')
+    ops.analysis('Transient')
+
+
+def recorder_args(copies, stem, suffix):
+    """
+    Arguments of the recorders used by the recorder benchmark.
+
+    Returns the argument tuples of recorder(): the displacement of the top
+    nodes and the measured displacement of the experimental columns of
+    every copy.
+    """
+    top = [4*c + k for c in range(copies) for k in (3, 4)]
+    columns = [3*c + k for c in range(copies) for k in (1, 2)]
+    return [
+        ('Node', '-file', f'{stem}_disp{suffix}', '-time', '-node', *top,
+         '-dof', 1, 'disp'),
+        ('Element', '-file', f'{stem}_daq{suffix}', '-time', '-ele',
+         *columns, 'daqDisp'),
+    ]
@@ -0,0 +1,201 @@
+# openfrescopy/benchmarks/suite.py
+"""
+Run the benchmark suite and collect machine-readable results.
+
+Every measurement runs in a fresh interpreter so that imports are cold and
+the memory high-water marks belong to that measurement alone. The results
+are a JSON-serializable dict:
+
+    {'schema': 1,
+     'meta': {python, platform, machine, openfrescopy version, git, ...},
+     'results': [{'id': 'model/python/copies=10', 'benchmark': 'model',
+                  'backend': 'python', 'params': {...},
+                  'metrics': {'build_s': ..., 'steps_per_s': ..., ...}},
+                 ...]}
+
+A benchmark that cannot run (e.g. the native backend without the Windows
+binaries) is listed with an 'error' and no metrics.
+"""
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+SCHEMA = 1
+
+# Cold import timing; run with `python -c`, so that nothing of openfrescopy
+# is imported before the clock starts
+IMPORT_SNIPPET = '''
+import json, time
+t0 = time.perf_counter()
+import openfrescopy
+t1 = time.perf_counter()
+import openfrescopy.opensees as ops
+backend = ops.backend()
+t2 = time.perf_counter()
+if backend is None:
+    raise SystemExit('openfrescopy.opensees: no backend could be loaded')
+print(json.dumps({'backend': backend, 'openfrescopy_s': t1 - t0,
+                  'opensees_s': t2 - t1,
+                  'phases': openfrescopy.startup_timings()}))
+'''
+
+
+def _run(args, backend, timeout):
+    """Run a worker process; return (result dict, None) or (None, error)."""
+    env = dict(os.environ, OPENFRESCOPY_BACKEND=backend)
+    try:
+        proc = subprocess.run([sys.executable] + args, env=env,
+                              capture_output=True, text=True,
+                              timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, f'timed out after {timeout} s'
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return None, lines[-1] if lines else f'exit code {proc.returncode}'
+    return json.loads(proc.stdout.strip().splitlines()[-1]), None
+
+
+def _task(task, backend, timeout, **options):
+    return _run(['-m', f'{__package__}._worker', task, json.dumps(options)],
+                backend, timeout)
+
+
+def _entry(benchmark, backend, params, result, error):
+    actual = result.pop('backend', backend) if result else backend
+    key = '/'.join([benchmark, actual] +
+                   [f'{k}={v}' for k, v in params.items()])
+    entry = {'id': key, 'benchmark': benchmark, 'backend': actual,
+             'params': params}
+    if error is not None:
+        entry['error'] = error
+    else:
+        entry['metrics'] = result.pop('metrics')
+        entry['info'] = result
+    return entry
+
+
+def bench_import(backend, repeat=5, timeout=120.0):
+    """Median and minimum cold import times over `repeat` processes."""
+    runs = []
+    for i in range(repeat):
+        result, error = _run(['-c', IMPORT_SNIPPET], backend, timeout)
+        if error is not None:
+            return _entry('import', backend, {}, None, error)
+        runs.append(result)
+    metrics = {}
+    for name in ('openfrescopy_s', 'opensees_s'):
+        values = [r[name] for r in runs]
+        metrics[name] = statistics.median(values)
+        metrics[name[:-2] + '_min_s'] = min(values)
+    result = {'backend': runs[0]['backend'], 'metrics': metrics,
+              'repeat': repeat, 'phases': runs[-1]['phases']}
+    return _entry('import', backend, {}, result, None)
+
+
+def bench_model(backend, copies, steps, timeout=600.0):
+    result, error = _task('model', backend, timeout, copies=copies,
+                          steps=steps)
+    return _entry('model', backend, {'copies': copies, 'steps': steps},
+                  result, error)
+
+
+def bench_recorders(backend, copies, rows, fmt, timeout=600.0):
+    result, error = _task('recorders', backend, timeout, copies=copies,
+                          steps=rows, fmt=fmt)
+    return _entry('recorders', backend,
+                  {'format': fmt, 'copies': copies, 'rows': rows},
+                  result, error)
+
+
+def _git_revision():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        proc = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here,
+                              capture_output=True, text=True, timeout=10.0)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return proc.stdout.strip() or None
+
+
+def metadata():
+    """Where and with what the results were measured."""
+    try:
+        from importlib.metadata import version
+        package = version('openfrescopy')
+    except Exception:
+        package = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(
+            timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'openfrescopy': package,
+        'git': _git_revision(),
+        'lazy': os.environ.get('OPENFRESCOPY_LAZY', ''),
+    }
+
+
+def run_suite(sizes=(1, 10, 100), steps=500, backends=('auto',),
+              import_repeat=5, recorder_rows=2000,
+              formats=('text', 'binary'), benchmarks=None, log=None):
+    """
+    Run the benchmarks and return the results dict.
+
+    Args:
+        sizes: numbers of one bay frame copies
+        steps: analysis steps per model run
+        backends: 'auto' (native if available, else python), 'native' or
+            'python'; each is listed under the backend that actually ran
+        import_repeat: cold import runs per backend
+        recorder_rows: rows written per recorder run
+        formats: recorder formats ('text', 'binary')
+        benchmarks: subset of 'import', 'model', 'recorders' (default: all)
+        log: function called with a line of progress text
+    """
+    benchmarks = set(benchmarks or ('import', 'model', 'recorders'))
+    log = log or (lambda text: None)
+    results = []
+
+    def add(entry):
+        results.append(entry)
+        if 'error' in entry:
+            log(f'{entry["id"]}: {entry["error"]}')
+        else:
+            log(f'{entry["id"]}: ' + ', '.join(
+                f'{k}={v:.4g}' for k, v in entry['metrics'].items()))
+
+    for backend in backends:
+        if 'import' in benchmarks:
+            add(bench_import(backend, import_repeat))
+        if 'model' in benchmarks:
+            for copies in sizes:
+                add(bench_model(backend, copies, steps))
+        if 'recorders' in benchmarks:
+            for copies in sizes:
+                for fmt in formats:
+                    add(bench_recorders(backend, copies, recorder_rows, fmt))
+    return {'schema': SCHEMA, 'meta': metadata(), 'results': results}
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+        f.write('\n')
+
+
+def load(path):
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('schema') != SCHEMA:
+        raise ValueError(f'{path}: unsupported results schema '
+                         f'{results.get("schema")}')
+    return results
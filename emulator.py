@@ -0,0 +1,451 @@
+# openfrescopy/emulator.py
+"""
+Shared-memory controller emulator for openfrescopy.
+
+The xPCtarget and SCRAMNet experimental controls exchange commands and
+measurements with a real-time predictor-corrector controller through
+reflective memory, so they can only run in the lab. This module emulates
+such a controller in a separate process that shares a mailbox with the
+analysis through multiprocessing.shared_memory and follows the same
+handshake as OpenFresco's ECSCRAMNet:
+
+    analysis                               controller (every tick)
+    write targets, newTarget = 1     -->   latch targets, atTarget = 0,
+                                           switchPC = 1, start ramp
+    wait switchPC == 1, newTarget = 0
+    wait switchPC == 0               <--   switchPC = 0 once newTarget == 0
+    wait atTarget == 1               <--   atTarget = 1 when the command
+    read daqDisp, daqForce                 has reached the targets
+
+The controller runs at a fixed tick rate. The command ramps from the last
+target to the new one over `substeps` ticks and drives a model of the
+actuators: a pure transport delay, servo dynamics (first order with time
+constant tau, or second order with natural frequency wn and damping
+ratio zeta), a linear specimen of the given stiffness, and Gaussian
+sensor noise on the measured displacement and force.
+
+Usage:
+    from openfrescopy import emulator
+
+    with emulator.ControllerEmulator(n_act=1, rate=4096, substeps=8,
+                                     delay=1e-3, tau=2e-3,
+                                     stiffness=[2.8]) as emu:
+        ops.expControlPoint(1, '1', 'disp')
+        ops.expControlPoint(2, '1', 'disp', '1', 'force')
+        ops.expControl('SCRAMNetEmulator', 1, emu.name,
+                       '-trialCP', 1, '-outCP', 2)
+        ...
+
+    python -m openfrescopy.emulator --rate 4096 --name ofp-ctrl
+
+The expControl type is available with the Python backend.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .monitor import _attach
+
+MAGIC = 0x4F46434D      # 'OFCM'
+VERSION = 1
+
+# Header fields (int64 indices)
+(_MAGIC, _VERSION, _N_ACT, _NEW_TARGET, _SWITCH_PC, _AT_TARGET, _STATE,
+ _TICKS, _LATE, _TARGETS) = range(10)
+_HEADER = 16
+
+# Controller states
+STARTING, RUNNING, STOPPING, STOPPED = range(4)
+
+# Mailboxes created in this process, by name
+_created = {}
+
+# Spin waits give up the CPU on every check so that a controller and an
+# analysis sharing one core still make progress
+_yield = getattr(os, 'sched_yield', lambda: time.sleep(0))
+
+
+class Mailbox:
+    """
+    Views of the shared memory block of a controller.
+
+    Attributes:
+        header: int64 flags and counters (see the _* field indices)
+        target: commanded displacement per actuator (written by the analysis)
+        daq_disp, daq_force: measured response (written by the controller)
+        command: current command signal of the controller
+        timing: [last, total, max, calls] of the handshake and of the
+            atTarget wait in seconds (written by the analysis)
+    """
+
+    def __init__(self, shm, owner, shared=False):
+        self.shm = shm
+        self.owner = owner
+        self.shared = shared
+        self.name = shm.name
+        self.header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        if self.header[_MAGIC] != MAGIC:
+            raise ValueError(f'{shm.name}: not a controller mailbox')
+        n = self.n_act = int(self.header[_N_ACT])
+        values = np.ndarray((4, n), dtype=np.float64, buffer=shm.buf,
+                            offset=8*_HEADER)
+        self.target, self.daq_disp, self.daq_force, self.command = values
+        self.timing = np.ndarray((2, 4), dtype=np.float64, buffer=shm.buf,
+                                 offset=8*(_HEADER + 4*n))
+
+    @classmethod
+    def create(cls, n_act, name=None):
+        if name is None:
+            name = f'ofp-ctrl-{os.getpid()}-{os.urandom(4).hex()}'
+        shm = shared_memory.SharedMemory(name=name, create=True,
+                                         size=8*(_HEADER + 4*n_act + 8))
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_VERSION] = VERSION
+        header[_N_ACT] = n_act
+        header[_MAGIC] = MAGIC
+        mailbox = cls(shm, owner=True)
+        _created[mailbox.name] = mailbox
+        return mailbox
+
+    @classmethod
+    def attach(cls, name, track=False):
+        """Attach to a mailbox (see monitor.SharedRing.attach for track)."""
+        mailbox = _created.get(name)
+        if mailbox is not None:
+            # Created in this process: share its mapping
+            return cls(mailbox.shm, owner=False, shared=True)
+        return cls(_attach(name, track), owner=False)
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.header = self.target = self.daq_disp = self.daq_force = None
+        self.command = self.timing = None
+        if self.shared:
+            self.shm = None
+            return
+        self.shm.close()
+        if self.owner:
+            _created.pop(self.name, None)
+            self.shm.unlink()
+        self.shm = None
+
+
+class _Actuators:
+    """Command ramp, transport delay, servo dynamics, specimen and noise."""
+
+    def __init__(self, n_act, rate, substeps, delay, tau, wn, zeta,
+                 stiffness, noise_disp, noise_force, seed):
+        self.dt = 1.0/rate
+        self.substeps = max(1, int(substeps))
+        self.start = np.zeros(n_act)
+        self.goal = np.zeros(n_act)
+        self.step = self.substeps
+        n_delay = int(round(delay*rate))
+        self.line = np.zeros((n_delay + 1, n_act))
+        self.head = 0
+        self.x = np.zeros(n_act)
+        self.v = np.zeros(n_act)
+        self.alpha = 1.0 - np.exp(-self.dt/tau) if tau else 1.0
+        self.wn = wn
+        self.zeta = zeta
+        self.k = np.broadcast_to(np.asarray(stiffness, dtype=float),
+                                 (n_act,)).copy()
+        self.noise_disp = noise_disp
+        self.noise_force = noise_force
+        self.rng = np.random.default_rng(seed)
+
+    def new_target(self, target, command):
+        self.start[:] = command
+        self.goal[:] = target
+        self.step = 0
+
+    @property
+    def at_target(self):
+        return self.step >= self.substeps
+
+    def tick(self, command, daq_disp, daq_force):
+        if self.step < self.substeps:
+            self.step += 1
+            command[:] = self.start + (self.goal - self.start)*(
+                self.step/self.substeps)
+        # Transport delay: the servo sees the command of n_delay ticks ago
+        line = self.line
+        line[self.head] = command
+        self.head = (self.head + 1) % len(line)
+        u = line[self.head]
+        if self.wn:
+            a = self.wn*self.wn*(u - self.x) - 2.0*self.zeta*self.wn*self.v
+            self.v += a*self.dt
+            self.x += self.v*self.dt
+        else:
+            self.x += self.alpha*(u - self.x)
+        n = len(self.x)
+        disp = self.x
+        force = self.k*self.x
+        if self.noise_disp:
+            disp = disp + self.rng.normal(0.0, self.noise_disp, n)
+        if self.noise_force:
+            force = force + self.rng.normal(0.0, self.noise_force, n)
+        daq_disp[:] = disp
+        daq_force[:] = force
+
+
+def run_controller(name, rate=1024.0, substeps=4, delay=0.0, tau=0.0,
+                   wn=None, zeta=0.7, stiffness=1.0, noise_disp=0.0,
+                   noise_force=0.0, seed=None, spin=2.0e-4, track=False):
+    """
+    Run the controller loop on the mailbox `name` until it is stopped.
+
+    Ticks run on a fixed schedule of 1/rate seconds; the last `spin`
+    seconds before a tick are busy-waited, yielding the CPU to the analysis
+    on every check. Ticks that start more than one
+    period late are counted in the mailbox header.
+    """
+    mailbox = Mailbox.attach(name, track)
+    h = mailbox.header
+    act = _Actuators(mailbox.n_act, rate, substeps, delay, tau, wn, zeta,
+                     stiffness, noise_disp, noise_force, seed)
+    period = int(round(1e9/rate))
+    spin = int(spin*1e9)
+    clock = time.perf_counter_ns
+    h[_STATE] = RUNNING
+    next_tick = clock()
+    try:
+        while h[_STATE] == RUNNING:
+            # Handshake with the analysis
+            if h[_NEW_TARGET] == 1 and h[_SWITCH_PC] == 0:
+                act.new_target(mailbox.target, mailbox.command)
+                h[_AT_TARGET] = 0
+                h[_SWITCH_PC] = 1
+                h[_TARGETS] += 1
+            elif h[_SWITCH_PC] == 1 and h[_NEW_TARGET] == 0:
+                h[_SWITCH_PC] = 0
+            act.tick(mailbox.command, mailbox.daq_disp, mailbox.daq_force)
+            if act.at_target and h[_AT_TARGET] == 0 and h[_SWITCH_PC] == 0 \
+                    and h[_TARGETS]:
+                h[_AT_TARGET] = 1
+            h[_TICKS] += 1
+            next_tick += period
+            now = clock()
+            if now > next_tick + period:
+                h[_LATE] += 1
+                next_tick = now
+            elif next_tick - now > spin:
+                time.sleep((next_tick - now - spin)*1e-9)
+            while clock() < next_tick:
+                _yield()
+    finally:
+        h[_STATE] = STOPPED
+        mailbox.close()
+
+
+class ControllerEmulator:
+    """
+    A controller emulator process and its mailbox.
+
+    Args:
+        n_act: number of actuators
+        rate: controller tick rate in Hz
+        substeps: ticks over which the command ramps to a new target
+        delay: transport delay of the actuators in seconds
+        tau: time constant of first-order servo dynamics (0: none)
+        wn, zeta: natural frequency (rad/s) and damping ratio of
+            second-order servo dynamics (used instead of tau if wn is set)
+        stiffness: specimen stiffness per actuator (scalar or list)
+        noise_disp, noise_force: standard deviation of the sensor noise
+        seed: seed of the noise generator
+        name: shared memory name of the mailbox (default: generated)
+        mp_context: multiprocessing start method
+
+    Attributes:
+        name: mailbox name for expControl('SCRAMNetEmulator', tag, name, ...)
+    """
+
+    def __init__(self, n_act=1, rate=1024.0, substeps=4, delay=0.0, tau=0.0,
+                 wn=None, zeta=0.7, stiffness=1.0, noise_disp=0.0,
+                 noise_force=0.0, seed=None, name=None, mp_context=None):
+        self.n_act = int(n_act)
+        self.options = dict(rate=float(rate), substeps=int(substeps),
+                            delay=float(delay), tau=float(tau), wn=wn,
+                            zeta=float(zeta), stiffness=stiffness,
+                            noise_disp=float(noise_disp),
+                            noise_force=float(noise_force), seed=seed)
+        self._name = name
+        self._mp_context = mp_context
+        self.mailbox = None
+        self.process = None
+
+    @property
+    def name(self):
+        return None if self.mailbox is None else self.mailbox.name
+
+    def start(self, timeout=10.0):
+        """Start the controller process and wait until it runs."""
+        self.mailbox = Mailbox.create(self.n_act, self._name)
+        ctx = multiprocessing.get_context(self._mp_context)
+        self.process = ctx.Process(
+            target=run_controller, args=(self.mailbox.name,),
+            kwargs=dict(self.options, track=True), daemon=True,
+            name='openfrescopy-controller')
+        self.process.start()
+        deadline = time.monotonic() + timeout
+        while self.mailbox.header[_STATE] != RUNNING:
+            if not self.process.is_alive() or time.monotonic() > deadline:
+                self.close()
+                raise RuntimeError('the controller emulator did not start')
+            time.sleep(1e-3)
+        return self
+
+    def stats(self):
+        """
+        Return the controller's counters and the analysis-side latencies.
+
+        'ticks', 'late_ticks' and 'targets' are counted by the controller;
+        'handshake' and 'acquire' hold the 'last', 'mean' and 'max' seconds
+        and the number of 'calls' measured by the SCRAMNetEmulator control.
+        """
+        h = self.mailbox.header
+        stats = {'ticks': int(h[_TICKS]), 'late_ticks': int(h[_LATE]),
+                 'targets': int(h[_TARGETS])}
+        for name, (last, total, worst, calls) in zip(
+                ('handshake', 'acquire'), self.mailbox.timing):
+            stats[name] = {'last': last, 'mean': total/calls if calls else 0.0,
+                           'max': worst, 'calls': int(calls)}
+        return stats
+
+    def close(self):
+        """Stop the controller process and remove the mailbox."""
+        if self.process is not None:
+            if self.process.is_alive():
+                self.mailbox.header[_STATE] = STOPPING
+                self.process.join(5.0)
+                if self.process.is_alive():
+                    self.process.terminate()
+            self.process = None
+        if self.mailbox is not None:
+            self.mailbox.close()
+            self.mailbox = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EmulatorControl:
+    """
+    Analysis side of the handshake, with the interface of an expControl.
+
+    Waits spin on the mailbox flags; a wait longer than timeout seconds
+    raises TimeoutError.
+
+    The wall times of the newTarget/switchPC handshake in
+    set_trial_response() and of the atTarget wait in get_daq_response() are
+    accumulated in the mailbox (see ControllerEmulator.stats()).
+    """
+
+    def __init__(self, tag, name, size=None, timeout=10.0):
+        self.tag = tag
+        self.mailbox = Mailbox.attach(name)
+        self.size = self.mailbox.n_act
+        if size is not None and size != self.size:
+            raise ValueError(f'controller mailbox {name} has {self.size} '
+                             f'actuators, not {size}')
+        self.timeout = timeout
+
+    def _wait(self, field, value):
+        h = self.mailbox.header
+        clock = time.perf_counter
+        deadline = None
+        count = 0
+        while h[field] != value:
+            _yield()
+            count += 1
+            if count & 255 == 0:
+                now = clock()
+                if deadline is None:
+                    deadline = now + self.timeout
+                elif now > deadline:
+                    raise TimeoutError(
+                        f'expControl SCRAMNetEmulator {self.tag}: no answer '
+                        f'from the controller {self.mailbox.name}')
+                if h[_STATE] != RUNNING:
+                    raise RuntimeError(
+                        f'expControl SCRAMNetEmulator {self.tag}: the '
+                        f'controller {self.mailbox.name} is not running')
+
+    def _time(self, k, seconds):
+        entry = self.mailbox.timing[k]
+        entry[0] = seconds
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] += 1
+
+    def set_trial_response(self, disp):
+        mailbox = self.mailbox
+        h = mailbox.header
+        t0 = time.perf_counter()
+        mailbox.target[:] = disp
+        h[_NEW_TARGET] = 1
+        self._wait(_SWITCH_PC, 1)
+        h[_NEW_TARGET] = 0
+        self._wait(_SWITCH_PC, 0)
+        self._time(0, time.perf_counter() - t0)
+
+    def get_daq_response(self):
+        mailbox = self.mailbox
+        t0 = time.perf_counter()
+        self._wait(_AT_TARGET, 1)
+        disp = mailbox.daq_disp.copy()
+        force = mailbox.daq_force.copy()
+        self._time(1, time.perf_counter() - t0)
+        return disp, force
+
+    def commit(self):
+        pass
+
+    def close(self):
+        if self.mailbox is not None:
+            self.mailbox.close()
+            self.mailbox = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run a shared-memory controller emulator.')
+    parser.add_argument('--name', default=None)
+    parser.add_argument('--n-act', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=1024.0)
+    parser.add_argument('--substeps', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--tau', type=float, default=0.0)
+    parser.add_argument('--wn', type=float, default=None)
+    parser.add_argument('--zeta', type=float, default=0.7)
+    parser.add_argument('--stiffness', type=float, nargs='+', default=[1.0])
+    parser.add_argument('--noise-disp', type=float, default=0.0)
+    parser.add_argument('--noise-force', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    mailbox = Mailbox.create(args.n_act, args.name)
+    print(mailbox.name, flush=True)
+    try:
+        run_controller(mailbox.name, args.rate, args.substeps, args.delay,
+                       args.tau, args.wn, args.zeta, args.stiffness,
+                       args.noise_disp, args.noise_force, args.seed,
+                       track=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mailbox.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+# openfrescopy/ensemble.py
+"""
+Process-pool ensemble runner for parameter and ground-motion sweeps.
+
+OpenSees keeps its model in process-wide global state, so one interpreter can
+only hold one model at a time. This module spreads many independent runs of
+the same model-builder function over a pool of worker processes. Every worker
+imports openfrescopy.opensees once and is reused for many runs, calling
+wipeExp() and wipe() between them. Responses are sampled with run_transient()
+and returned as NumPy arrays instead of .out files.
+
+Usage:
+    import openfrescopy.opensees as ops
+    from openfrescopy import ensemble
+
+    def build(ops, scale, fy):
+        ops.model('BasicBuilder', '-ndm', 2, '-ndf', 2)
+        ...
+        ops.timeSeries('Path', 1, '-filePath', 'elcentro.txt', '-dt', 0.02,
+                       '-factor', 386.1*scale)
+        ...
+
+    res = ensemble.run(build, ensemble.grid(scale=[0.5, 1.0], fy=[1.5, 2.0]),
+                       n_steps=1790, dt=20.0/1024.0,
+                       outputs={'disp': ops.NodeOutput([3, 4], [1])},
+                       workers=4, store='sweep')
+    res['disp']      # (n_runs, n_samples, 2) array, NaN where a run stopped
+    res.errors       # {run index: traceback} of the runs that raised
+
+The builder is called as build(ops, **params) in the worker and must be a
+module-level function so it can be sent to the workers. It may return a dict
+that overrides the run_transient() arguments of that run (e.g. n_steps for
+records of different lengths).
+
+With store=<directory>, every finished run is saved there as it completes
+and runs already in the store are loaded instead of run again, so an
+interrupted sweep picks up where it stopped. Runs that raised are not stored
+and are retried on the next call. Stored runs are keyed by their parameters,
+the shared run_transient() arguments and the builder's qualified name.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+# Per-worker state, set by _init_worker()
+_ops = None
+_build = None
+_run_args = None
+_started = None
+
+
+def grid(**axes):
+    """
+    Return the cartesian product of the given parameter lists as dicts.
+
+    grid(scale=[0.5, 1.0], fy=[1.5, 2.0]) gives four parameter dicts, with
+    the last axis varying fastest.
+    """
+    names = list(axes)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(axes[n] for n in names))]
+
+
+def _key(params, build, run_args):
+    """
+    Stable content key of one run, used as store file name.
+
+    It covers the parameter dict, the shared run_transient() arguments and
+    the qualified name of the builder, so a sweep rerun with other settings
+    does not pick up the stored results of the previous one.
+    """
+    run_args = dict(run_args, dtype=np.dtype(run_args['dtype']).str)
+    builder = (f"{getattr(build, '__module__', '')}."
+               f"{getattr(build, '__qualname__', repr(build))}")
+    text = json.dumps([params, run_args, builder], sort_keys=True,
+                      default=repr)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _init_worker(build, run_args, started=None):
+    """Import the OpenSees module once per worker process."""
+    global _ops, _build, _run_args, _started
+    import openfrescopy.opensees as ops
+    _ops = ops
+    _build = build
+    _run_args = run_args
+    _started = started
+
+
+def _reset(ops):
+    """Clear the experimental objects and the model for the next run."""
+    for command in ('wipeExp', 'wipe'):
+        try:
+            getattr(ops, command)()
+        except Exception:
+            pass
+
+
+def _run_case(index, params):
+    """Build and run one case in this worker and return its arrays."""
+    ops = _ops
+    start = time.perf_counter()
+    # Flag the run as started, so that after a worker crash the runs that
+    # were only queued can be told from the ones in flight
+    if _started is not None:
+        _started[index] = 1
+    try:
+        kwargs = dict(_run_args)
+        extra = _build(ops, **params)
+        if isinstance(extra, dict):
+            kwargs.update(extra)
+        res = ops.run_transient(**kwargs)
+        payload = {'time': res.time, 'data': res.data, 'labels': res.labels,
+                   'steps': res.steps, 'status': res.status, 'error': None}
+    except Exception:
+        payload = {'error': traceback.format_exc()}
+    finally:
+        _reset(ops)
+    payload['elapsed'] = time.perf_counter() - start
+    return index, payload
+
+
+def _save(path, payload):
+    """Write one finished run to the store, atomically."""
+    arrays = {'time': payload['time'], 'steps': payload['steps'],
+              'status': payload['status'], 'elapsed': payload['elapsed']}
+    for name, values in payload['data'].items():
+        arrays['data.' + name] = values
+        arrays['labels.' + name] = np.array(payload['labels'][name], dtype=str)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _load(path):
+    """Read one stored run back into the payload format of _run_case()."""
+    with np.load(path) as f:
+        payload = {'time': f['time'], 'data': {}, 'labels': {},
+                   'steps': int(f['steps']), 'status': int(f['status']),
+                   'elapsed': float(f['elapsed']), 'error': None}
+        for name in f.files:
+            if name.startswith('data.'):
+                payload['data'][name[5:]] = f[name]
+            elif name.startswith('labels.'):
+                payload['labels'][name[7:]] = [str(s) for s in f[name]]
+    return payload
+
+
+class EnsembleResult:
+    """
+    Stacked results of an ensemble run.
+
+    Attributes:
+        params: parameter dict of each run
+        time: (n_runs, n_samples) analysis time of each sample
+        data: {name: (n_runs, n_samples, n_columns) array}; rows past the
+            samples a run produced (and all rows of failed runs) are NaN
+        labels: {name: column labels}
+        samples: number of samples each run produced
+        steps: number of analysis steps each run completed
+        status: run_transient() status of each run (0 on success)
+        elapsed: wall time of each run in its worker, in seconds
+        errors: {run index: traceback} of the runs that raised or crashed
+        ok: boolean mask of the runs that finished with status 0
+    """
+
+    def __init__(self, params, payloads):
+        self.params = params
+        n = len(params)
+        done = [p for p in payloads if p is not None and p['error'] is None]
+        n_samples = max((len(p['time']) for p in done), default=0)
+        self.samples = np.zeros(n, dtype=int)
+        self.steps = np.zeros(n, dtype=int)
+        self.status = np.zeros(n, dtype=int)
+        self.elapsed = np.zeros(n)
+        self.errors = {}
+        self.labels = {}
+        self.time = np.full((n, n_samples), np.nan)
+        self.data = {}
+        for p in done:
+            for name, values in p['data'].items():
+                if name not in self.data:
+                    self.data[name] = np.full((n, n_samples, values.shape[1]),
+                                              np.nan, dtype=values.dtype)
+                    self.labels[name] = p['labels'][name]
+        for i, p in enumerate(payloads):
+            if p is None:
+                self.errors[i] = 'not run'
+                self.status[i] = -1
+                continue
+            self.elapsed[i] = p['elapsed']
+            if p['error'] is not None:
+                self.errors[i] = p['error']
+                self.status[i] = -1
+                continue
+            k = len(p['time'])
+            self.samples[i] = k
+            self.steps[i] = p['steps']
+            self.status[i] = p['status']
+            self.time[i, :k] = p['time']
+            for name, values in p['data'].items():
+                self.data[name][i, :k] = values
+        self.ok = self.status == 0
+
+    def __len__(self):
+        return len(self.params)
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def __repr__(self):
+        return (f'EnsembleResult(runs={len(self)}, ok={int(self.ok.sum())}, '
+                f'failed={len(self.errors)}, outputs={list(self.data)})')
+
+
+def run(build, params, n_steps=None, dt=None, outputs=None, stride=1,
+        dtype=np.float64, workers=None, store=None, progress=None,
+        mp_context=None):
+    """
+    Run build(ops, **p) followed by run_transient() for every p in params.
+
+    Args:
+        build: module-level function building the model of one run
+        params: list of parameter dicts, or a dict of lists passed to grid()
+        n_steps, dt, outputs, stride, dtype: run_transient() arguments shared
+            by all runs (build() may override them per run)
+        workers: number of worker processes (default os.cpu_count()); 0 runs
+            everything in this process, which is handy for debugging
+        store: optional directory for resumable progress
+        progress: optional callable(done, total, index, error) called after
+            each run, with error None on success
+        mp_context: multiprocessing context for the pool (e.g. 'spawn')
+
+    Returns:
+        EnsembleResult with the runs in the order of params.
+
+    A run that raises is recorded in result.errors and its worker continues
+    with the next run. If a worker process dies (e.g. a crash in the native
+    extension), the runs that had not started yet go on in a new pool of
+    the same size, and the runs in flight are repeated one at a time in a
+    single-worker pool to find and record the one that crashed.
+    """
+    if isinstance(params, dict):
+        params = grid(**params)
+    params = [dict(p) for p in params]
+    run_args = {'n_steps': n_steps, 'dt': dt, 'outputs': outputs,
+                'stride': stride, 'dtype': dtype}
+    total = len(params)
+    payloads = [None]*total
+    paths = [None]*total
+
+    if store is not None:
+        os.makedirs(store, exist_ok=True)
+        for i, p in enumerate(params):
+            paths[i] = os.path.join(os.fspath(store),
+                                    f'run-{_key(p, build, run_args)}.npz')
+            if os.path.exists(paths[i]):
+                payloads[i] = _load(paths[i])
+    done = sum(p is not None for p in payloads)
+
+    def finish(index, payload):
+        nonlocal done
+        payloads[index] = payload
+        done += 1
+        if payload['error'] is None and paths[index] is not None:
+            _save(paths[index], payload)
+        if progress is not None:
+            progress(done, total, index, payload['error'])
+
+    pending = [i for i in range(total) if payloads[i] is None]
+    if workers == 0:
+        _init_worker(build, run_args)
+        for i in pending:
+            finish(*_run_case(i, params[i]))
+        return EnsembleResult(params, payloads)
+
+    if mp_context is None or isinstance(mp_context, str):
+        import multiprocessing
+        mp_context = multiprocessing.get_context(mp_context)
+    # One flag per run, set by the worker that starts it
+    started = mp_context.Array('b', total, lock=False)
+
+    def pool(n):
+        return ProcessPoolExecutor(n, mp_context=mp_context,
+                                   initializer=_init_worker,
+                                   initargs=(build, run_args, started))
+
+    def submit(executor, indices):
+        """Run the given cases and return those lost to a dead worker."""
+        futures = {executor.submit(_run_case, i, params[i]): i
+                   for i in indices}
+        lost = []
+        for future in as_completed(futures):
+            try:
+                finish(*future.result())
+            except BrokenProcessPool:
+                lost.append(futures[future])
+            except Exception:
+                finish(futures[future], {'error': traceback.format_exc(),
+                                         'elapsed': 0.0})
+        return sorted(lost)
+
+    n = min(workers or os.cpu_count() or 1, len(pending)) or 1
+    with pool(n) as executor:
+        lost = submit(executor, pending)
+    while lost:
+        # Runs that never started did not cause the crash and go on in a new
+        # pool of full size; the runs in flight are repeated one by one to
+        # isolate the one that crashed
+        queued = [i for i in lost if not started[i]]
+        for i in (i for i in lost if started[i]):
+            with pool(1) as executor:
+                if submit(executor, [i]):
+                    finish(i, {'error': 'worker process died during this run',
+                               'elapsed': 0.0})
+        lost = []
+        if queued:
+            with pool(min(n, len(queued))) as executor:
+                lost = submit(executor, queued)
+    return EnsembleResult(params, payloads)
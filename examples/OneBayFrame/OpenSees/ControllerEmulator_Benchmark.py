@@ -0,0 +1,141 @@
+# ControllerEmulator_Benchmark.py - Control loop rate of emulated controllers
+#
+# This example runs the one bay frame with both experimental columns driven
+# by openfrescopy.emulator controllers (the shared-memory stand-in for the
+# xPCtarget/SCRAMNet predictor-corrector) and measures, for each controller
+# tick rate, the sustained analysis step rate and the latency of the
+# newTarget/switchPC handshake and of the atTarget wait.
+#
+# The emulated actuators have a transport delay (--delay, 1 ms), first-order
+# servo dynamics (--tau, 2 ms) and sensor noise (--noise, 1e-5 in. and kip);
+# pass 0 to leave any of them out. The specimens are linear springs with the
+# stiffnesses of the columns.
+#
+# Usage (Python backend):
+#   python ControllerEmulator_Benchmark.py [--steps N] [--rates R ...]
+#                                          [--delay S] [--tau S] [--noise X]
+#                                          [--json results.json]
+
+import argparse
+import json
+import os
+
+os.environ.setdefault("OPENFRESCOPY_BACKEND", "python")
+
+import time
+
+import openfrescopy.opensees as ops
+from openfrescopy import emulator
+
+
+def build(mailboxes):
+    ops.wipe()
+    ops.model("BasicBuilder", "-ndm", 2, "-ndf", 2)
+    ops.node(1,   0.0,  0.00)
+    ops.node(2, 100.0,  0.00)
+    ops.node(3,   0.0, 54.00, "-mass", 0.04, 0.04)
+    ops.node(4, 100.0, 54.00, "-mass", 0.02, 0.02)
+    ops.fix(1, 1, 1)
+    ops.fix(2, 1, 1)
+    ops.fix(3, 0, 1)
+    ops.fix(4, 0, 1)
+    ops.uniaxialMaterial("Elastic", 3, 2.0*100.0/1.0)
+
+    ops.expControlPoint(1, "1", "disp")
+    ops.expControlPoint(2, "1", "disp", "1", "force")
+    # expControl("SCRAMNetEmulator", tag, memName, "-trialCP", cpTags,
+    #            "-outCP", cpTags)
+    for tag, name in enumerate(mailboxes, start=1):
+        ops.expControl("SCRAMNetEmulator", tag, name,
+                       "-trialCP", 1, "-outCP", 2)
+        ops.expSetup("OneActuator", tag, "-control", tag, 1,
+                     "-sizeTrialOut", 1, 1)
+        ops.expSite("LocalSite", tag, tag)
+    ops.expElement("twoNodeLink", 1, 1, 3, "-dir", 2, "-site", 1,
+                   "-initStif", 2.8)
+    ops.expElement("twoNodeLink", 2, 2, 4, "-dir", 2, "-site", 2,
+                   "-initStif", 5.6)
+    ops.element("truss", 3, 3, 4, 1.0, 3)
+
+    ops.timeSeries("Path", 1, "-filePath", "elcentro.txt", "-dt", 0.02,
+                   "-factor", 386.1)
+    ops.pattern("UniformExcitation", 1, 1, "-accel", 1)
+    ops.rayleigh(1.010017396536, 0.0, 0.0, 0.0)
+    ops.system("BandGeneral")
+    ops.numberer("Plain")
+    ops.constraints("Plain")
+    ops.test("EnergyIncr", 1.0e-6, 10)
+    ops.integrator("NewmarkExplicit", 0.5)
+    ops.algorithm("Linear")
+    ops.analysis("Transient")
+
+
+def run(rate, steps, substeps, delay, tau, noise):
+    """Run the frame against two controllers; return the measurements."""
+    options = dict(rate=rate, substeps=substeps, delay=delay, tau=tau,
+                   noise_disp=noise, noise_force=noise, seed=1)
+    emus = [emulator.ControllerEmulator(stiffness=k, **options).start()
+            for k in (2.8, 5.6)]
+    try:
+        build([emu.name for emu in emus])
+        start = time.perf_counter()
+        for i in range(steps):
+            ops.analyze(1, 20.0/1024.0)
+        elapsed = time.perf_counter() - start
+        disp = ops.nodeDisp(3, 1)
+        stats = [emu.stats() for emu in emus]
+        ops.wipeExp()
+        ops.wipe()
+    finally:
+        for emu in emus:
+            emu.close()
+    handshake = [st["handshake"] for st in stats]
+    acquire = [st["acquire"] for st in stats]
+    return {
+        "rate": rate,
+        "steps": steps,
+        "steps_per_s": steps/elapsed,
+        "handshake_mean_us": 1.0e6*max(h["mean"] for h in handshake),
+        "handshake_max_us": 1.0e6*max(h["max"] for h in handshake),
+        "acquire_mean_us": 1.0e6*max(a["mean"] for a in acquire),
+        "acquire_max_us": 1.0e6*max(a["max"] for a in acquire),
+        "late_ticks": sum(st["late_ticks"] for st in stats),
+        "disp3": disp,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--rates", type=float, nargs="+",
+                        default=[1024.0, 4096.0, 16384.0])
+    parser.add_argument("--substeps", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=1.0e-3,
+                        help="transport delay of the actuators [s]")
+    parser.add_argument("--tau", type=float, default=2.0e-3,
+                        help="servo time constant [s]")
+    parser.add_argument("--noise", type=float, default=1.0e-5,
+                        help="standard deviation of the sensor noise")
+    parser.add_argument("--json", default=None,
+                        help="write the results to this file")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    results = [run(rate, args.steps, args.substeps, args.delay, args.tau,
+                   args.noise) for rate in args.rates]
+
+    print("{:>10}{:>10}{:>18}{:>18}{:>12}".format(
+        "rate [Hz]", "steps/s", "handshake [us]", "atTarget [us]", "late"))
+    for r in results:
+        print("{:>10.0f}{:>10.0f}{:>10.1f}{:>8.1f}{:>10.1f}{:>8.1f}"
+              "{:>12d}".format(r["rate"], r["steps_per_s"],
+                               r["handshake_mean_us"], r["handshake_max_us"],
+                               r["acquire_mean_us"], r["acquire_max_us"],
+                               r["late_ticks"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
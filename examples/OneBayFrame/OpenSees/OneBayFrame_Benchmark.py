@@ -0,0 +1,77 @@
+# OneBayFrame_Benchmark.py - Step throughput of the OneBayFrame model
+# Units: [kip, in.]
+#
+# This example builds N copies of the one bay frame from OneBayFrame_Local.py
+# (2*N experimental twoNodeLink elements with SimUniaxialMaterials controls)
+# with the model of openfrescopy.benchmarks and the El Centro record, and
+# measures analysis steps per second for each available OpenSees backend:
+# the native opensees.pyd with OpenFrescoPy (Windows only) and the NumPy
+# stand-in backend openfrescopy.pysim. Each backend runs in its own process.
+#
+# Usage:
+#   python OneBayFrame_Benchmark.py [--copies N] [--steps S]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+this_folder = Path(__file__).parent.resolve()
+
+
+def run(copies, steps):
+    """Benchmark the backend of this process and return the results."""
+    t0 = time.perf_counter()
+    import openfrescopy.opensees as ops
+    backend = ops.backend()
+    t1 = time.perf_counter()
+    # The scaled model is shared with the benchmark suite
+    from openfrescopy.benchmarks.model import DT, build
+    build(ops, copies, this_folder/"elcentro.txt")
+    t2 = time.perf_counter()
+    dtAna = DT
+    for i in range(steps):
+        ops.analyze(1, dtAna)
+    t3 = time.perf_counter()
+    ops.wipeExp()
+    ops.wipe()
+    return {"backend": backend, "copies": copies, "steps": steps,
+            "import_s": t1 - t0, "build_s": t2 - t1, "analyze_s": t3 - t2,
+            "steps_per_s": steps/(t3 - t2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Step throughput of N copies of the one bay frame for "
+                    "each available OpenSees backend.")
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--steps", type=int, default=1790)
+    parser.add_argument("--worker", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(run(args.copies, args.steps)))
+        return
+
+    print('{:>8}{:>8}{:>8}{:>12}{:>12}{:>14}'.format(
+        'backend', 'copies', 'steps', 'build [s]', 'run [s]', 'steps/s'))
+    for backend in ("native", "python"):
+        env = dict(os.environ, OPENFRESCOPY_BACKEND=backend)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", "--copies",
+             str(args.copies), "--steps", str(args.steps)],
+            env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print('{:>8}  not available'.format(backend))
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print('{:>8}{:>8}{:>8}{:>12.3f}{:>12.3f}{:>14.1f}'.format(
+            r["backend"], r["copies"], r["steps"], r["build_s"],
+            r["analyze_s"], r["steps_per_s"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# OneBayFrame_Substructured.py - One bay frame split over worker processes
+# Units: [kip, in.]
+#
+# This example runs the one bay frame with its two columns as numerical
+# substructures, each built and solved in a worker process of its own by
+# openfrescopy.substructure. The spring of each column is divided into
+# --segments trusses in series, so every worker has a model of its own size
+# to solve per step, while the coordinator keeps the masses, the beam, the
+# ground motion and the explicit integration. The columns are coupled to
+# the coordinator through generic experimental elements and sites over a
+# loopback socket or shared memory.
+#
+# The same frame is then run in one process with the columns as local
+# twoNodeLink elements, and the largest difference of the floor
+# displacements is reported with the step rates of both runs.
+#
+# Usage (Python backend):
+#   python OneBayFrame_Substructured.py [--segments N] [--steps N]
+#                                       [--transport socket|shm]
+
+import argparse
+import os
+
+os.environ.setdefault("OPENFRESCOPY_BACKEND", "python")
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+import openfrescopy.opensees as ops
+from openfrescopy import substructure
+
+MASS = {3: 0.04, 4: 0.02}
+X = {3: 0.0, 4: 100.0}
+
+
+def column_material(ops, tag, node):
+    # uniaxialMaterial("Steel02", matTag, Fy, E, b, R0, cR1, cR2, a1, a2, a3,
+    #                  a4)
+    if node == 3:
+        ops.uniaxialMaterial("Steel02", tag, 1.5, 2.8, 0.01, 18.5, 0.925,
+                             0.15, 0.0, 1.0, 0.0, 1.0)
+    else:
+        ops.uniaxialMaterial("Elastic", tag, 5.6)
+
+
+def build_column(ops, node, segments):
+    """One column, built in its worker; `node` is shared with the frame."""
+    ops.model("BasicBuilder", "-ndm", 2, "-ndf", 2)
+    column_material(ops, 1, node)
+    # The trusses lie on a line of unit length ending at the floor node, so
+    # their strains add up to the column deformation and every truss
+    # carries the column shear
+    tags = [1000 + k for k in range(segments)] + [node]
+    for k, tag in enumerate(tags):
+        ops.node(tag, X[node] - 1.0 + k/segments, 54.0)
+    ops.fix(tags[0], 1, 1)
+    for tag in tags[1:]:
+        ops.fix(tag, 0, 1)
+    for k in range(segments):
+        ops.element("truss", k + 1, tags[k], tags[k + 1], 1.0, 1)
+
+
+def build_frame(columns):
+    """The floor, beam, loads and analysis; `columns` adds the columns."""
+    ops.wipe()
+    ops.model("BasicBuilder", "-ndm", 2, "-ndf", 2)
+    for node, mass in MASS.items():
+        ops.node(node, X[node], 54.0, "-mass", mass, mass)
+        ops.fix(node, 0, 1)
+    columns()
+    ops.uniaxialMaterial("Elastic", 3, 2.0*100.0/1.0)
+    ops.element("truss", 3, 3, 4, 1.0, 3)
+
+    ops.timeSeries("Path", 1, "-filePath", "elcentro.txt", "-dt", 0.02,
+                   "-factor", 386.1)
+    ops.pattern("UniformExcitation", 1, 1, "-accel", 1)
+    ops.rayleigh(1.010017396536, 0.0, 0.0, 0.0)
+    ops.system("BandGeneral")
+    ops.numberer("Plain")
+    ops.constraints("Plain")
+    ops.test("EnergyIncr", 1.0e-6, 10)
+    ops.integrator("NewmarkExplicit", 0.5)
+    ops.algorithm("Linear")
+    ops.analysis("Transient")
+
+
+def local_columns():
+    """The columns as twoNodeLink elements in this process."""
+    ops.node(1,   0.0,  0.00)
+    ops.node(2, 100.0,  0.00)
+    ops.fix(1, 1, 1)
+    ops.fix(2, 1, 1)
+    ops.expControlPoint(1, "1", "disp")
+    for tag, node in ((1, 3), (2, 4)):
+        column_material(ops, tag, node)
+        ops.expControl("SimUniaxialMaterials", tag, tag)
+        ops.expSetup("OneActuator", tag, "-control", tag, 1,
+                     "-sizeTrialOut", 1, 1)
+        ops.expSite("LocalSite", tag, tag)
+    ops.expElement("twoNodeLink", 1, 1, 3, "-dir", 2, "-site", 1,
+                   "-initStif", 2.8)
+    ops.expElement("twoNodeLink", 2, 2, 4, "-dir", 2, "-site", 2,
+                   "-initStif", 5.6)
+
+
+def run(steps):
+    """Run the frame; return the floor displacements and the step rate."""
+    dt = 20.0/1024.0
+    disp = np.zeros((steps, 2))
+    start = time.perf_counter()
+    for i in range(steps):
+        if ops.analyze(1, dt) != 0:
+            raise RuntimeError(f"analysis failed at step {i + 1}")
+        disp[i] = ops.nodeDisp(3, 1), ops.nodeDisp(4, 1)
+    rate = steps/(time.perf_counter() - start)
+    ops.wipeExp()
+    ops.wipe()
+    return disp, rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--steps", type=int, default=1790)
+    parser.add_argument("--transport", choices=["socket", "shm"],
+                        default="shm")
+    args = parser.parse_args(argv)
+    os.chdir(Path(__file__).parent.resolve())
+
+    # Start the workers before the frame is built, so they do not inherit it
+    subs = [substructure.Substructure(build_column, [(node, [1])],
+                                      (node, args.segments),
+                                      transport=args.transport)
+            for node in (3, 4)]
+    substructure.start_all(subs)
+    try:
+        for node, sub in zip((3, 4), subs):
+            print(f"column at node {node}: {args.segments} trusses, "
+                  f"condensed stiffness {sub.stiffness[0, 0]:.4f}")
+        build_frame(lambda: substructure.couple(subs, 1))
+        split, split_rate = run(args.steps)
+    finally:
+        for sub in subs:
+            sub.close()
+
+    build_frame(local_columns)
+    local, local_rate = run(args.steps)
+
+    print(f"substructured ({args.transport}): {split_rate:8.1f} steps/s")
+    print(f"one process (local columns): {local_rate:8.1f} steps/s")
+    print(f"largest floor displacement difference: "
+          f"{np.abs(split - local).max():.3e} in.")
+
+
+if __name__ == "__main__":
+    main()
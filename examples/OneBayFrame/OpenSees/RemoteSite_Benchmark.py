@@ -0,0 +1,178 @@
+# RemoteSite_Benchmark.py - Per-step messaging latency of remote sites
+#
+# This example serves an elastic actuator setup with openfrescopy.sites over
+# loopback TCP and measures the latency of one hybrid step (send the trial
+# displacement, fetch the measured displacement and force, commit) for:
+#
+#   blocking    plain blocking socket client, every message acknowledged
+#   expSite     BlockingRemoteSite, the synchronous site behind
+#               expSite('RemoteSite', ...) in the Python backend
+#   asyncio     RemoteSite, every message acknowledged
+#   pipelined   RemoteSite with pipeline=True (one round trip per step)
+#
+# The native OpenFresco TCP channels do not speak the openfrescopy.sites
+# protocol, so the blocking baseline is a synchronous socket client of the
+# same frames rather than the native blocking site. It takes the message
+# size from the data size the server announces in its HELLO reply.
+#
+# Usage:
+#   python RemoteSite_Benchmark.py [--steps N]
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import struct
+import time
+
+import numpy as np
+
+from openfrescopy import sites
+
+
+class ElasticSetup:
+    """Minimal expSetup-like object: an elastic spring of stiffness k."""
+
+    size_trial = 1
+    size_out = 1
+
+    def __init__(self, k):
+        self.k = k
+        self.disp = np.zeros(1)
+        self.force = np.zeros(1)
+
+    def set_trial_response(self, disp):
+        self.disp[0] = disp[0]
+        self.force[0] = self.k*disp[0]
+
+    def get_daq_response(self):
+        return self.disp, self.force
+
+    def commit(self):
+        pass
+
+
+def lab(port, ready):
+    server = sites.SiteServer(ElasticSetup(2.8), port=port)
+
+    async def main():
+        await server.start()
+        ready.set()
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def blocking(port, steps):
+    """Step through a blocking socket client; return seconds per step."""
+    header = struct.Struct('<BBHI')
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    # Large enough for the HELLO reply until the server's data size is known
+    buffers = {'send': bytearray(header.size + 24),
+               'recv': bytearray(header.size + 24)}
+
+    def receive(got, size):
+        """Read bytes got..size of a reply into the receive buffer."""
+        view = memoryview(buffers['recv'])
+        while got < size:
+            n = sock.recv_into(view[got:size])
+            if n == 0:
+                raise sites.SiteError('connection closed by the server')
+            got += n
+
+    def request(action, value=None):
+        """Send one frame, read the reply and return its values."""
+        send = buffers['send']
+        count = 0
+        if value is not None:
+            struct.pack_into('<d', send, header.size, value)
+            count = 1
+        header.pack_into(send, 0, action, 1, count, 0)
+        sock.sendall(memoryview(send)[:header.size + 8*count])
+        receive(0, header.size)
+        reply, _, count, _ = header.unpack_from(buffers['recv'])
+        size = count if reply == sites.ERROR else 8*count
+        if header.size + size > len(buffers['recv']):
+            raise sites.SiteError(f'reply of {count} values exceeds the '
+                                  f'data size')
+        receive(header.size, header.size + size)
+        if reply == sites.ERROR:
+            raise sites.SiteError(bytes(buffers['recv'][header.size:
+                                                        header.size + size])
+                                  .decode('utf-8', 'replace'))
+        return np.frombuffer(buffers['recv'], '<f8', count, header.size)
+
+    # The HELLO reply holds size_trial, size_out and data_size
+    data_size = int(request(sites.HELLO)[2])
+    buffers['send'] = bytearray(header.size + 8*data_size)
+    buffers['recv'] = bytearray(header.size + 8*data_size)
+    start = time.perf_counter()
+    for i in range(steps):
+        request(sites.SET_TRIAL, 0.01*np.sin(0.01*i))
+        request(sites.GET_DAQ)
+        request(sites.COMMIT)
+    elapsed = time.perf_counter() - start
+    request(sites.BYE)
+    sock.close()
+    return elapsed/steps
+
+
+def expsite(port, steps):
+    """Step through BlockingRemoteSite; return seconds per step."""
+    site = sites.BlockingRemoteSite('127.0.0.1', port)
+    disp = np.zeros(1)
+    start = time.perf_counter()
+    for i in range(steps):
+        disp[0] = 0.01*np.sin(0.01*i)
+        site.set_trial_response(disp)
+        site.get_daq_response()
+        site.commit()
+    elapsed = time.perf_counter() - start
+    site.close()
+    return elapsed/steps
+
+
+async def remote(port, steps, pipeline):
+    """Step through RemoteSite; return seconds per step."""
+    site = await sites.RemoteSite('127.0.0.1', port, pipeline).connect()
+    disp = np.zeros(1)
+    start = time.perf_counter()
+    for i in range(steps):
+        disp[0] = 0.01*np.sin(0.01*i)
+        await site.set_trial_response(disp)
+        await site.get_daq_response()
+        await site.commit()
+    elapsed = time.perf_counter() - start
+    await site.close()
+    return elapsed/steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=8090)
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=lab, args=(args.port, ready),
+                                     daemon=True)
+    server.start()
+    ready.wait(10.0)
+    try:
+        results = {
+            'blocking': blocking(args.port, args.steps),
+            'expSite': expsite(args.port, args.steps),
+            'asyncio': asyncio.run(remote(args.port, args.steps, False)),
+            'pipelined': asyncio.run(remote(args.port, args.steps, True)),
+        }
+    finally:
+        server.terminate()
+    print('{:<12}{:>16}{:>12}'.format('client', 'latency [us]', 'steps/s'))
+    for name, seconds in results.items():
+        print('{:<12}{:>16.1f}{:>12.0f}'.format(name, 1.0e6*seconds,
+                                                1.0/seconds))
+
+
+if __name__ == '__main__':
+    main()
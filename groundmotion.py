@@ -0,0 +1,387 @@
+# openfrescopy/groundmotion.py
+"""
+Memory-mapped ground motion records for openfrescopy.
+
+Text records such as examples/OneBayFrame/OpenSees/elcentro.txt are parsed
+again by every timeSeries('Path', ..., '-filePath', ...) command. This
+module converts them once into a binary file that is memory-mapped for
+reading, so every run (and every process of an ensemble, which share the
+mapped pages through the OS page cache) gets the record without parsing
+or copying it:
+
+    +----------------------+-----------------------+----------------------+
+    | 16-byte preamble     | JSON metadata, padded | npts values of dtype |
+    | magic, version, size | to a 64-byte boundary |                      |
+    +----------------------+-----------------------+----------------------+
+
+The preamble is laid out as in openfrescopy.recorders, with the magic
+b'OFGM'. The metadata holds the record name, dt, npts, units, PGA and the
+source file.
+
+Usage:
+    from openfrescopy import groundmotion
+
+    store = groundmotion.GroundMotionStore('records')
+    rec = store.add('elcentro.txt', dt=0.02, units='g')   # converts once
+    rec = store['elcentro']                               # memory-mapped
+    rec.dt, rec.npts, rec.pga, rec.values
+
+    # Path time series straight from the mapped values, in in/s^2 and
+    # scaled to a PGA of 0.5 g
+    rec.scaled(pga=0.5).time_series(1, units='in/s^2')
+    ops.pattern('UniformExcitation', 1, 1, '-accel', 1)
+
+scaled() and resampled() return new Record objects that share the mapped
+values: a scale factor is passed on as the '-factor' of the time series,
+and resampling to a multiple of dt is a strided view. Only resampling to
+any other dt computes new values.
+"""
+
+import json
+import os
+import re
+import struct
+
+import numpy as np
+
+MAGIC = b'OFGM'
+VERSION = 1
+SUFFIX = '.gm'
+_PREAMBLE = struct.Struct('<4sHHII')
+_ALIGN = 64
+
+# Acceleration units in m/s^2
+UNITS = {
+    'g': 9.80665,
+    'm/s^2': 1.0,
+    'cm/s^2': 0.01,
+    'mm/s^2': 0.001,
+    'in/s^2': 0.0254,
+    'ft/s^2': 0.3048,
+}
+
+
+def unit_factor(units, to_units):
+    """Return the factor that converts values in units to to_units."""
+    try:
+        return UNITS[units]/UNITS[to_units]
+    except KeyError as e:
+        raise ValueError(f'unknown units {e.args[0]!r} (use one of '
+                         f'{sorted(UNITS)})') from None
+
+
+def read_text(path, skip_rows=0):
+    """
+    Read the values of a text record in reading order.
+
+    PEER NGA .AT2 files are recognized by their suffix; their four header
+    lines are skipped and dt is taken from the 'NPTS=..., DT=...' line.
+
+    Returns:
+        (values, dt) with dt None unless the file states it
+    """
+    path = os.fspath(path)
+    dt = None
+    with open(path, 'r') as f:
+        if path.upper().endswith('.AT2'):
+            header = [f.readline() for _ in range(4)]
+            match = re.search(r'DT\s*=\s*([0-9.eE+-]+)', header[3],
+                              re.IGNORECASE)
+            if match is None:
+                raise ValueError(f'{path}: no DT in the AT2 header')
+            dt = float(match.group(1))
+        for _ in range(skip_rows):
+            f.readline()
+        values = np.array(f.read().split(), dtype=np.float64)
+    return values, dt
+
+
+def write_record(path, values, dt, units='g', name=None, meta=None,
+                 dtype=np.float64):
+    """Write values as a binary record file and return its path."""
+    values = np.asarray(values, dtype=dtype).ravel()
+    if dt is None or dt <= 0.0:
+        raise ValueError('dt must be positive')
+    if units not in UNITS:
+        raise ValueError(f'unknown units {units!r} (use one of '
+                         f'{sorted(UNITS)})')
+    path = os.fspath(path)
+    info = dict(meta or {})
+    info.update({
+        'name': name or os.path.splitext(os.path.basename(path))[0],
+        'dt': float(dt),
+        'npts': int(values.size),
+        'units': units,
+        'pga': float(np.abs(values).max()) if values.size else 0.0,
+        'dtype': np.dtype(dtype).str,
+    })
+    text = json.dumps(info, separators=(',', ':')).encode('utf-8')
+    size = _PREAMBLE.size + len(text)
+    size += -size % _ALIGN
+    preamble = _PREAMBLE.pack(MAGIC, VERSION, 0, size, len(text))
+    # Write under a temporary name so that concurrent readers never map a
+    # partial file
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write((preamble + text).ljust(size, b' '))
+        f.write(values.tobytes())
+    os.replace(tmp, path)
+    return path
+
+
+def convert(src, dst=None, dt=None, units='g', name=None, skip_rows=0,
+            dtype=np.float64):
+    """
+    Convert a text record to a binary record file.
+
+    Args:
+        src: text file with the values in reading order
+        dst: binary file to write (default: src with the suffix .gm)
+        dt: time step of the record (read from .AT2 headers if omitted)
+        units: units of the values, a key of UNITS
+        name: record name (default: file name without suffix)
+        skip_rows: header lines to skip
+        dtype: float dtype of the stored values
+
+    Returns:
+        the path of the binary record
+    """
+    values, file_dt = read_text(src, skip_rows)
+    dt = file_dt if dt is None else dt
+    if dt is None:
+        raise ValueError(f'{src}: dt is not given and not in the file')
+    if dst is None:
+        dst = os.path.splitext(os.fspath(src))[0] + SUFFIX
+    name = name or os.path.splitext(os.path.basename(os.fspath(src)))[0]
+    return write_record(dst, values, dt, units, name,
+                        {'source': os.path.basename(os.fspath(src))}, dtype)
+
+
+def read_header(path):
+    """
+    Return (metadata, data_offset) of a binary record file.
+
+    Raises ValueError if the file is not a binary record.
+    """
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f'{path}: file too short for a ground motion')
+        magic, version, _, size, length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: not a ground motion record (bad magic)')
+        if version > VERSION:
+            raise ValueError(f'{path}: unsupported record version {version}')
+        meta = json.loads(f.read(length).decode('utf-8'))
+    return meta, size
+
+
+class Record:
+    """
+    A ground motion: values, time step, units and a pending scale factor.
+
+    Attributes:
+        name, units: from the metadata
+        dt: time step of values
+        values: read-only (possibly memory-mapped or strided) array of the
+            unscaled values
+        scale: factor applied by time_series() and array()
+        meta: the metadata of the record file
+    """
+
+    def __init__(self, values, dt, units, name, scale=1.0, meta=None):
+        self.values = values
+        self.dt = float(dt)
+        self.units = units
+        self.name = name
+        self.scale = float(scale)
+        self.meta = meta or {}
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a record file."""
+        path = os.fspath(path)
+        meta, offset = read_header(path)
+        n = meta['npts']
+        if n:
+            values = np.memmap(path, dtype=np.dtype(meta['dtype']), mode='r',
+                               offset=offset, shape=(n,))
+        else:
+            values = np.empty(0, dtype=np.dtype(meta['dtype']))
+        return cls(values, meta['dt'], meta['units'], meta['name'], 1.0, meta)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return (f'Record({self.name!r}, npts={self.npts}, dt={self.dt:g}, '
+                f'units={self.units!r}, pga={self.pga:g}, '
+                f'scale={self.scale:g})')
+
+    @property
+    def npts(self):
+        return len(self.values)
+
+    @property
+    def duration(self):
+        return self.dt*(self.npts - 1) if self.npts else 0.0
+
+    @property
+    def pga(self):
+        """Peak absolute value after scaling, in the record units."""
+        if 'pga' in self.meta:
+            peak = self.meta['pga']
+        else:
+            peak = float(np.abs(self.values).max()) if self.npts else 0.0
+        return abs(self.scale)*peak
+
+    @property
+    def time(self):
+        """Time of each value (computed, not stored)."""
+        return self.dt*np.arange(self.npts)
+
+    def _derive(self, values, dt, scale, meta=None):
+        return Record(values, dt, self.units, self.name, scale,
+                      self.meta if meta is None else meta)
+
+    def scaled(self, factor=1.0, pga=None):
+        """
+        Return the record scaled by factor, or to a PGA in the record units.
+
+        The values are shared; only the scale factor changes.
+        """
+        if pga is not None:
+            current = self.pga
+            if current == 0.0:
+                raise ValueError(f'{self.name}: cannot scale a record with '
+                                 f'zero PGA')
+            factor = pga/current
+        return self._derive(self.values, self.dt, self.scale*factor)
+
+    def resampled(self, dt):
+        """
+        Return the record at time step dt.
+
+        A multiple of the record dt gives a strided view of the values (no
+        copy). Any other dt is linearly interpolated into a new array.
+        """
+        dt = float(dt)
+        if dt <= 0.0:
+            raise ValueError('dt must be positive')
+        ratio = dt/self.dt
+        step = int(round(ratio))
+        if step >= 1 and abs(ratio - step) < 1e-9*ratio:
+            # The PGA of a decimated record may differ; drop the stored one
+            meta = {k: v for k, v in self.meta.items() if k != 'pga'}
+            return self._derive(self.values[::step], self.dt*step, self.scale,
+                                meta)
+        n = int(np.floor(self.duration/dt + 1e-9)) + 1
+        values = np.interp(dt*np.arange(n), self.time, self.values)
+        meta = {k: v for k, v in self.meta.items() if k != 'pga'}
+        return self._derive(values, dt, self.scale, meta)
+
+    def array(self, units=None):
+        """Return a new array of the scaled values, optionally converted."""
+        factor = self.scale
+        if units is not None:
+            factor *= unit_factor(self.units, units)
+        return factor*np.asarray(self.values, dtype=float)
+
+    def path_args(self, units=None, factor=1.0, as_list=False):
+        """
+        Return the timeSeries('Path', tag, ...) arguments of the record.
+
+        The values are passed as one NumPy array after '-values' (which the
+        Python backend takes without copying), or as individual numbers
+        with as_list=True, as the native interpreter needs them.
+        """
+        fact = self.scale*factor
+        if units is not None:
+            fact *= unit_factor(self.units, units)
+        values = self.values
+        if as_list:
+            values = np.asarray(values, dtype=float).tolist()
+        else:
+            values = [values]
+        return ['-dt', self.dt, '-values', *values, '-factor', fact]
+
+    def time_series(self, tag, units=None, factor=1.0, ops=None):
+        """
+        Define timeSeries('Path', tag, ...) from the record.
+
+        Args:
+            tag: time series tag
+            units: convert the values to these units (e.g. 'in/s^2')
+            factor: additional factor
+            ops: the command module (default: openfrescopy.opensees)
+        """
+        if ops is None:
+            from . import opensees as ops
+        native = getattr(ops, 'backend', lambda: 'native')() != 'python'
+        return ops.timeSeries('Path', tag,
+                              *self.path_args(units, factor, as_list=native))
+
+
+class GroundMotionStore:
+    """
+    A directory of binary record files.
+
+    Records are memory-mapped once per process and cached, so repeated
+    lookups in a sweep cost a dict access.
+    """
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self._open = {}
+
+    def path(self, name):
+        return os.path.join(self.root, name + SUFFIX)
+
+    def add(self, src, dt=None, units='g', name=None, skip_rows=0,
+            dtype=np.float64, force=False):
+        """
+        Convert a text record into the store and return the Record.
+
+        The conversion is skipped if the store already holds a record of
+        that name that is newer than src, unless force is set.
+        """
+        src = os.fspath(src)
+        name = name or os.path.splitext(os.path.basename(src))[0]
+        dst = self.path(name)
+        if (force or not os.path.exists(dst) or
+                os.path.getmtime(dst) < os.path.getmtime(src)):
+            convert(src, dst, dt, units, name, skip_rows, dtype)
+            self._open.pop(name, None)
+        return self[name]
+
+    def put(self, name, values, dt, units='g'):
+        """Store an array as a record and return the Record."""
+        write_record(self.path(name), values, dt, units, name)
+        self._open.pop(name, None)
+        return self[name]
+
+    def __getitem__(self, name):
+        record = self._open.get(name)
+        if record is None:
+            path = self.path(name)
+            if not os.path.exists(path):
+                raise KeyError(f'{self.root}: no record {name!r}')
+            record = self._open[name] = Record.open(path)
+        return record
+
+    def __contains__(self, name):
+        return os.path.exists(self.path(name))
+
+    def names(self):
+        """Return the names of the stored records."""
+        return sorted(f[:-len(SUFFIX)] for f in os.listdir(self.root)
+                      if f.endswith(SUFFIX))
+
+    def __repr__(self):
+        return f'GroundMotionStore({self.root!r}, records={len(self.names())})'
+
+
+def open_record(path):
+    """Memory-map a binary record file."""
+    return Record.open(path)
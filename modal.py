@@ -0,0 +1,309 @@
+# openfrescopy/modal.py
+"""
+Sparse modal analysis with cached results for openfrescopy.
+
+eigen('-fullGenLapack', n) solves the generalized eigenproblem with a
+dense O(n^3) factorization even when only the first few modes are needed.
+This module assembles the stiffness and mass matrices of the current model
+in SciPy sparse form and solves for the requested modes with shift-invert
+Lanczos (scipy.sparse.linalg.eigsh), and caches the results under a hash
+of the model state, so that repeated calls on an unchanged model (before
+every test, in every member of a sweep) skip the solve:
+
+    from openfrescopy import modal
+
+    lam = modal.eigen(2)                  # like ops.eigen(2)
+    modes = modal.solve(2, cache_dir='.modal-cache')
+    modes.values, modes.omega, modes.period, modes.vectors[0]
+    modes.cached                          # True if no solve was needed
+
+    K, M, dofs = modal.matrices()         # scipy.sparse CSR matrices
+
+With the Python backend the key is a hash of the assembled matrices, the
+DOF numbering and the solver options. The results are also stored in the
+session, so nodeEigenvector() works after a cached call as well.
+
+The native interpreter does not expose its matrices. There, solve() calls
+its default eigen solver, which is ARPACK shift-invert Lanczos as well.
+The key then covers the node tags, coordinates, masses and committed
+displacements and the element connectivity. Material and section
+parameters are not part of it, so on the native backend results are only
+cached when key= is given to tell models that only differ in them apart
+(or cache=True is passed explicitly). SciPy is only needed for the Python
+backend.
+"""
+
+import collections
+import hashlib
+import os
+
+import numpy as np
+
+# Number of solutions kept in memory
+_CACHE_SIZE = 16
+_cache = collections.OrderedDict()
+
+# Systems up to this many equations are solved densely
+DENSE_LIMIT = 64
+
+
+def _ops(ops):
+    if ops is None:
+        from . import opensees as ops
+    return ops
+
+
+def _python(ops):
+    return getattr(ops, 'backend', lambda: 'native')() == 'python'
+
+
+class Modes:
+    """
+    Results of solve().
+
+    Attributes:
+        values: eigenvalues lambda = omega^2, in ascending order
+        vectors: (n_modes, n_nodes, ndf) mode shapes normalized to unit
+            generalized mass, in the node order of node_tags
+        node_tags: node tags of the rows of vectors
+        key: model-state hash the results are cached under
+        cached: True if the results came from the cache
+    """
+
+    def __init__(self, values, vectors, node_tags, key, cached=False):
+        self.values = values
+        self.vectors = vectors
+        self.node_tags = node_tags
+        self.key = key
+        self.cached = cached
+
+    @property
+    def omega(self):
+        return np.sqrt(self.values)
+
+    @property
+    def frequency(self):
+        return self.omega/(2.0*np.pi)
+
+    @property
+    def period(self):
+        return 2.0*np.pi/self.omega
+
+    def __len__(self):
+        return len(self.values)
+
+
+# -- Python backend ----------------------------------------------------------
+
+def _domain():
+    from .pysim._commands import _session
+    domain = _session.require_domain()
+    domain.update()
+    return _session, domain
+
+
+def matrices(which='current', ops=None):
+    """
+    Return (K, M, dofs) of the current model as SciPy CSR matrices.
+
+    K is the assembled stiffness ('current' tangent or 'initial') and M the
+    lumped mass of the free DOFs; dofs is the (n_eq, 2) array of node tag
+    and 1-based DOF of every equation. Needs the Python backend.
+    """
+    ops = _ops(ops)
+    if not _python(ops):
+        raise RuntimeError('matrices() needs the Python backend; the native '
+                           'interpreter does not expose its matrices')
+    _, domain = _domain()
+    return _matrices(domain, which) + (_dofs(domain),)
+
+
+def _matrices(domain, which):
+    from scipy import sparse
+
+    n = domain.neq
+    rows, cols, vals = domain.stiffness_triplets(which)
+    K = sparse.csr_matrix((vals, (rows, cols)), shape=(n, n))
+    K.sum_duplicates()
+    M = sparse.diags(domain.m, format='csr')
+    return K, M
+
+
+def _dofs(domain):
+    node, dof = np.divmod(domain.free, domain.ndf)
+    return np.column_stack([np.asarray(domain.node_tags)[node], dof + 1])
+
+
+def _solve_sparse(K, M, m, num_modes, sigma, tol):
+    """Lowest modes of K x = lambda M x, normalized to unit modal mass."""
+    from scipy.sparse.linalg import eigsh
+
+    # Shift-invert around sigma; DOFs without mass have infinite
+    # eigenvalues, which never come close to the shift
+    values, vectors = eigsh(K.tocsc(), num_modes, M.tocsc(), sigma=sigma,
+                            which='LM', tol=tol)
+    order = np.argsort(values)
+    values, vectors = values[order], vectors[:, order]
+    vectors /= np.sqrt(np.einsum('ij,i,ij->j', vectors, m, vectors))
+    return values, vectors
+
+
+# -- cache -------------------------------------------------------------------
+
+def _key(parts):
+    h = hashlib.sha1()
+    for name, value in parts:
+        value = np.ascontiguousarray(value)
+        h.update(f'|{name}|{value.dtype.str}|{value.shape}|'.encode())
+        h.update(value.tobytes())
+    return h.hexdigest()
+
+
+def _lookup(key, cache_dir):
+    path = None if cache_dir is None else os.path.join(
+        cache_dir, f'modes-{key}.npz')
+    hit = _cache.get(key)
+    if hit is not None:
+        _cache.move_to_end(key)
+        if path is not None and not os.path.exists(path):
+            # Solved in this process before cache_dir was given
+            _store(key, hit, cache_dir)
+        return hit
+    if path is not None and os.path.exists(path):
+        with np.load(path) as f:
+            hit = (f['values'], f['vectors'], f['node_tags'])
+        _remember(key, hit)
+    return hit
+
+
+def _remember(key, hit):
+    _cache[key] = hit
+    _cache.move_to_end(key)
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _store(key, hit, cache_dir):
+    _remember(key, hit)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f'modes-{key}.npz')
+        # Write under a temporary name so concurrent workers never read a
+        # partial file
+        tmp = f'{path}.{os.getpid()}.tmp.npz'
+        values, vectors, node_tags = hit
+        np.savez(tmp, values=values, vectors=vectors, node_tags=node_tags)
+        os.replace(tmp, path)
+
+
+def clear_cache():
+    """Forget the solutions cached in memory."""
+    _cache.clear()
+
+
+# -- solvers -----------------------------------------------------------------
+
+def solve(num_modes, sigma=0.0, tol=0.0, cache=None, cache_dir=None,
+          key=None, ops=None):
+    """
+    Solve for the lowest modes of the current model.
+
+    Args:
+        num_modes: number of modes
+        sigma: shift of the shift-invert solve; must not be an eigenvalue
+            (use a small negative value for models with rigid-body modes)
+        tol: relative accuracy of the eigenvalues (0: machine precision)
+        cache: reuse and keep results for the same model state (default:
+            always with the Python backend, on the native backend only
+            when key is given, as its hash cannot see material parameters)
+        cache_dir: directory for a cache shared between processes
+        key: extra text added to the model-state hash
+        ops: the command module (default: openfrescopy.opensees)
+
+    Returns:
+        Modes
+    """
+    ops = _ops(ops)
+    num_modes = int(num_modes)
+    if num_modes < 1:
+        raise ValueError('num_modes must be at least 1')
+    if _python(ops):
+        cache = True if cache is None else cache
+        return _solve_python(num_modes, sigma, tol, cache, cache_dir, key)
+    cache = key is not None if cache is None else cache
+    return _solve_native(ops, num_modes, cache, cache_dir, key)
+
+
+def _solve_python(num_modes, sigma, tol, cache, cache_dir, key):
+    session, domain = _domain()
+    K, M = _matrices(domain, 'current')
+    m = domain.m
+    nm = int(np.count_nonzero(m > 0.0))
+    if num_modes > nm:
+        raise ValueError(f'{num_modes} modes requested but only {nm} DOFs '
+                         f'have mass')
+    node_tags = np.asarray(domain.node_tags, dtype=np.int64)
+    digest = _key([('backend', np.frombuffer(b'python', np.uint8)),
+                   ('options', np.array([num_modes, sigma, tol])),
+                   ('extra', np.frombuffer(str(key).encode(), np.uint8)),
+                   ('node_tags', node_tags), ('free', domain.free),
+                   ('indptr', K.indptr), ('indices', K.indices),
+                   ('data', K.data), ('mass', m)])
+    hit = _lookup(digest, cache_dir) if cache else None
+    cached = hit is not None
+    if not cached:
+        if nm <= DENSE_LIMIT or num_modes >= nm - 1:
+            # Too small for Lanczos: the dense solver of eigen() is faster
+            values = np.array(session.analysis.eigen(num_modes))
+            modes = session.eigen_vectors
+        else:
+            values, vectors = _solve_sparse(K, M, m, num_modes, sigma, tol)
+            modes = np.zeros((num_modes,) + domain.U.shape)
+            for k in range(num_modes):
+                domain.from_eq(vectors[:, k], modes[k])
+        hit = (values, modes, node_tags)
+        if cache:
+            _store(digest, hit, cache_dir)
+    values, modes, _ = hit
+    # Make the results visible to nodeEigenvector() like eigen() does
+    session.eigen_values = values
+    session.eigen_vectors = modes
+    return Modes(values, modes, node_tags, digest, cached)
+
+
+def _solve_native(ops, num_modes, cache, cache_dir, key):
+    node_tags = np.asarray(ops.getNodeTags(), dtype=np.int64)
+    ele_tags = np.asarray(ops.getEleTags(), dtype=np.int64)
+    coords = np.concatenate([ops.nodeCoord(int(t)) for t in node_tags])
+    masses = np.concatenate([ops.nodeMass(int(t)) for t in node_tags])
+    disp = np.concatenate([ops.nodeDisp(int(t)) for t in node_tags])
+    conn = np.concatenate([ops.eleNodes(int(t)) for t in ele_tags]) \
+        if len(ele_tags) else np.zeros(0)
+    digest = _key([('backend', np.frombuffer(b'native', np.uint8)),
+                   ('options', np.array([num_modes])),
+                   ('extra', np.frombuffer(str(key).encode(), np.uint8)),
+                   ('node_tags', node_tags), ('coords', coords),
+                   ('mass', masses), ('disp', disp), ('ele_tags', ele_tags),
+                   ('conn', np.asarray(conn, dtype=np.int64))])
+    hit = _lookup(digest, cache_dir) if cache else None
+    cached = hit is not None
+    if not cached:
+        # The default solver of the native eigen command is ARPACK
+        values = np.asarray(ops.eigen(num_modes), dtype=float)
+        ndf = len(ops.nodeEigenvector(int(node_tags[0]), 1)) \
+            if len(node_tags) else 0
+        modes = np.zeros((num_modes, len(node_tags), ndf))
+        for k in range(num_modes):
+            for i, tag in enumerate(node_tags):
+                row = ops.nodeEigenvector(int(tag), k + 1)
+                modes[k, i, :len(row)] = row
+        hit = (values, modes, node_tags)
+        if cache:
+            _store(digest, hit, cache_dir)
+    values, modes, _ = hit
+    return Modes(values, modes, node_tags, digest, cached)
+
+
+def eigen(num_modes, **options):
+    """Return the lowest eigenvalues as a list, like ops.eigen()."""
+    return [float(v) for v in solve(num_modes, **options).values]
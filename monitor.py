@@ -0,0 +1,371 @@
+# openfrescopy/monitor.py
+"""
+Shared-memory ring buffer for live monitoring of an analysis.
+
+A producer (the analysis loop, see openfrescopy.opensees.BackgroundAnalysis)
+publishes one frame per step into a multiprocessing.shared_memory block;
+dashboards and loggers in other processes attach to it by name and read
+the frames without going through the producer:
+
+    +--------+--------+---------------+-----------+-----------+-----------+
+    | header | labels | reader        | frame seq | publish   | frames    |
+    | int64  | JSON   | cursors       | per slot  | stamp     | capacity  |
+    | [16]   | padded | int64[READERS]| int64[cap]| int64[cap]| x (1 + w) |
+    +--------+--------+---------------+-----------+-----------+-----------+
+
+A frame is the analysis time followed by the published values. The
+producer never waits: it overwrites the oldest slot, marking it while the
+write is in progress (seqlock-style), so a reader that falls more than
+`capacity` frames behind loses the oldest frames and counts them as
+dropped. Readers publish their cursor in the header, which lets the
+producer count the frames it overwrote before every reader had seen them.
+
+Usage (reader process):
+    from openfrescopy import monitor
+
+    reader = monitor.RingReader('ofp-ring-1234')
+    while True:
+        frames = reader.poll()           # new frames since the last poll
+        plot(frames.time, frames['3/1'])
+        reader.dropped, reader.lag, reader.latency
+"""
+
+import json
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = 0x4F46524D      # 'OFRM'
+VERSION = 1
+READERS = 16
+
+# Header fields (int64 indices)
+_MAGIC, _VERSION, _WIDTH, _CAPACITY, _WRITTEN, _CLOSED, _LABELS, _DATA, \
+    _OVERWRITTEN = range(9)
+_HEADER = 16
+_ALIGN = 64
+
+_clock = time.monotonic_ns
+
+
+def _layout(width, capacity, labels_len):
+    """Byte offsets of the regions of a ring."""
+    labels = 8*_HEADER
+    cursors = labels + labels_len + (-(labels + labels_len) % _ALIGN)
+    seq = cursors + 8*READERS
+    stamp = seq + 8*capacity
+    data = stamp + 8*capacity
+    data += -data % _ALIGN
+    return cursors, seq, stamp, data, data + 8*capacity*(1 + width)
+
+
+def _attach(name, track):
+    """Open an existing block, optionally leaving the resource tracker out."""
+    shm = shared_memory.SharedMemory(name=name)
+    # Before Python 3.13 attaching registers the block with the resource
+    # tracker, which unlinks it when the process exits. Processes started by
+    # multiprocessing share the tracker of their parent and keep the
+    # registration; any other process must drop it.
+    if not track:
+        try:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+    return shm
+
+
+class SharedRing:
+    """
+    A ring of fixed-width float64 frames in shared memory.
+
+    Use create() in the producer and attach() (or RingReader) elsewhere.
+
+    Attributes:
+        name: shared memory name to attach to
+        labels: labels of the values of a frame
+        capacity: number of frames kept
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.name = shm.name
+        buf = shm.buf
+        self.header = np.ndarray((_HEADER,), dtype=np.int64, buffer=buf)
+        if self.header[_MAGIC] != MAGIC:
+            raise ValueError(f'{shm.name}: not a monitoring ring')
+        if self.header[_VERSION] > VERSION:
+            raise ValueError(f'{shm.name}: unsupported ring version '
+                             f'{self.header[_VERSION]}')
+        width = int(self.header[_WIDTH])
+        capacity = int(self.header[_CAPACITY])
+        labels_len = int(self.header[_LABELS])
+        cursors, seq, stamp, data, _ = _layout(width, capacity, labels_len)
+        text = bytes(buf[8*_HEADER:8*_HEADER + labels_len])
+        self.labels = json.loads(text.decode('utf-8'))
+        self.width = width
+        self.capacity = capacity
+        self.cursors = np.ndarray((READERS,), dtype=np.int64, buffer=buf,
+                                  offset=cursors)
+        self.seq = np.ndarray((capacity,), dtype=np.int64, buffer=buf,
+                              offset=seq)
+        self.stamp = np.ndarray((capacity,), dtype=np.int64, buffer=buf,
+                                offset=stamp)
+        self.data = np.ndarray((capacity, 1 + width), dtype=np.float64,
+                               buffer=buf, offset=data)
+        self._next = int(self.header[_WRITTEN])
+
+    @classmethod
+    def create(cls, labels, capacity=4096, name=None):
+        """Create a ring for frames with the given value labels."""
+        labels = list(labels)
+        capacity = int(capacity)
+        if capacity < 2:
+            raise ValueError('capacity must be at least 2')
+        text = json.dumps(labels, separators=(',', ':')).encode('utf-8')
+        cursors, _, _, data, size = _layout(len(labels), capacity, len(text))
+        if name is None:
+            name = f'ofp-ring-{os.getpid()}-{os.urandom(4).hex()}'
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_VERSION] = VERSION
+        header[_WIDTH] = len(labels)
+        header[_CAPACITY] = capacity
+        header[_LABELS] = len(text)
+        header[_DATA] = data
+        shm.buf[8*_HEADER:8*_HEADER + len(text)] = text
+        np.ndarray((READERS,), dtype=np.int64, buffer=shm.buf,
+                   offset=cursors)[:] = -1
+        # Written last: readers check the magic before anything else
+        header[_MAGIC] = MAGIC
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name, track=False):
+        """
+        Attach to a ring created by another process.
+
+        Pass track=True in processes started by multiprocessing from the
+        creator, which share its resource tracker.
+        """
+        return cls(_attach(name, track), owner=False)
+
+    def __repr__(self):
+        return (f'SharedRing({self.name!r}, width={self.width}, '
+                f'capacity={self.capacity}, written={self.written})')
+
+    @property
+    def written(self):
+        """Number of frames published so far."""
+        return int(self.header[_WRITTEN])
+
+    @property
+    def closed(self):
+        """True once the producer has finished."""
+        return bool(self.header[_CLOSED])
+
+    @property
+    def overwritten(self):
+        """Frames overwritten before every attached reader had read them."""
+        return int(self.header[_OVERWRITTEN])
+
+    # -- producer ------------------------------------------------------------
+
+    def begin(self):
+        """
+        Return the values row of the next frame to fill in place.
+
+        The slot is marked as being written until commit().
+        """
+        n = self._next
+        k = n % self.capacity
+        if n >= self.capacity:
+            # Count the frame being replaced if an attached reader still
+            # needs it
+            cursors = self.cursors
+            if ((cursors >= 0) & (cursors <= n - self.capacity)).any():
+                self.header[_OVERWRITTEN] += 1
+        self.seq[k] = -1
+        return self.data[k, 1:]
+
+    def commit(self, t):
+        """Publish the frame filled since begin() with analysis time t."""
+        n = self._next
+        k = n % self.capacity
+        self.data[k, 0] = t
+        self.stamp[k] = _clock()
+        self.seq[k] = n
+        self._next = n + 1
+        self.header[_WRITTEN] = n + 1
+
+    def publish(self, t, values):
+        """Copy values into the next frame and publish it."""
+        self.begin()[:] = values
+        self.commit(t)
+
+    def finish(self):
+        """Tell the readers that no more frames follow."""
+        self.header[_CLOSED] = 1
+
+    # -- lifetime ------------------------------------------------------------
+
+    def close(self):
+        """Release this process's mapping (the views become unusable)."""
+        if self.shm is None:
+            return
+        self.header = self.cursors = self.seq = self.stamp = self.data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Frames:
+    """
+    Frames returned by RingReader.poll().
+
+    time, values and seq are views into the reader's buffer and are
+    overwritten by the next poll().
+    """
+
+    def __init__(self, reader, seq, block):
+        self._reader = reader
+        self.seq = seq
+        self.time = block[:, 0]
+        self.values = block[:, 1:]
+
+    def __len__(self):
+        return len(self.seq)
+
+    def __getitem__(self, label):
+        """Return the column with the given label (or index)."""
+        if isinstance(label, str):
+            label = self._reader.index[label]
+        return self.values[:, label]
+
+
+class RingReader:
+    """
+    Reader of a SharedRing in any process.
+
+    Args:
+        ring: SharedRing or the shared memory name of one
+        start: 'latest' to skip the frames already published, or 'oldest'
+            to begin with the oldest frame still in the ring
+        max_frames: size of the poll buffer (default: the ring capacity)
+
+    Attributes:
+        frames: frames read so far
+        dropped: frames that were overwritten before this reader got them
+        lag: frames the reader was behind at the last poll
+        latency: seconds from the publication of the newest frame to the
+            last poll that returned it
+    """
+
+    def __init__(self, ring, start='latest', max_frames=None):
+        if isinstance(ring, str):
+            ring = SharedRing.attach(ring)
+        self.ring = ring
+        self.index = {label: j for j, label in enumerate(ring.labels)}
+        written = ring.written
+        if start == 'latest':
+            self.cursor = written
+        elif start == 'oldest':
+            self.cursor = max(0, written - ring.capacity)
+        else:
+            raise ValueError(f"start must be 'latest' or 'oldest', not "
+                             f"{start!r}")
+        self.frames = 0
+        self.dropped = 0
+        self.lag = 0
+        self.latency = 0.0
+        n = ring.capacity if max_frames is None else int(max_frames)
+        self._buf = np.empty((n, 1 + ring.width))
+        self._seq = np.empty(n, dtype=np.int64)
+        # Claim a cursor slot so the producer can see how far we are
+        self._slot = None
+        free = np.flatnonzero(ring.cursors < 0)
+        if len(free):
+            self._slot = int(free[0])
+            ring.cursors[self._slot] = self.cursor
+
+    @property
+    def labels(self):
+        return self.ring.labels
+
+    @property
+    def closed(self):
+        """True when the producer has finished and every frame was read."""
+        return self.ring.closed and self.cursor >= self.ring.written
+
+    def poll(self, max_frames=None):
+        """
+        Return the frames published since the last poll as a Frames view.
+
+        Never blocks; returns an empty Frames if nothing is new. Frames the
+        producer overwrote before or during the copy are skipped and counted
+        in dropped.
+        """
+        ring = self.ring
+        cap = ring.capacity
+        written = ring.written
+        start = max(self.cursor, written - cap)
+        self.dropped += start - self.cursor
+        limit = len(self._buf) if max_frames is None else min(
+            int(max_frames), len(self._buf))
+        n = min(written - start, limit)
+        seq = self._seq[:n]
+        seq[:] = np.arange(start, start + n)
+        slots = seq % cap
+        block = self._buf[:n]
+        np.take(ring.data, slots, axis=0, out=block)
+        # Frames whose slot changed while copying were overwritten; they are
+        # always the oldest ones, so the valid frames form a suffix
+        bad = np.flatnonzero(ring.seq[slots] != seq)
+        skip = int(bad[-1]) + 1 if len(bad) else 0
+        self.dropped += skip
+        self.cursor = start + n
+        self.lag = written - start
+        if self._slot is not None:
+            ring.cursors[self._slot] = self.cursor
+        if n > skip:
+            self.latency = 1e-9*(_clock() - int(ring.stamp[slots[-1]]))
+        self.frames += n - skip
+        return Frames(self, seq[skip:], block[skip:])
+
+    def latest(self):
+        """Return (time, values copy) of the newest frame, or None."""
+        ring = self.ring
+        while True:
+            written = ring.written
+            if written == 0:
+                return None
+            k = (written - 1) % ring.capacity
+            row = ring.data[k].copy()
+            if ring.seq[k] == written - 1:
+                return row[0], row[1:]
+
+    def close(self):
+        """Release the cursor slot and, for a ring attached by name, detach."""
+        if self.ring is None:
+            return
+        if self._slot is not None and self.ring.shm is not None:
+            self.ring.cursors[self._slot] = -1
+        if not self.ring.owner:
+            self.ring.close()
+        self.ring = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -7,39 +7,103 @@ and its required DLL dependencies. The .pyd file is in this subpackage directory
 and DLLs are shared here for use by both openfresco and opensees modules.
 Users typically import from the parent package (import openfrescopy), but this
 submodule can also be imported directly as an alternative.
+
+With OPENFRESCOPY_LAZY=1 the extension is only imported when the first
+command is accessed, and each command is cached on first use.
 """
 
-# IMPORTANT: Set up DLL search path BEFORE importing any extensions
 import os
 import sys
 from pathlib import Path
 
+from .._loader import LAZY as _LAZY
+from .._loader import phase as _phase
+
 # Get the directory containing this __init__.py file (where .pyd and DLLs are located)
 openfresco_dir = Path(__file__).parent.resolve()
 
-# Use Windows AddDllDirectory for DLL loading (Python 3.8+)
-# This MUST be done before importing the .pyd extension
-os.add_dll_directory(str(openfresco_dir))
+_core = None
+_loaded = False
+
+
+def _setup_paths():
+    """Make OpenFrescoPy.pyd and its DLLs findable."""
+    # Use Windows AddDllDirectory for DLL loading (Python 3.8+)
+    # This MUST be done before importing the .pyd extension
+    # (the binaries are Windows-only, elsewhere the import below fails)
+    if hasattr(os, 'add_dll_directory'):
+        os.add_dll_directory(str(openfresco_dir))
+
+    # Add this directory to sys.path so Python can find OpenFrescoPy.pyd
+    # This is necessary because OpenFrescoPy is a top-level module
+    if str(openfresco_dir) not in sys.path:
+        sys.path.insert(0, str(openfresco_dir))
+
+
+def _load():
+    """Import the core module (OpenFrescoPy.pyd) once and return it."""
+    global _core, _loaded, _import_error
+    if _loaded:
+        return _core
+    _loaded = True
+
+    # IMPORTANT: Set up DLL search path BEFORE importing any extensions
+    # A failure here is reported like a failed import, not raised
+    with _phase('openfresco', 'path setup'):
+        try:
+            _setup_paths()
+        except Exception as e:
+            _import_error = e
+            _core = None
+            return _core
+
+    # Now try to import the core module (OpenFrescoPy.pyd)
+    # DLL path is already set up above
+    with _phase('openfresco', 'extension import'):
+        try:
+            import OpenFrescoPy as _core
+        except Exception as e:
+            _import_error = e
+            _core = None
+    return _core
+
+
+def __getattr__(name):
+    # Resolve commands on first access and cache them in the module namespace
+    # so later lookups bypass this hook. Private names never trigger a load.
+    if name.startswith('_') and name != '__all__':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    core = _load()
+    if core is None:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r} (OpenFrescoPy "
+            f"could not be imported: {globals().get('_import_error')})")
+    if name == '__all__':
+        return [n for n in dir(core) if not n.startswith('_')]
+    with _phase('openfresco', 'export'):
+        try:
+            value = getattr(core, name)
+        except AttributeError:
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}") from None
+        globals()[name] = value
+    return value
+
 
-# Add this directory to sys.path so Python can find OpenFrescoPy.pyd
-# This is necessary because OpenFrescoPy is a top-level module
-if str(openfresco_dir) not in sys.path:
-    sys.path.insert(0, str(openfresco_dir))
+def __dir__():
+    names = set(globals())
+    core = _load()
+    if core is not None:
+        names.update(n for n in dir(core) if not n.startswith('_'))
+    return sorted(names)
 
-# Now try to import the core module (OpenFrescoPy.pyd)
-# DLL path is already set up above
-try:
-    import OpenFrescoPy as _core
-except Exception as e:
-    _import_error = e
-    _core = None
 
 # If the core module was successfully imported, expose its public API
-if _core is not None:
-    _existing_names = set(globals().keys())
-    
-    for _name in dir(_core):
-        if (not _name.startswith('_') and 
-            _name not in _existing_names):
-            globals()[_name] = getattr(_core, _name)
+if not _LAZY and _load() is not None:
+    with _phase('openfresco', 'export'):
+        _existing_names = set(globals().keys())
 
+        for _name in dir(_core):
+            if (not _name.startswith('_') and
+                _name not in _existing_names):
+                globals()[_name] = getattr(_core, _name)
@@ -36,65 +36,198 @@ Usage:
     OpenFrescoPy hybrid simulation commands are also available:
         ops.expElement("twoNodeLink", 1, 1, 3, "-dir", 2, "-site", 1,
                       "-initStif", 2.8)
+
+    With OPENFRESCOPY_LAZY=1, opensees.pyd is only imported (and the
+    OpenFrescoPy package only loaded) when the first command is accessed,
+    and each command is cached on first use.
 """
 
-# IMPORTANT: Set up DLL search path BEFORE importing any extensions
+import importlib
 import os
 import sys
 from pathlib import Path
 
+from .._loader import BACKEND as _BACKEND
+from .._loader import LAZY as _LAZY
+from .._loader import phase as _phase
+from . import _hooks
+
 # Get the package root directory and subpackage directories
 package_dir = Path(__file__).parent.parent.resolve()
 opensees_dir = Path(__file__).parent.resolve()  # This subpackage directory
 openfresco_dir = package_dir / "openfresco"  # Where shared DLLs are located
 
-# Use Windows AddDllDirectory for DLL loading (Python 3.8+)
-# This MUST be done before importing the .pyd extension
-# DLLs are in openfresco subpackage where they're shared
-os.add_dll_directory(str(openfresco_dir))
-os.add_dll_directory(str(opensees_dir))
-
-# Also add to PATH for loadPackage() which uses native Windows DLL loading
-# loadPackage() looks for OpenFrescoPy.dll and may not respect os.add_dll_directory
-openfresco_dir_str = str(openfresco_dir)
-current_path = os.environ.get('PATH', '')
-if openfresco_dir_str not in current_path:
-    os.environ['PATH'] = openfresco_dir_str + os.pathsep + current_path
-
-# Add opensees directory to sys.path so Python can find opensees.pyd
-# opensees.pyd is a top-level module, so we need to add its directory to sys.path
-if str(opensees_dir) not in sys.path:
-    sys.path.insert(0, str(opensees_dir))
-
-# Now try to import the OpenSeesPy API module (opensees.pyd)
-# DLL path is already set up above
-try:
-    import opensees as _ops
-except Exception as e:
-    _import_error = e
-    _ops = None
-
-# Load the OpenFrescoPy package (OpenFrescoPy.dll) into the OpenSeesPy API
-# This extends opensees.pyd with OpenFrescoPy hybrid simulation capabilities
-# Note: loadPackage expects "OpenFrescoPy" (capitalized) as the package name
-if _ops is not None:
-    try:
-        _ops.loadPackage('OpenFrescoPy')
-    except Exception as e:
-        # If loadPackage fails, log but don't fail the import
-        _package_load_error = e
-    
-    # Expose all public attributes from the OpenSeesPy API (including
-    # OpenFrescoPy functions). This allows users to import directly from the
-    # module instead of accessing _ops. 
-    # Example: 
-    #   import openfrescopy.opensees as ops;
-    #   ops.model(...); 
-    #   ops.expElement(...)
-    # Iterate through all attributes in the opensees module
-    for _name in dir(_ops):
-        # Only expose public attributes (those not starting with underscore)
-        if not _name.startswith('_'):
-            # Add each public attribute to this module's global namespace
-            globals()[_name] = getattr(_ops, _name)
+_ops = None
+_loaded = False
+_backend = None
+
+# Python-side helpers, imported from their private submodule on first access
+# so that importing this module stays as cheap as the loader allows
+_HELPERS = {
+    'run_transient': '_driver',
+    'NodeOutput': '_driver',
+    'ElementOutput': '_driver',
+    'TransientResult': '_driver',
+    'binary_recorder': '_recorders',
+    'remove_binary_recorder': '_recorders',
+    'BinaryRecorder': '_recorders',
+    'decimating_recorder': '_recorders',
+    'DecimatingRecorder': '_recorders',
+    'LimitTrigger': '_recorders',
+    'site_dispatch': '_sites',
+    'site_timing': '_sites',
+    'start_profiling': '_profile',
+    'stop_profiling': '_profile',
+    'StepProfiler': '_profile',
+    'RealTimeRunner': '_realtime',
+    'RealTimeResult': '_realtime',
+    'build_from_arrays': '_build',
+    'checkpoint': '_checkpoint',
+    'restore': '_checkpoint',
+    'Checkpoint': '_checkpoint',
+    'gather': '_gather',
+    'Gatherer': '_gather',
+    'BackgroundAnalysis': '_background',
+}
+
+
+def _setup_paths():
+    """Make opensees.pyd, OpenFrescoPy.dll and the shared DLLs findable."""
+    # Use Windows AddDllDirectory for DLL loading (Python 3.8+)
+    # This MUST be done before importing the .pyd extension
+    # DLLs are in openfresco subpackage where they're shared
+    # (the binaries are Windows-only, elsewhere the import below fails)
+    if hasattr(os, 'add_dll_directory'):
+        os.add_dll_directory(str(openfresco_dir))
+        os.add_dll_directory(str(opensees_dir))
+
+    # Also add to PATH for loadPackage() which uses native Windows DLL loading
+    # loadPackage() looks for OpenFrescoPy.dll and may not respect os.add_dll_directory
+    openfresco_dir_str = str(openfresco_dir)
+    current_path = os.environ.get('PATH', '')
+    if openfresco_dir_str not in current_path:
+        os.environ['PATH'] = openfresco_dir_str + os.pathsep + current_path
+
+    # Add opensees directory to sys.path so Python can find opensees.pyd
+    # opensees.pyd is a top-level module, so we need to add its directory to sys.path
+    if str(opensees_dir) not in sys.path:
+        sys.path.insert(0, str(opensees_dir))
+
+
+def _load():
+    """
+    Import opensees.pyd and load OpenFrescoPy into it once; return it.
+
+    Falls back to the Python stand-in backend (openfrescopy.pysim) if the
+    native modules cannot be loaded, unless OPENFRESCOPY_BACKEND=native.
+    """
+    global _ops, _loaded, _backend
+    if _loaded:
+        return _ops
+    _loaded = True
+
+    if _BACKEND != 'python':
+        _load_native()
+        if _ops is not None:
+            _backend = 'native'
+    if _ops is None and _BACKEND != 'native':
+        with _phase('opensees', 'python backend'):
+            from .. import pysim as _ops
+        _backend = 'python'
+    return _ops
+
+
+def _load_native():
+    """Import opensees.pyd and load the OpenFrescoPy package into it."""
+    global _ops, _import_error, _package_load_error
+
+    # IMPORTANT: Set up DLL search path BEFORE importing any extensions
+    with _phase('opensees', 'path setup'):
+        _setup_paths()
+
+    # Now try to import the OpenSeesPy API module (opensees.pyd)
+    # DLL path is already set up above
+    with _phase('opensees', 'extension import'):
+        try:
+            import opensees as _ops
+        except Exception as e:
+            _import_error = e
+            _ops = None
+
+    # Load the OpenFrescoPy package (OpenFrescoPy.dll) into the OpenSeesPy API
+    # This extends opensees.pyd with OpenFrescoPy hybrid simulation capabilities
+    # Note: loadPackage expects "OpenFrescoPy" (capitalized) as the package name
+    if _ops is not None:
+        with _phase('opensees', 'loadPackage'):
+            try:
+                _ops.loadPackage('OpenFrescoPy')
+            except Exception as e:
+                # If loadPackage fails, log but don't fail the import
+                _package_load_error = e
+                # Without OpenFrescoPy, prefer the Python backend in auto mode
+                if _BACKEND == 'auto':
+                    _ops = None
+
+
+def backend():
+    """
+    Return 'native' or 'python' for the OpenSees implementation in use
+    (loading it if necessary), or None if neither could be loaded.
+    """
+    _load()
+    return _backend
+
+
+def __getattr__(name):
+    # Resolve commands on first access and cache them in the module namespace
+    # so later lookups bypass this hook. Private names never trigger a load.
+    if name.startswith('_') and name != '__all__':
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if name in _HELPERS:
+        module = importlib.import_module('.' + _HELPERS[name], __name__)
+        value = globals()[name] = getattr(module, name)
+        return value
+    ops = _load()
+    if ops is None:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r} (opensees "
+            f"could not be imported: {globals().get('_import_error')})")
+    if name == '__all__':
+        return list(_HELPERS) + [n for n in dir(ops) if not n.startswith('_')]
+    with _phase('opensees', 'export'):
+        try:
+            value = _hooks.wrap(name, getattr(ops, name))
+        except AttributeError:
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}") from None
+        globals()[name] = value
+    return value
+
+
+def __dir__():
+    names = set(globals()) | set(_HELPERS)
+    ops = _load()
+    if ops is not None:
+        names.update(n for n in dir(ops) if not n.startswith('_'))
+    return sorted(names)
+
 
+# Expose all public attributes from the OpenSeesPy API (including
+# OpenFrescoPy functions). This allows users to import directly from the
+# module instead of accessing _ops. In lazy mode this is skipped and
+# __getattr__ resolves each command on first use instead.
+# Example: 
+#   import openfrescopy.opensees as ops;
+#   ops.model(...); 
+#   ops.expElement(...)
+if not _LAZY and _load() is not None:
+    with _phase('opensees', 'export'):
+        # Iterate through all attributes in the opensees module
+        for _name in dir(_ops):
+            # Only expose public attributes (those not starting with underscore)
+            # and leave the Python helpers to __getattr__, so a native command
+            # of the same name (restore) does not shadow them
+            if not _name.startswith('_') and _name not in _HELPERS:
+                # Add each public attribute to this module's global namespace
+                # (analyze/record/wipe are wrapped to run the step hooks)
+                globals()[_name] = _hooks.wrap(_name, getattr(_ops, _name))
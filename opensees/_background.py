@@ -0,0 +1,263 @@
+# openfrescopy/opensees/_background.py
+"""
+Analysis in the background with live monitoring for openfrescopy.opensees.
+
+BackgroundAnalysis runs the analysis loop in a dedicated thread or process
+and publishes the selected responses after every step into a shared-memory
+ring (openfrescopy.monitor), from which plots and loggers in any process
+read without slowing the analysis down:
+
+    bg = ops.BackgroundAnalysis(1790, 20.0/1024.0, outputs={
+        'disp': ops.NodeOutput([3, 4], [1], 'disp'),
+        'daqForce': ops.ElementOutput([1, 2], 'daqForce'),
+    })
+    bg.start()
+    reader = bg.reader()          # or monitor.RingReader(bg.name) elsewhere
+    while bg.running:
+        frames = reader.poll()
+        ...
+    print(bg.join())
+
+In 'thread' mode the model built in this process is analyzed in a thread;
+no other OpenSees commands may be issued until it has finished. In
+'process' mode a build(ops, *build_args) function creates the model in a
+child process, so the analysis does not compete with the caller for the
+interpreter lock. The producer never waits for readers; frames a reader
+misses are counted on both sides (RingReader.dropped, ring.overwritten).
+"""
+
+import multiprocessing
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker
+
+from ..monitor import SharedRing
+from ._driver import _samplers
+
+
+def _labels(samplers):
+    return [f'{name}:{label}' for name, (_, labels) in samplers.items()
+            for label in labels]
+
+
+def _fills(samplers):
+    """Fill functions with the column range of each output in a frame."""
+    fills = []
+    start = 0
+    for fill, labels in samplers.values():
+        fills.append((fill, start, start + len(labels)))
+        start += len(labels)
+    return fills
+
+
+def _loop(ops, ring, fills, n_steps, dt, stop, period):
+    """Run the steps and publish a frame after each; return the stats."""
+    analyze = ops.analyze
+    get_time = ops.getTime
+    clock = time.perf_counter
+    status = 0
+    steps = 0
+    t_start = clock()
+    next_start = t_start
+    for k in range(n_steps):
+        if stop.is_set():
+            break
+        if period is not None:
+            # Pace the steps without blocking readers
+            delay = next_start - clock()
+            if delay > 0.0:
+                time.sleep(delay)
+            next_start += period
+        status = analyze(1, dt)
+        if status != 0:
+            break
+        row = ring.begin()
+        for fill, lo, hi in fills:
+            fill(row[lo:hi])
+        ring.commit(get_time())
+        steps = k + 1
+    ring.finish()
+    return {'steps': steps, 'status': status, 'elapsed': clock() - t_start,
+            'published': ring.written, 'overwritten': ring.overwritten}
+
+
+def _child(conn, stop, build, build_args, outputs, n_steps, dt, period):
+    """Entry point of the analysis process."""
+    import openfrescopy.opensees as ops
+    ring = None
+    try:
+        build(ops, *build_args)
+        samplers = _samplers(ops, outputs)
+        conn.send(('labels', _labels(samplers)))
+        kind, name = conn.recv()
+        if kind != 'ring':
+            return
+        ring = SharedRing.attach(name, track=True)
+        conn.send(('result', _loop(ops, ring, _fills(samplers), n_steps, dt,
+                                   stop, period)))
+    except BaseException as e:
+        # Mark the ring finished, as the thread mode does, so that readers
+        # waiting for it to close are released
+        if ring is not None:
+            ring.finish()
+        conn.send(('error', f'{type(e).__name__}: {e}'))
+    finally:
+        if ring is not None:
+            ring.close()
+        conn.close()
+
+
+class BackgroundAnalysis:
+    """
+    Run analysis steps in the background and publish them to a ring.
+
+    Args:
+        n_steps: number of analysis steps
+        dt: analysis time step
+        outputs: {name: NodeOutput | ElementOutput} responses to publish;
+            the ring labels are 'name:tag/dof' ('name:tag/component')
+        capacity: number of frames the ring keeps
+        mode: 'thread' or 'process'
+        build: function(ops, *build_args) that builds the model ('process'
+            mode; must be picklable)
+        build_args: extra arguments of build
+        period: optional wall time between step starts in seconds
+        name: shared memory name of the ring (default: generated)
+        mp_context: multiprocessing start method for 'process' mode
+
+    Attributes:
+        name: shared memory name of the ring after start()
+        ring: the SharedRing (owned by this object; close() unlinks it)
+        result: stats of the finished run (see join())
+    """
+
+    def __init__(self, n_steps, dt, outputs, capacity=4096, mode='thread',
+                 build=None, build_args=(), period=None, name=None,
+                 mp_context=None):
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"mode must be 'thread' or 'process', not "
+                             f"{mode!r}")
+        if mode == 'process' and build is None:
+            raise ValueError("'process' mode needs a build function")
+        self.n_steps = int(n_steps)
+        self.dt = dt
+        self.outputs = dict(outputs)
+        self.capacity = capacity
+        self.mode = mode
+        self.build = build
+        self.build_args = tuple(build_args)
+        self.period = period
+        self._name = name
+        self._mp_context = mp_context
+        self.ring = None
+        self.result = None
+        self._stop = None
+        self._worker = None
+        self._conn = None
+
+    @property
+    def name(self):
+        return None if self.ring is None else self.ring.name
+
+    @property
+    def running(self):
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self):
+        """Start the analysis; returns once the ring exists."""
+        if self._worker is not None:
+            raise RuntimeError('the analysis has already been started')
+        if self.mode == 'thread':
+            ops = sys.modules[__package__]
+            samplers = _samplers(ops, self.outputs)
+            self.ring = SharedRing.create(_labels(samplers), self.capacity,
+                                          self._name)
+            self._stop = threading.Event()
+
+            def run():
+                try:
+                    self.result = _loop(ops, self.ring, _fills(samplers),
+                                        self.n_steps, self.dt, self._stop,
+                                        self.period)
+                except BaseException as e:
+                    self.ring.finish()
+                    self.result = {'error': f'{type(e).__name__}: {e}'}
+
+            self._worker = threading.Thread(target=run, daemon=True,
+                                            name='openfrescopy-analysis')
+            self._worker.start()
+            return self
+
+        ctx = multiprocessing.get_context(self._mp_context)
+        # Start the resource tracker before the child, which then shares it;
+        # otherwise the child's own tracker unlinks the ring when it exits
+        resource_tracker.ensure_running()
+        self._stop = ctx.Event()
+        self._conn, child = ctx.Pipe()
+        self._worker = ctx.Process(
+            target=_child, daemon=True,
+            args=(child, self._stop, self.build, self.build_args,
+                  self.outputs, self.n_steps, self.dt, self.period))
+        self._worker.start()
+        child.close()
+        kind, value = self._conn.recv()
+        if kind == 'error':
+            self._worker.join()
+            raise RuntimeError(f'building the model failed: {value}')
+        self.ring = SharedRing.create(value, self.capacity, self._name)
+        self._conn.send(('ring', self.ring.name))
+        return self
+
+    def reader(self, start='oldest', max_frames=None):
+        """Return a RingReader of the ring in this process."""
+        from ..monitor import RingReader
+        return RingReader(self.ring, start, max_frames)
+
+    def stop(self):
+        """Ask the analysis to stop after the current step."""
+        if self._stop is not None:
+            self._stop.set()
+
+    def join(self, timeout=None):
+        """
+        Wait for the analysis and return its stats.
+
+        The stats are 'steps', 'status' (analyze() return code), 'elapsed'
+        (s), 'published' frames and frames 'overwritten' before every
+        reader had them, or 'error' if the analysis raised. Returns None if
+        the timeout expired.
+        """
+        if self._worker is None:
+            raise RuntimeError('the analysis has not been started')
+        if self.mode == 'process' and self.result is None:
+            if not self._conn.poll(timeout):
+                return None
+            try:
+                kind, value = self._conn.recv()
+                self.result = value if kind == 'result' else {'error': value}
+            except EOFError:
+                self.result = {'error': 'the analysis process exited '
+                                        'unexpectedly'}
+        self._worker.join(timeout)
+        if self._worker.is_alive():
+            return None
+        return self.result
+
+    def close(self):
+        """Stop the analysis, wait for it and remove the ring."""
+        if self._worker is not None and self._worker.is_alive():
+            self.stop()
+            self.join()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
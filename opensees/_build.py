@@ -0,0 +1,384 @@
+# openfrescopy/opensees/_build.py
+"""
+Array-based model building for openfrescopy.opensees.
+
+build_from_arrays() creates the nodes, constraints, trusses and experimental
+twoNodeLinks of a model from NumPy arrays instead of one command per object:
+
+    ops.model('basic', '-ndm', 2, '-ndf', 2)
+    ops.uniaxialMaterial('Elastic', 1, 2.0e5)
+    ... expControl, expSetup, expSite ...
+    ops.build_from_arrays(
+        nodes=np.array([[1, 0.0, 0.0], [2, 0.0, 54.0], ...]),
+        masses=np.array([[3, 0.04, 0.0], [4, 0.02, 0.0]]),
+        fixes=np.array([[1, 1, 1], [2, 1, 1], ...]),
+        elements={'truss': np.array([[1, 3, 4, 5.0, 1]])},
+        exp_elements={'twoNodeLink': np.array([[2, 1, 3, 1, 1, 2.8],
+                                               [3, 2, 4, 1, 2, 5.6]])})
+
+Table layouts (one row per object, optional trailing columns in brackets):
+
+    nodes        tag, x(, y(, z))           the width sets ndm
+    masses       tag, m1(, m2, ...)         up to ndf values
+    fixes        tag, flag1, ..., flagNdf   flags are 0 or 1
+    truss        tag, iNode, jNode, A, matTag(, rho)
+    twoNodeLink  tag, iNode, jNode, dir, siteTag, initStif(, mass)
+
+Structured arrays are accepted and read in field order. A bare array for
+elements is taken as trusses and one for exp_elements as twoNodeLinks.
+
+All tables are checked at once with array operations (integral and unique
+tags, finite values, existing nodes, distinct end nodes, nonzero truss
+lengths, valid directions) and ValueError names the first bad row. Models
+are keyed by a hash of the array contents; a repeated build of the same
+arrays reuses the checked, normalized definition from an in-memory cache
+(and from JSON files in cache_dir, across processes) instead of checking
+it again. With the Python backend the definition is added to the domain
+in bulk, after every node, element, material and site tag it refers to has
+been checked; the native interpreter has no bulk API, so there it takes one
+call per object.
+Materials, time series and the experimental control, setup and site
+objects are still defined with the usual commands, before the call.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+# Number of normalized model definitions kept in memory
+_CACHE_SIZE = 8
+_cache = collections.OrderedDict()
+
+# Accepted element types and table widths
+_ELEMENT_WIDTHS = {'truss': (5, 6)}
+_EXP_WIDTHS = {'twoNodeLink': (6, 7)}
+
+
+def _table(values, name, widths):
+    """Return values as a 2D float array, or None when not given."""
+    if values is None:
+        return None
+    values = np.asarray(values)
+    if values.dtype.names is not None:
+        from numpy.lib import recfunctions
+        values = recfunctions.structured_to_unstructured(values, dtype=float)
+    values = np.array(values, dtype=float, ndmin=2)
+    if values.ndim != 2 or values.shape[1] not in widths:
+        allowed = ' or '.join(map(str, widths))
+        raise ValueError(f'{name}: expected rows of {allowed} columns, got '
+                         f'shape {values.shape}')
+    bad = ~np.isfinite(values).all(axis=1)
+    if bad.any():
+        raise ValueError(f'{name}: row {int(np.argmax(bad))} has non-finite '
+                         f'values')
+    return values
+
+
+def _integral(values, name, what, rows):
+    """Check that values are positive integers; return them as int64."""
+    bad = (values != np.round(values)) | (values < 1)
+    if bad.any():
+        k = int(np.argmax(bad))
+        raise ValueError(f'{name}: row {rows[k]} has an invalid {what} '
+                         f'{values[k]:g}')
+    return values.astype(np.int64)
+
+
+def _unique(tags, name, what):
+    """Raise ValueError if tags has duplicates."""
+    ordered = np.sort(tags)
+    dup = ordered[1:] == ordered[:-1]
+    if dup.any():
+        raise ValueError(f'{name}: duplicate {what} tag '
+                         f'{int(ordered[1:][dup][0])}')
+
+
+class _NodeIndex:
+    """Lookup from node tags to rows of the nodes table."""
+
+    def __init__(self, tags):
+        self.order = np.argsort(tags, kind='stable')
+        self.sorted = tags[self.order]
+
+    def rows(self, refs, name, what):
+        """Return the node rows of refs; raise if a node does not exist."""
+        pos = np.minimum(np.searchsorted(self.sorted, refs),
+                         len(self.sorted) - 1)
+        bad = self.sorted[pos] != refs
+        if bad.any():
+            k = int(np.argmax(bad))
+            raise ValueError(f'{name}: row {k} refers to {what} '
+                             f'{int(refs[k])}, which is not defined')
+        return self.order[pos]
+
+
+def _check(nodes, masses, fixes, elements, exp_elements, ndf):
+    """Validate the tables and return the normalized model definition."""
+    nodes = _table(nodes, 'nodes', (2, 3, 4))
+    ndm = nodes.shape[1] - 1
+    n = len(nodes)
+    node_tags = _integral(nodes[:, 0], 'nodes', 'tag', np.arange(n))
+    _unique(node_tags, 'nodes', 'node')
+    index = _NodeIndex(node_tags)
+    coords = nodes[:, 1:]
+    max_ndf = ndf or 6
+    plan = {'ndm': ndm, 'node_tags': node_tags.tolist(),
+            'coords': coords.tolist(), 'masses': None, 'fixes': None,
+            'truss': None, 'twoNodeLink': None}
+
+    masses = _table(masses, 'masses', range(2, max_ndf + 2))
+    if masses is not None:
+        tags = _integral(masses[:, 0], 'masses', 'tag', np.arange(len(masses)))
+        _unique(tags, 'masses', 'node')
+        index.rows(tags, 'masses', 'node')
+        plan['masses'] = (tags.tolist(), masses[:, 1:].tolist())
+
+    widths = (ndf + 1,) if ndf else range(2, 8)
+    fixes = _table(fixes, 'fixes', widths)
+    if fixes is not None:
+        tags = _integral(fixes[:, 0], 'fixes', 'tag', np.arange(len(fixes)))
+        index.rows(tags, 'fixes', 'node')
+        flags = fixes[:, 1:]
+        bad = ((flags != 0) & (flags != 1)).any(axis=1)
+        if bad.any():
+            raise ValueError(f'fixes: row {int(np.argmax(bad))} has flags '
+                             f'other than 0 and 1')
+        plan['fixes'] = (tags.tolist(), flags.astype(int).tolist())
+
+    if elements is not None and not isinstance(elements, dict):
+        elements = {'truss': elements}
+    if exp_elements is not None and not isinstance(exp_elements, dict):
+        exp_elements = {'twoNodeLink': exp_elements}
+    all_tags = []
+    for group, known in ((elements, _ELEMENT_WIDTHS),
+                         (exp_elements, _EXP_WIDTHS)):
+        for kind, values in (group or {}).items():
+            if kind not in known:
+                raise ValueError(f'element type {kind!r} is not supported '
+                                 f'(use one of {sorted(known)})')
+            values = _table(values, kind, known[kind])
+            rows = np.arange(len(values))
+            tags = _integral(values[:, 0], kind, 'tag', rows)
+            ni = _integral(values[:, 1], kind, 'iNode', rows)
+            nj = _integral(values[:, 2], kind, 'jNode', rows)
+            i = index.rows(ni, kind, 'node')
+            j = index.rows(nj, kind, 'node')
+            same = i == j
+            if same.any():
+                raise ValueError(f'{kind}: row {int(np.argmax(same))} '
+                                 f'connects a node to itself')
+            all_tags.append(tags)
+            if kind == 'truss':
+                short = np.einsum('ij,ij->i', coords[i] - coords[j],
+                                  coords[i] - coords[j]) == 0.0
+                if short.any():
+                    raise ValueError(f'truss: row {int(np.argmax(short))} has '
+                                     f'zero length')
+                mats = _integral(values[:, 4], kind, 'matTag', rows)
+                rho = values[:, 5] if values.shape[1] > 5 else np.zeros(len(values))
+                plan['truss'] = (tags.tolist(), ni.tolist(),
+                                 nj.tolist(), values[:, 3].tolist(),
+                                 mats.tolist(), rho.tolist())
+            else:
+                dirs = _integral(values[:, 3], kind, 'dir', rows)
+                bad = dirs > max_ndf
+                if bad.any():
+                    raise ValueError(f'{kind}: row {int(np.argmax(bad))} has '
+                                     f'dir {int(dirs[bad][0])} > ndf')
+                sites = _integral(values[:, 4], kind, 'siteTag', rows)
+                mass = (values[:, 6] if values.shape[1] > 6
+                        else np.zeros(len(values)))
+                plan['twoNodeLink'] = (tags.tolist(), ni.tolist(),
+                                       nj.tolist(), dirs.tolist(),
+                                       sites.tolist(), values[:, 5].tolist(),
+                                       mass.tolist())
+    if all_tags:
+        _unique(np.concatenate(all_tags), 'elements', 'element')
+    return plan
+
+
+def _content_key(backend, ndf, tables):
+    """Hash of the backend, ndf and the dtype, shape and bytes of every table."""
+    h = hashlib.sha1(f'{backend}:{ndf}'.encode())
+    for name, values in tables:
+        if isinstance(values, dict):
+            for kind in sorted(values):
+                h.update(kind.encode())
+                _hash_array(h, name, values[kind])
+        else:
+            _hash_array(h, name, values)
+    return h.hexdigest()
+
+
+def _hash_array(h, name, values):
+    if values is None:
+        return
+    values = np.ascontiguousarray(values)
+    h.update(f'|{name}|{values.dtype.descr}|{values.shape}|'.encode())
+    h.update(values.tobytes())
+
+
+def _cached_plan(key, cache_dir):
+    plan = _cache.get(key)
+    if plan is not None:
+        _cache.move_to_end(key)
+        return plan
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f'model-{key}.json')
+        if os.path.exists(path):
+            # Plain JSON, so that a file in the directory cannot run code
+            with open(path, encoding='utf-8') as f:
+                plan = json.load(f)
+            _remember(key, plan)
+    return plan
+
+
+def _remember(key, plan):
+    _cache[key] = plan
+    _cache.move_to_end(key)
+    while len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def _store(key, plan, cache_dir):
+    _remember(key, plan)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f'model-{key}.json')
+        # Write under a temporary name so concurrent workers never read a
+        # partial file
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(plan, f)
+        os.replace(tmp, path)
+
+
+def _build_python(plan):
+    """Add the definition to the Python backend's domain in bulk."""
+    from ..pysim._commands import _lookup, _session
+    from ..pysim._errors import OpenSeesError
+
+    d = _session.require_domain()
+    if plan['ndm'] != d.ndm:
+        raise OpenSeesError(f'build_from_arrays: nodes have {plan["ndm"]} '
+                            f'coordinates but the model has ndm={d.ndm}')
+    # Check every tag the tables refer to before the domain is touched, so
+    # that an error does not leave it half-built
+    clash = d.node_index.keys() & plan['node_tags']
+    if clash:
+        raise OpenSeesError(f'build_from_arrays: node {min(clash)} exists')
+    ele_tags = []
+    if plan['truss'] is not None:
+        ele_tags += plan['truss'][0]
+        for mat in set(plan['truss'][4]):
+            _lookup(_session.materials, mat, 'uniaxialMaterial')
+    if plan['twoNodeLink'] is not None:
+        ele_tags += plan['twoNodeLink'][0]
+        for site in set(plan['twoNodeLink'][4]):
+            _lookup(_session.sites, site, 'expSite')
+    clash = d.elements.keys() & ele_tags
+    if clash:
+        raise OpenSeesError(f'build_from_arrays: element {min(clash)} '
+                            f'exists')
+    masses = np.zeros((len(plan['node_tags']), d.ndf))
+    if plan['masses'] is not None:
+        row = {tag: k for k, tag in enumerate(plan['node_tags'])}
+        tags, values = plan['masses']
+        for tag, m in zip(tags, values):
+            masses[row[tag], :len(m)] = m
+    d.add_nodes(plan['node_tags'], plan['coords'], masses)
+    if plan['fixes'] is not None:
+        d.fix_nodes(*plan['fixes'])
+    if plan['truss'] is not None:
+        tags, ni, nj, area, mats, rho = plan['truss']
+        # One block of material slots per distinct material
+        mats = np.asarray(mats)
+        slots = np.zeros(len(mats), dtype=np.int64)
+        for mat in np.unique(mats):
+            kind, params = _lookup(_session.materials, mat, 'uniaxialMaterial')
+            rows = np.flatnonzero(mats == mat)
+            slots[rows] = _session.table.add_copies(kind, params, len(rows))
+        d.add_trusses(tags, ni, nj, area, slots.tolist(), rho)
+    if plan['twoNodeLink'] is not None:
+        for tag, i, j, direction, site, kinit, mass in zip(*plan['twoNodeLink']):
+            args = ['-dir', direction, '-site', site, '-initStif', kinit]
+            if mass:
+                args += ['-mass', mass]
+            d.add_exp_element(tag, i, j, args, _session.sites)
+
+
+def _build_native(ops, plan):
+    """Issue the definition as interpreter commands, one per object."""
+    node, fix, element, exp_element = (ops.node, ops.fix, ops.element,
+                                       ops.expElement)
+    masses = {}
+    if plan['masses'] is not None:
+        masses = dict(zip(*plan['masses']))
+    # Masses go with the node command, which saves a mass() call per node
+    for tag, xyz in zip(plan['node_tags'], plan['coords']):
+        m = masses.get(tag)
+        if m is None:
+            node(tag, *xyz)
+        else:
+            node(tag, *xyz, '-mass', *m)
+    if plan['fixes'] is not None:
+        for tag, flags in zip(*plan['fixes']):
+            fix(tag, *flags)
+    if plan['truss'] is not None:
+        for tag, i, j, area, mat, rho in zip(*plan['truss']):
+            if rho:
+                element('truss', tag, i, j, area, mat, '-rho', rho)
+            else:
+                element('truss', tag, i, j, area, mat)
+    if plan['twoNodeLink'] is not None:
+        for tag, i, j, direction, site, kinit, mass in zip(*plan['twoNodeLink']):
+            args = ['-dir', direction, '-site', site, '-initStif', kinit]
+            if mass:
+                args += ['-mass', mass]
+            exp_element('twoNodeLink', tag, i, j, *args)
+
+
+def build_from_arrays(nodes, fixes=None, elements=None, exp_elements=None,
+                      masses=None, cache=True, cache_dir=None):
+    """
+    Create nodes, constraints and elements from arrays.
+
+    Args:
+        nodes: (n, 1 + ndm) array of node tags and coordinates
+        fixes: (n, 1 + ndf) array of node tags and constraint flags
+        elements: {'truss': array} or a bare truss array
+        exp_elements: {'twoNodeLink': array} or a bare twoNodeLink array
+        masses: (n, 1 + k) array of node tags and nodal masses, k <= ndf
+        cache: reuse the checked definition of previously built arrays
+        cache_dir: directory for a cache shared between processes
+
+    See the module docstring for the column layouts. The model must have
+    been created with model() and the materials and sites that the elements
+    refer to must exist.
+
+    Returns:
+        the content key of the model definition (a hex string)
+    """
+    ops = sys.modules[__package__]
+    backend = ops.backend()
+    ndf = None
+    if backend == 'python':
+        from ..pysim._commands import _session
+        ndf = _session.require_domain().ndf
+    key = _content_key(backend, ndf, (
+        ('nodes', nodes), ('masses', masses), ('fixes', fixes),
+        ('elements', elements), ('exp_elements', exp_elements)))
+    plan = _cached_plan(key, cache_dir) if cache else None
+    if plan is None:
+        plan = _check(nodes, masses, fixes, elements, exp_elements, ndf)
+        if cache:
+            _store(key, plan, cache_dir)
+    if backend == 'python':
+        _build_python(plan)
+    else:
+        _build_native(ops, plan)
+    return key
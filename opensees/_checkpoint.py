@@ -0,0 +1,192 @@
+# openfrescopy/opensees/_checkpoint.py
+"""
+Checkpoint and restore of the analysis state for openfrescopy.opensees.
+
+checkpoint() captures the committed state of a running analysis so that a
+later run can continue from it instead of starting over, e.g. after an
+actuator trip, or so that several runs can branch from a common state
+(after gravity and eigen):
+
+    ops.analyze(10, 0.1)            # gravity stage
+    ops.loadConst('-time', 0.0)
+    ops.eigen('-fullGenLapack', 2)
+    ops.checkpoint('gravity.ckpt')
+    ...
+    # later, after building the same model again
+    ops.restore('gravity.ckpt')
+    ops.analyze(1790, dtAna)
+
+With the Python backend the checkpoint holds the committed nodal
+displacements, velocities and accelerations, the committed state of every
+material instance (numerical elements and SimUniaxialMaterials controls,
+including the Steel02 history), the response vectors of the experimental
+elements, the analysis time (which positions the time series and, in a
+static analysis, the load factor), constant pattern loads and the
+eigenvalues. It is written as an uncompressed .npz file; for a model of the
+OneBayFrame size a restore takes a few milliseconds from the file and well
+under one from a Checkpoint kept in memory. restore() checks that the
+checkpoint comes from a model with the same nodes, elements and materials.
+The state of remote sites is kept by their lab servers and is not part of
+a checkpoint.
+
+With the native backend the commands go to the OpenSees 'File' database
+(database/save/restore), and what is captured depends on the sendSelf
+support of the objects in the model. restore(commitTag) with an integer
+keeps working as the OpenSees command of the same name.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Bumped when the layout of the saved arrays changes
+FORMAT = 1
+
+
+class Checkpoint:
+    """
+    A captured analysis state.
+
+    Attributes:
+        backend: 'python' or 'native'
+        arrays: {name: array} of the state (Python backend)
+        path: file the checkpoint was saved to or loaded from, if any
+        commit_tag: database commit tag (native backend)
+    """
+
+    def __init__(self, backend, arrays=None, path=None, commit_tag=None):
+        self.backend = backend
+        self.arrays = arrays
+        self.path = path
+        self.commit_tag = commit_tag
+
+    @property
+    def time(self):
+        """Analysis time of the checkpoint (None for native checkpoints)."""
+        if self.arrays is None:
+            return None
+        return float(self.arrays['domain.time'][0])
+
+    @property
+    def nbytes(self):
+        """Size of the state arrays in bytes."""
+        if self.arrays is None:
+            return 0
+        return sum(a.nbytes for a in self.arrays.values())
+
+    def save(self, path):
+        """Write the checkpoint to path (Python backend)."""
+        if self.arrays is None:
+            raise RuntimeError('native checkpoints live in the OpenSees '
+                               'database and cannot be saved again')
+        path = os.fspath(path)
+        # np.savez appends .npz to names without it; keep the given name
+        with open(path, 'wb') as f:
+            np.savez(f, **self.arrays)
+        self.path = path
+        return self
+
+    @classmethod
+    def load(cls, path):
+        """Read a checkpoint written by save()."""
+        path = os.fspath(path)
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        if int(arrays.get('format', [0])[0]) != FORMAT:
+            raise ValueError(f'{path}: not a checkpoint of format {FORMAT}')
+        return cls('python', arrays, path)
+
+    def __repr__(self):
+        if self.arrays is None:
+            return (f'Checkpoint(backend={self.backend!r}, '
+                    f'path={self.path!r}, commit_tag={self.commit_tag})')
+        return (f'Checkpoint(time={self.time:g}, nbytes={self.nbytes}, '
+                f'path={self.path!r})')
+
+
+def _python_state():
+    from ..pysim._commands import _session
+    domain = _session.require_domain()
+    arrays = {'format': np.array([FORMAT])}
+    for name, values in domain.get_state().items():
+        arrays['domain.' + name] = values
+    if _session.eigen_values is not None:
+        arrays['eigen.values'] = np.asarray(_session.eigen_values)
+        arrays['eigen.vectors'] = np.asarray(_session.eigen_vectors)
+    return arrays
+
+
+def _python_restore(arrays):
+    from ..pysim._commands import _session
+    domain = _session.require_domain()
+    prefix = len('domain.')
+    domain.set_state({name[prefix:]: values for name, values in arrays.items()
+                      if name.startswith('domain.')})
+    if 'eigen.values' in arrays:
+        _session.eigen_values = arrays['eigen.values'].copy()
+        _session.eigen_vectors = arrays['eigen.vectors'].copy()
+
+
+def checkpoint(path=None, commit_tag=1):
+    """
+    Capture the committed analysis state.
+
+    Args:
+        path: file to write the checkpoint to (optional with the Python
+            backend, where the checkpoint can also be kept in memory)
+        commit_tag: database commit tag (native backend)
+
+    Returns:
+        Checkpoint, which restore() accepts as well as the path
+    """
+    ops = sys.modules[__package__]
+    if ops.backend() != 'python':
+        if path is None:
+            raise ValueError('the native backend needs a path for checkpoints')
+        path = os.fspath(path)
+        native = ops._load()
+        native.database('File', path)
+        native.save(int(commit_tag))
+        return Checkpoint('native', path=path, commit_tag=int(commit_tag))
+    ckpt = Checkpoint('python', _python_state())
+    if path is not None:
+        ckpt.save(path)
+    return ckpt
+
+
+def restore(source, commit_tag=1):
+    """
+    Make a checkpoint the committed and trial state of the current model.
+
+    Args:
+        source: Checkpoint, the path of a saved checkpoint or, as in the
+            OpenSees command, the commit tag to restore from the current
+            database (native backend)
+        commit_tag: database commit tag of a native checkpoint given by path
+
+    The model (nodes, elements, materials, patterns and experimental
+    objects) must have been built as when the checkpoint was taken; the
+    analysis then continues from the checkpoint time.
+    """
+    ops = sys.modules[__package__]
+    if ops.backend() != 'python':
+        native = ops._load()
+        if isinstance(source, int):
+            return native.restore(source)
+        if isinstance(source, Checkpoint):
+            path, commit_tag = source.path, source.commit_tag
+        else:
+            path = os.fspath(source)
+        native.database('File', path)
+        native.restore(int(commit_tag))
+        return
+    if isinstance(source, int):
+        raise ValueError('the Python backend has no database; pass a '
+                         'Checkpoint or the path of a saved checkpoint')
+    if not isinstance(source, Checkpoint):
+        source = Checkpoint.load(source)
+    elif source.arrays is None:
+        raise ValueError('a native checkpoint cannot be restored with the '
+                         'Python backend')
+    _python_restore(source.arrays)
@@ -0,0 +1,245 @@
+# openfrescopy/opensees/_driver.py
+"""
+Batched transient driver for openfrescopy.opensees.
+
+run_transient() replaces the usual Python loop
+
+    for i in range(n):
+        ops.analyze(1, dt)
+
+with a driver that advances the analysis in chunks of several steps per
+analyze() call and writes the requested node and element responses straight
+into preallocated NumPy arrays. Sampling only happens at chunk boundaries, so
+the number of Python->C calls per step drops with the sampling stride.
+
+Usage:
+    import openfrescopy.opensees as ops
+
+    res = ops.run_transient(1790, 20.0/1024.0, outputs={
+        'disp': ops.NodeOutput([3, 4], [1], 'disp'),
+        'ctrlDisp': ops.ElementOutput([1, 2], 'ctrlDisp'),
+    })
+    res['disp']         # (n_samples, 2) array
+    res.time            # (n_samples,) analysis time of each sample
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+# Node response name -> OpenSees command that returns it
+_NODE_COMMANDS = {
+    'disp': 'nodeDisp',
+    'vel': 'nodeVel',
+    'accel': 'nodeAccel',
+    'reaction': 'nodeReaction',
+}
+
+
+@dataclass
+class NodeOutput:
+    """Node quantity to sample, mirroring recorder('Node', ...) arguments."""
+    nodes: list
+    dofs: list
+    response: str = 'disp'
+
+
+@dataclass
+class ElementOutput:
+    """
+    Element quantity to sample, mirroring recorder('Element', ...) arguments.
+
+    response is passed to eleResponse(), e.g. 'forces', or 'ctrlDisp' and
+    'daqDisp' for experimental elements.
+    """
+    elements: list
+    response: str = 'forces'
+    args: tuple = ()
+
+
+class TransientResult:
+    """
+    Sampled responses of one run_transient() call.
+
+    Attributes:
+        time: analysis time of each sample
+        data: {name: array of shape (n_samples, n_columns)}
+        labels: {name: column labels ('tag/dof' or 'tag/component')}
+        steps: number of analysis steps that completed
+        status: return code of the last analyze() call (0 on success)
+        timing: wall-clock split into 'analyze', 'sample' and 'callback'
+    """
+
+    def __init__(self, time, data, labels):
+        self.time = time
+        self.data = data
+        self.labels = labels
+        self.steps = 0
+        self.samples = 0
+        self.status = 0
+        self.timing = {'analyze': 0.0, 'sample': 0.0, 'callback': 0.0}
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def __repr__(self):
+        return (f'TransientResult(steps={self.steps}, samples={self.samples}, '
+                f'status={self.status}, outputs={list(self.data)})')
+
+    def per_step_overhead(self):
+        """Average non-analyze wall time per completed step in seconds."""
+        if self.steps == 0:
+            return 0.0
+        return (self.timing['sample'] + self.timing['callback'])/self.steps
+
+    def trim(self):
+        """Drop unused rows left over when the analysis stopped early."""
+        self.time = self.time[:self.samples]
+        for name in self.data:
+            self.data[name] = self.data[name][:self.samples]
+        return self
+
+
+def _samplers(ops, outputs):
+    """
+    Build one (fill, labels) pair per output.
+
+    Command lookups and tag/dof lists are resolved here, once, so the fill
+    functions only loop over prebound calls.
+    """
+    samplers = {}
+    for name, spec in outputs.items():
+        if isinstance(spec, NodeOutput):
+            try:
+                fn = getattr(ops, _NODE_COMMANDS[spec.response])
+            except KeyError:
+                raise ValueError(
+                    f"unknown node response '{spec.response}' for output "
+                    f"'{name}'; use one of {sorted(_NODE_COMMANDS)}") from None
+            pairs = [(int(tag), int(dof))
+                     for tag in spec.nodes for dof in spec.dofs]
+
+            def fill(row, fn=fn, pairs=pairs):
+                for j, (tag, dof) in enumerate(pairs):
+                    row[j] = fn(tag, dof)
+
+            samplers[name] = (fill, [f'{tag}/{dof}' for tag, dof in pairs])
+        elif isinstance(spec, ElementOutput):
+            fn = ops.eleResponse
+            tags = [int(tag) for tag in spec.elements]
+            args = (spec.response,) + tuple(spec.args)
+            # Element responses have no fixed width, so query each element
+            # once up front to size the output columns
+            widths = [len(np.atleast_1d(fn(tag, *args))) for tag in tags]
+            slices = []
+            labels = []
+            start = 0
+            for tag, width in zip(tags, widths):
+                slices.append((tag, start, start + width))
+                labels.extend(f'{tag}/{i + 1}' for i in range(width))
+                start += width
+
+            def fill(row, fn=fn, slices=slices, args=args):
+                for tag, lo, hi in slices:
+                    row[lo:hi] = fn(tag, *args)
+
+            samplers[name] = (fill, labels)
+        else:
+            raise TypeError(f"output '{name}' must be a NodeOutput or "
+                            f"ElementOutput, not {type(spec).__name__}")
+    return samplers
+
+
+def run_transient(n_steps, dt, outputs=None, stride=1, callback=None,
+                  every=None, out=None, dtype=np.float64):
+    """
+    Run n_steps transient analysis steps of size dt in batched chunks.
+
+    Args:
+        n_steps: number of analysis steps to run
+        dt: analysis time step passed to analyze()
+        outputs: {name: NodeOutput | ElementOutput} quantities to sample
+        stride: sample the outputs every `stride` steps (and after the last
+            step). Steps between samples run in a single analyze() call.
+        callback: optional callable(result, step) invoked every `every` steps
+            with the partially filled result; returning True stops the run
+        every: callback period in steps (defaults to stride)
+        out: optional {name: array} of preallocated arrays to fill in place;
+            each must have at least n_samples rows and the output's columns
+        dtype: dtype of the arrays allocated by the driver
+
+    Returns:
+        TransientResult with one row per sample. If analyze() fails, the run
+        stops, result.status holds its return code and the arrays are trimmed
+        to the samples that were taken.
+    """
+    ops = sys.modules[__package__]
+    n_steps = int(n_steps)
+    stride = max(1, int(stride))
+    outputs = dict(outputs or {})
+    out = dict(out or {})
+    if callback is not None:
+        every = stride if every is None else max(1, int(every))
+
+    # Preallocate all sample buffers up front
+    n_samples = -(-n_steps//stride)
+    samplers = _samplers(ops, outputs)
+    data = {}
+    for name, (fill, labels) in samplers.items():
+        width = len(labels)
+        if name in out:
+            buf = out[name]
+            if buf.ndim != 2 or buf.shape[0] < n_samples or buf.shape[1] != width:
+                raise ValueError(
+                    f"out['{name}'] has shape {buf.shape}, expected at least "
+                    f"({n_samples}, {width})")
+        else:
+            buf = np.empty((n_samples, width), dtype=dtype)
+        data[name] = buf
+    result = TransientResult(np.empty(n_samples), data,
+                             {name: samplers[name][1] for name in samplers})
+    fills = [(samplers[name][0], data[name]) for name in samplers]
+
+    analyze = ops.analyze
+    get_time = ops.getTime
+    clock = time.perf_counter
+    timing = result.timing
+    step = 0
+    while step < n_steps:
+        # Advance to the next sampling or callback boundary in one call
+        target = min(n_steps, (step//stride + 1)*stride)
+        if callback is not None:
+            target = min(target, (step//every + 1)*every)
+        t0 = clock()
+        status = analyze(target - step, dt)
+        t1 = clock()
+        timing['analyze'] += t1 - t0
+        if status != 0:
+            # Steps of the failed chunk that did converge are not sampled
+            result.status = status
+            break
+        step = target
+        result.steps = step
+
+        if step % stride == 0 or step == n_steps:
+            k = result.samples
+            result.time[k] = get_time()
+            for fill, buf in fills:
+                fill(buf[k])
+            result.samples = k + 1
+            t0 = clock()
+            timing['sample'] += t0 - t1
+        else:
+            t0 = t1
+
+        if callback is not None and (step % every == 0 or step == n_steps):
+            stop = callback(result, step)
+            timing['callback'] += clock() - t0
+            if stop:
+                break
+
+    if result.samples < n_samples:
+        result.trim()
+    return result
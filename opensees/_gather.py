@@ -0,0 +1,277 @@
+# openfrescopy/opensees/_gather.py
+"""
+Bulk response queries for openfrescopy.opensees.
+
+gather() returns a response of many nodes or elements as one NumPy array
+instead of one nodeDisp()/eleResponse() call per node, element and DOF:
+
+    disp = ops.gather('disp', [3, 4], [1])           # (2, 1) array
+    daq = ops.gather('daqDisp', [1, 2])              # (2, nb) array
+    forces = ops.gather('forces', ops.getEleTags())  # (n, 2*ndf) array
+
+Node responses are 'disp', 'vel', 'accel' and 'reaction'; any other kind is
+passed to eleResponse(), e.g. 'forces', 'basicForce', or 'ctrlDisp',
+'daqDisp' and 'daqForce' of experimental elements. dofs selects node DOFs
+or response components (1-based).
+
+The tag->index maps are resolved on the first call for a (kind, tags,
+dofs) combination and kept with an output buffer that later calls fill in
+place, so the array returned by gather() is overwritten by the next call
+with the same arguments (copy it to keep it). Gatherer objects hold one
+such query explicitly. With the Python backend the buffer is filled with
+a single indexed copy from the domain's state arrays; with the native
+backend through prebound per-item calls.
+"""
+
+import sys
+
+import numpy as np
+
+from ._driver import _NODE_COMMANDS
+
+# Node response -> response array of the Python backend's domain
+_NODE_ARRAYS = {'disp': 'U', 'vel': 'V', 'accel': 'A'}
+
+# Element response -> (group, source) of the Python backend's domain
+_ELEMENT_SOURCES = {
+    ('truss', 'force'): 'forces', ('truss', 'forces'): 'forces',
+    ('truss', 'globalForce'): 'forces', ('truss', 'globalForces'): 'forces',
+    ('truss', 'axialForce'): 'axial', ('truss', 'basicForce'): 'axial',
+    ('truss', 'basicForces'): 'axial',
+    ('exp', 'force'): 'forces', ('exp', 'forces'): 'forces',
+    ('exp', 'globalForce'): 'forces', ('exp', 'globalForces'): 'forces',
+    ('exp', 'basicForce'): 'q', ('exp', 'basicForces'): 'q',
+    ('exp', 'ctrlDisp'): 'ctrl_disp', ('exp', 'basicDisp'): 'ctrl_disp',
+    ('exp', 'basicDisplacement'): 'ctrl_disp',
+    ('exp', 'daqDisp'): 'daq_disp', ('exp', 'daqForce'): 'daq_force',
+}
+
+# Gatherers of earlier gather() calls, by (kind, tags, dofs)
+_cache = {}
+_CACHE_SIZE = 64
+
+
+def _source(domain, group, name):
+    """(n_group, width) array of one response of a group of elements."""
+    if group == 'truss':
+        trusses = domain.trusses
+        if name == 'forces':
+            return trusses.global_forces(domain.table)
+        return trusses.axial_forces(domain.table)[:, None]
+    exp = domain.exp
+    if name == 'forces':
+        return exp.global_forces()
+    return getattr(exp, name)
+
+
+def _key_part(values):
+    """Cache key of tags or dofs, built without a Python loop per item."""
+    if values is None or isinstance(values, tuple):
+        return values
+    if isinstance(values, np.ndarray):
+        return values.dtype.str, values.shape, values.tobytes()
+    return tuple(values)
+
+
+class Gatherer:
+    """
+    One bulk query; calling it returns the filled output buffer.
+
+    Args:
+        kind: node response ('disp', 'vel', 'accel', 'reaction') or element
+            response passed to eleResponse()
+        tags: node or element tags (default: all nodes or elements)
+        dofs: 1-based node DOFs or response components (default: all)
+        dtype: dtype of the output buffer
+    """
+
+    def __init__(self, kind, tags=None, dofs=None, dtype=np.float64):
+        self.kind = kind
+        self.is_node = kind in _NODE_COMMANDS
+        self.tags = None if tags is None else [int(t) for t in tags]
+        self.dofs = None if dofs is None else [int(d) for d in dofs]
+        self.dtype = np.dtype(dtype)
+        self.out = None
+        self._ops = sys.modules[__package__]
+        self._python = self._ops.backend() == 'python'
+        self._key = None
+        self._fill = None
+
+    def __call__(self, out=None):
+        """Fill and return the output buffer (or out, if given)."""
+        if self._python:
+            from ..pysim._commands import _session
+            domain = _session.require_domain()
+            domain.build()
+            key = (id(domain), domain.version)
+            if key != self._key:
+                self._fill = self._resolve_python(domain)
+                self._key = key
+        elif self._fill is None:
+            self._fill = self._resolve_native()
+        if out is None:
+            out = self.out
+        elif out.shape != self.out.shape or not out.flags.c_contiguous:
+            raise ValueError(f'out must be a C-contiguous array of shape '
+                             f'{self.out.shape}, got {out.shape}')
+        self._fill(out)
+        return out
+
+    # -- Python backend ------------------------------------------------------
+
+    def _resolve_python(self, domain):
+        tags = self.tags
+        if self.is_node:
+            if tags is None:
+                tags = list(domain.node_tags)
+            rows = np.array([domain.node(t) for t in tags], dtype=np.intp)
+            cols = self._columns(domain.ndf)
+            self._allocate(len(rows), len(cols))
+            flat = (rows[:, None]*domain.ndf + cols[None, :]).ravel()
+            if self.kind == 'reaction':
+                def fill(out):
+                    reaction = domain.resisting_force() - domain.load(
+                        domain.time)
+                    np.take(reaction.ravel(), flat, out=out.reshape(-1))
+            else:
+                name = _NODE_ARRAYS[self.kind]
+
+                def fill(out):
+                    # The arrays are replaced when the model grows, so
+                    # look them up on every call
+                    np.take(getattr(domain, name).ravel(), flat,
+                            out=out.reshape(-1))
+            return fill
+
+        # Elements: group the requested rows by element type
+        if tags is None:
+            tags = sorted(domain.elements)
+        groups = {}
+        for i, tag in enumerate(tags):
+            try:
+                group, k = domain.elements[tag]
+            except KeyError:
+                raise ValueError(f'element {tag} does not exist') from None
+            groups.setdefault(group, ([], []))
+            groups[group][0].append(i)
+            groups[group][1].append(k)
+        sources = {g: _ELEMENT_SOURCES.get((g, self.kind)) for g in groups}
+        if None in sources.values():
+            return self._resolve_native()
+        parts = []
+        width = 0
+        for group, (out_rows, group_rows) in groups.items():
+            name = sources[group]
+            stride = _source(domain, group, name).shape[1]
+            columns = stride
+            if group == 'exp' and name != 'forces':
+                # Basic quantities are padded to the largest element
+                columns = int(domain.exp.nb[group_rows].max())
+            width = max(width, columns)
+            parts.append((group, name, np.array(out_rows, dtype=np.intp),
+                          np.array(group_rows, dtype=np.intp), stride))
+        cols = self._columns(width)
+        self._allocate(len(tags), len(cols))
+        plans = []
+        for group, name, out_rows, group_rows, stride in parts:
+            # Flat indices into the contiguous source array; components a
+            # shorter source does not have stay zero
+            valid = np.flatnonzero(cols < stride)
+            flat = (group_rows[:, None]*stride + cols[valid][None, :]).ravel()
+            plans.append((group, name, out_rows, valid, flat))
+        direct = (len(plans) == 1 and len(plans[0][3]) == len(cols) and
+                  np.array_equal(plans[0][2], np.arange(len(tags))))
+
+        def fill(out):
+            if direct:
+                group, name, _, _, flat = plans[0]
+                values = _source(domain, group, name)
+                np.take(np.ascontiguousarray(values).ravel(), flat,
+                        out=out.reshape(-1))
+                return
+            out[:] = 0.0
+            for group, name, out_rows, valid, flat in plans:
+                values = _source(domain, group, name)
+                out[np.ix_(out_rows, valid)] = np.take(
+                    np.ascontiguousarray(values).ravel(), flat).reshape(
+                        len(out_rows), len(valid))
+        return fill
+
+    # -- native backend and unsupported responses ----------------------------
+
+    def _resolve_native(self):
+        ops = self._ops
+        if self.is_node:
+            fn = getattr(ops, _NODE_COMMANDS[self.kind])
+            tags = self.tags if self.tags is not None else ops.getNodeTags()
+            if self.dofs is None:
+                width = len(np.atleast_1d(fn(tags[0]))) if tags else 0
+                dofs = list(range(1, width + 1))
+            else:
+                dofs = self.dofs
+            self._allocate(len(tags), len(dofs))
+            pairs = [(tag, dof) for tag in tags for dof in dofs]
+
+            def fill(out):
+                flat = out.reshape(-1)
+                for j, (tag, dof) in enumerate(pairs):
+                    flat[j] = fn(tag, dof)
+            return fill
+
+        fn = ops.eleResponse
+        tags = self.tags if self.tags is not None else ops.getEleTags()
+        kind = self.kind
+        # Element responses have no fixed width; size the buffer from one
+        # query per element, as run_transient() does
+        widths = [len(np.atleast_1d(fn(tag, kind))) for tag in tags]
+        cols = self._columns(max(widths, default=0))
+        self._allocate(len(tags), len(cols))
+        picks = [(i, tag, cols[cols < w]) for i, (tag, w) in
+                 enumerate(zip(tags, widths))]
+
+        def fill(out):
+            out[:] = 0.0
+            for i, tag, c in picks:
+                out[i, :len(c)] = np.asarray(fn(tag, kind))[c]
+        return fill
+
+    def _columns(self, width):
+        if self.dofs is None:
+            return np.arange(width)
+        cols = np.array(self.dofs, dtype=np.intp) - 1
+        if len(cols) and (cols.min() < 0 or cols.max() >= width):
+            raise ValueError(f'gather {self.kind}: dofs {self.dofs} outside '
+                             f'1..{width}')
+        return cols
+
+    def _allocate(self, rows, cols):
+        if self.out is None or self.out.shape != (rows, cols):
+            self.out = np.zeros((rows, cols), dtype=self.dtype)
+
+
+def gather(kind, tags=None, dofs=None, out=None):
+    """
+    Return a node or element response for many tags as one array.
+
+    Args:
+        kind: 'disp', 'vel', 'accel', 'reaction' (nodes) or an eleResponse()
+            response such as 'forces', 'ctrlDisp', 'daqDisp', 'daqForce'
+        tags: node or element tags (default: all)
+        dofs: 1-based node DOFs or response components (default: all)
+        out: array to fill instead of the reused internal buffer
+
+    Returns:
+        (len(tags), len(dofs)) array; without out, the same buffer is
+        refilled by the next call with the same arguments
+
+    The query is looked up by the tags and dofs as given: a tuple is used
+    as it is, an array by its bytes. In a loop over many steps, a Gatherer
+    held by the caller skips the lookup altogether.
+    """
+    key = (kind, _key_part(tags), _key_part(dofs))
+    gatherer = _cache.get(key)
+    if gatherer is None:
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        gatherer = _cache[key] = Gatherer(kind, tags, dofs)
+    return gatherer(out)
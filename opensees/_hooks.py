@@ -0,0 +1,115 @@
+# openfrescopy/opensees/_hooks.py
+"""
+Step hooks for Python-side extensions of openfrescopy.opensees.
+
+Native recorders run inside analyze(). Python-side consumers (binary
+recorders, monitors, ...) register a step hook here instead, and the wrapped
+analyze(), record() and wipe() commands exported by openfrescopy.opensees
+call them:
+
+    analyze(n, ...)  runs n single steps and calls every step hook after
+                     each converged step (one native call if there are no
+                     hooks and no profiler)
+    record()         calls every step hook after the native record()
+    wipe()           calls every wipe hook, then the native wipe()
+"""
+
+import time
+
+# Callables invoked after every converged analysis step and on record()
+_step_hooks = []
+# Callables invoked once when the model is wiped
+_wipe_hooks = []
+# StepProfiler timing every analysis step (see start_profiling())
+_profiler = None
+
+_clock = time.perf_counter_ns
+
+
+def add_step_hook(fn):
+    """Call fn() after every converged analysis step and on record()."""
+    _step_hooks.append(fn)
+    return fn
+
+
+def remove_step_hook(fn):
+    """Stop calling fn() after analysis steps; unknown hooks are ignored."""
+    if fn in _step_hooks:
+        _step_hooks.remove(fn)
+
+
+def add_wipe_hook(fn):
+    """Call fn() once when wipe() is called."""
+    _wipe_hooks.append(fn)
+    return fn
+
+
+def remove_wipe_hook(fn):
+    if fn in _wipe_hooks:
+        _wipe_hooks.remove(fn)
+
+
+def _wrap_analyze(native):
+    def analyze(*args):
+        profiler = _profiler
+        if not _step_hooks and profiler is None:
+            return native(*args)
+        n = int(args[0]) if args else 1
+        rest = args[1:]
+        for i in range(n):
+            if profiler is not None:
+                t0 = profiler.begin()
+            status = native(1, *rest)
+            if profiler is not None:
+                t1 = _clock()
+            if status != 0:
+                if profiler is not None:
+                    profiler.step(t0, t1, t1, status)
+                return status
+            for hook in tuple(_step_hooks):
+                hook()
+            if profiler is not None:
+                profiler.step(t0, t1, _clock(), status)
+        return 0
+    analyze.__doc__ = native.__doc__
+    return analyze
+
+
+def set_profiler(profiler):
+    """Time every analysis step with profiler (None to stop)."""
+    global _profiler
+    _profiler = profiler
+
+
+def _wrap_record(native):
+    def record(*args):
+        result = native(*args)
+        for hook in tuple(_step_hooks):
+            hook()
+        return result
+    record.__doc__ = native.__doc__
+    return record
+
+
+def _wrap_wipe(native):
+    def wipe(*args):
+        hooks = tuple(_wipe_hooks)
+        _wipe_hooks.clear()
+        for hook in hooks:
+            hook()
+        return native(*args)
+    wipe.__doc__ = native.__doc__
+    return wipe
+
+
+_WRAPPERS = {
+    'analyze': _wrap_analyze,
+    'record': _wrap_record,
+    'wipe': _wrap_wipe,
+}
+
+
+def wrap(name, value):
+    """Return the hook-aware version of the native command `name`."""
+    wrapper = _WRAPPERS.get(name)
+    return value if wrapper is None else wrapper(value)
@@ -0,0 +1,291 @@
+# openfrescopy/opensees/_profile.py
+"""
+Per-step profiling of openfrescopy.opensees analyses.
+
+start_profiling() times every analysis step and keeps latency histograms of
+the step and of its phases, counts the steps that miss a target period and
+keeps a per-step history that can be exported:
+
+    prof = ops.start_profiling(period=dtAna)
+    for i in range(1790):
+        ops.analyze(1, dtAna)
+    print(prof.report())
+    prof.to_csv('steps.csv')
+    prof.to_json('profile.json')
+    ops.stop_profiling()
+
+Phases of a step:
+
+    integrator  everything not listed below: predictor/corrector, solving,
+                numerical elements, native recorders
+    element     transformations of the experimental elements
+    site        sites on the per-object path (remote sites, shared sites)
+    setup       actuator factors of the vectorized LocalSite chains
+    control     the vectorized material update of the controls
+    hooks       Python step hooks (binary recorders, ...) after the step
+
+With the native backend the phases run inside OpenFresco and only the step
+and hook times are available. With the Python backend the phase timers
+only run between start_profiling() and stop_profiling().
+
+Histograms use HDR-style log-linear buckets (better than 1% resolution from
+1 ns to days) with O(1) recording, so profiling costs a few microseconds per
+step and can be left on.
+"""
+
+import csv
+import json
+import sys
+import time
+
+import numpy as np
+
+from . import _hooks
+
+PHASES = ('integrator', 'element', 'site', 'setup', 'control')
+
+# Sub-buckets per power of two: values below 2**_SUB_BITS are exact, larger
+# ones are resolved to 1/2**(_SUB_BITS - 1)
+_SUB_BITS = 8
+_SUB = 1 << _SUB_BITS
+_HALF = _SUB >> 1
+_MAX_EXP = 48
+
+
+class LatencyHistogram:
+    """Log-linear histogram of nanosecond latencies."""
+
+    def __init__(self):
+        self.counts = [0]*(_SUB + _MAX_EXP*_HALF)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, ns):
+        if ns < _SUB:
+            i = ns if ns > 0 else 0
+        else:
+            e = ns.bit_length() - _SUB_BITS
+            i = min(_SUB + (e - 1)*_HALF + (ns >> e) - _HALF,
+                    len(self.counts) - 1)
+        self.counts[i] += 1
+        if self.count == 0 or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+        self.count += 1
+        self.total += ns
+
+    @staticmethod
+    def _upper(i):
+        """Highest value that falls into bucket i."""
+        if i < _SUB:
+            return i
+        e = (i - _SUB)//_HALF + 1
+        return ((((i - _SUB) % _HALF + _HALF) + 1) << e) - 1
+
+    def percentile(self, p):
+        """Latency in ns below which p percent of the values fall."""
+        if self.count == 0:
+            return 0
+        cum = np.cumsum(self.counts)
+        i = int(np.searchsorted(cum, max(1, int(np.ceil(p/100.0*self.count)))))
+        return min(self._upper(i), self.max)
+
+    def reset(self):
+        self.__init__()
+
+    def summary(self):
+        """Return count, mean, min, p50, p90, p99, p99.9 and max in seconds."""
+        mean = self.total/self.count if self.count else 0.0
+        stats = {'count': self.count, 'mean': 1e-9*mean, 'min': 1e-9*self.min}
+        for name, p in (('p50', 50.0), ('p90', 90.0), ('p99', 99.0),
+                        ('p99.9', 99.9)):
+            stats[name] = 1e-9*self.percentile(p)
+        stats['max'] = 1e-9*self.max
+        return stats
+
+    def buckets(self):
+        """Return the non-empty buckets as [[upper bound in ns, count], ...]."""
+        return [[self._upper(i), c] for i, c in enumerate(self.counts) if c]
+
+
+class StepProfiler:
+    """
+    Timing of every analysis step; see the module docstring.
+
+    Attributes:
+        period: target step period in seconds (None: no deadline)
+        steps, failed: number of converged and failed steps
+        overruns: converged steps whose wall time exceeded the period
+        max_overrun: largest time by which a step exceeded the period (s)
+        histograms: {'step', 'hooks', *PHASES: LatencyHistogram}
+        history: per-step rows of the last `capacity` steps (see columns)
+    """
+
+    columns = ('step', 'start', 'step_time', 'hooks') + PHASES + ('status',)
+
+    def __init__(self, period=None, history=65536, source=None):
+        self.period = period
+        self._period_ns = None if period is None else int(round(period*1e9))
+        self._source = source
+        self._has_phases = source is not None
+        self.histograms = {name: LatencyHistogram()
+                           for name in ('step', 'hooks') + PHASES}
+        self._phase_hists = [self.histograms[n] for n in PHASES[1:]]
+        self.capacity = int(history)
+        self._history = np.zeros((self.capacity, len(self.columns)),
+                                 dtype=np.int64)
+        self._cumulative = None
+        self._snapshot = None
+        self.reset()
+
+    def reset(self):
+        """Clear all counters, histograms and the history."""
+        for hist in self.histograms.values():
+            hist.reset()
+        self.steps = 0
+        self.failed = 0
+        self.overruns = 0
+        self.max_overrun = 0.0
+        self._rows = 0
+        self._origin = time.perf_counter_ns()
+
+    def begin(self):
+        """Mark the start of a step and return its timestamp in ns."""
+        if self._source is not None:
+            self._cumulative = self._source()
+            if self._cumulative is not None:
+                self._snapshot = list(self._cumulative)
+        return time.perf_counter_ns()
+
+    def step(self, t0, t1, t2, status):
+        """Account a step that ran from t0 to t1, with hooks until t2."""
+        hists = self.histograms
+        elapsed = t1 - t0
+        hooks = t2 - t1
+        row = [0, t0 - self._origin, elapsed, hooks, 0, 0, 0, 0, 0, status]
+        if status != 0:
+            self.failed += 1
+        else:
+            self.steps += 1
+            hists['step'].record(elapsed)
+            hists['hooks'].record(hooks)
+            cumulative = self._cumulative
+            if cumulative is not None:
+                rest = elapsed
+                for k, (hist, now, before) in enumerate(zip(
+                        self._phase_hists, cumulative, self._snapshot)):
+                    ns = now - before
+                    hist.record(ns)
+                    row[5 + k] = ns
+                    rest -= ns
+                hists['integrator'].record(rest)
+                row[4] = rest
+            if self._period_ns is not None and t2 - t0 > self._period_ns:
+                self.overruns += 1
+                self.max_overrun = max(self.max_overrun,
+                                       1e-9*(t2 - t0 - self._period_ns))
+        n = self._rows
+        row[0] = n
+        if self.capacity:
+            self._history[n % self.capacity] = row
+        self._rows = n + 1
+
+    @property
+    def history(self):
+        """(n, len(columns)) int64 array of the kept steps in ns, oldest first."""
+        n, cap = self._rows, self.capacity
+        if n <= cap:
+            return self._history[:n].copy()
+        k = n % cap
+        return np.concatenate([self._history[k:], self._history[:k]])
+
+    def summary(self):
+        """Return the profile as a JSON-serializable dict (times in s)."""
+        names = ('step', 'hooks') + (PHASES if self._has_phases else ())
+        return {
+            'steps': self.steps,
+            'failed': self.failed,
+            'period': self.period,
+            'overruns': self.overruns,
+            'max_overrun': self.max_overrun,
+            'phases': {name: self.histograms[name].summary()
+                       for name in names},
+        }
+
+    def report(self):
+        """Return a printable table of the latency percentiles per phase."""
+        info = self.summary()
+        lines = ['{:<12}{:>10}{:>10}{:>10}{:>10}{:>10}'.format(
+            'phase [us]', 'mean', 'p50', 'p99', 'max', 'count')]
+        for name, s in info['phases'].items():
+            lines.append('{:<12}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10d}'
+                         .format(name, 1e6*s['mean'], 1e6*s['p50'],
+                                 1e6*s['p99'], 1e6*s['max'], s['count']))
+        if self.period is not None:
+            lines.append(f'{self.overruns} of {self.steps} steps exceeded '
+                         f'the period of {1e3*self.period:.3f} ms (worst by '
+                         f'{1e3*self.max_overrun:.3f} ms)')
+        if self.failed:
+            lines.append(f'{self.failed} steps failed to converge')
+        return '\n'.join(lines)
+
+    def to_json(self, path):
+        """Write the summary and the histogram buckets (in ns) as JSON."""
+        info = self.summary()
+        info['buckets'] = {name: self.histograms[name].buckets()
+                           for name in info['phases']}
+        with open(path, 'w') as f:
+            json.dump(info, f, indent=1)
+
+    def to_csv(self, path):
+        """Write the kept per-step history as CSV, times in seconds."""
+        history = self.history
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            for row in history:
+                writer.writerow([int(row[0])] + [f'{1e-9*v:.9f}'
+                                                 for v in row[1:-1]] +
+                                [int(row[-1])])
+
+
+def start_profiling(period=None, history=65536):
+    """
+    Start timing every analysis step and return the StepProfiler.
+
+    Args:
+        period: target step period in seconds, e.g. the analysis dt for a
+            real-time test; slower steps are counted as overruns
+        history: number of most recent steps kept for to_csv() (0: none)
+
+    While profiling, analyze(n) runs as n single-step calls.
+    """
+    ops = sys.modules[__package__]
+    source = None
+    if ops.backend() == 'python':
+        from ..pysim import _experimental
+        from ..pysim._commands import _session
+
+        def source():
+            domain = _session.domain
+            return None if domain is None else domain.exp.phases
+
+        # The phase timers of the Python backend only run while profiling
+        _experimental.set_timing(True)
+
+    profiler = StepProfiler(period, history, source)
+    _hooks.set_profiler(profiler)
+    return profiler
+
+
+def stop_profiling():
+    """Stop timing analysis steps and return the profiler (or None)."""
+    profiler = _hooks._profiler
+    _hooks.set_profiler(None)
+    if sys.modules[__package__].backend() == 'python':
+        from ..pysim import _experimental
+        _experimental.set_timing(False)
+    return profiler
@@ -0,0 +1,240 @@
+# openfrescopy/opensees/_realtime.py
+"""
+Real-time pacing of analysis steps for openfrescopy.opensees.
+
+RealTimeRunner replaces loops like
+
+    for i in range(n):
+        ops.analyze(1, dt)
+        time.sleep(dt)
+
+with a scheduler that starts step k at start + k*period on the monotonic
+high-resolution clock. It sleeps until shortly before each deadline and
+spins for the rest, so the start jitter is limited by the spin loop rather
+than by the OS timer. How overruns are handled is set by the policy:
+
+    'catch-up'  run late steps back to back until the schedule is met again
+    'skip'      give up the missed periods and start the next step at the
+                next period boundary
+    'abort'     stop the run at the first step that overruns its period
+
+Usage:
+    runner = ops.RealTimeRunner(dtAna, policy='skip', cpu=3, priority=80)
+    res = runner.run(1790)
+    res.lateness.max(), res.overruns
+
+On Linux the runner can pin the process to CPUs (os.sched_setaffinity) and
+request SCHED_FIFO priority (os.sched_setscheduler, needs CAP_SYS_NICE). The
+hints are restored after the run and skipped with a note in result.hints
+where they are not available.
+"""
+
+import gc
+import os
+import sys
+import time
+
+import numpy as np
+
+POLICIES = ('catch-up', 'skip', 'abort')
+
+
+class RealTimeResult:
+    """
+    Timestamps of one RealTimeRunner.run().
+
+    Attributes:
+        target: scheduled start time of each step (s since the run started)
+        start: actual start time of each step
+        end: end time of each step
+        steps: number of steps that ran
+        status: analyze() return code of the last step (0 on success)
+        overruns: steps that ended after the start of their next period
+        skipped: periods given up under the 'skip' policy
+        aborted: True if the 'abort' policy or max_lag stopped the run
+        hints: {hint: outcome} for the affinity, priority and gc hints
+    """
+
+    def __init__(self, n_steps):
+        self.target = np.zeros(n_steps)
+        self.start = np.zeros(n_steps)
+        self.end = np.zeros(n_steps)
+        self.steps = 0
+        self.status = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.aborted = False
+        self.hints = {}
+
+    @property
+    def lateness(self):
+        """Start time minus scheduled start time of each step."""
+        return self.start - self.target
+
+    @property
+    def duration(self):
+        """Wall time of each step."""
+        return self.end - self.start
+
+    def __repr__(self):
+        late = self.lateness
+        worst = late.max() if len(late) else 0.0
+        return (f'RealTimeResult(steps={self.steps}, status={self.status}, '
+                f'overruns={self.overruns}, skipped={self.skipped}, '
+                f'aborted={self.aborted}, max_lateness={worst:.3e})')
+
+    def trim(self):
+        n = self.steps
+        self.target = self.target[:n]
+        self.start = self.start[:n]
+        self.end = self.end[:n]
+        return self
+
+
+class RealTimeRunner:
+    """
+    Run analysis steps on a fixed real-time schedule.
+
+    Args:
+        period: wall time between step starts in seconds
+        dt: analysis time step passed to analyze() (default: period, i.e.
+            a time scale of 1)
+        policy: 'catch-up', 'skip' or 'abort' (see the module docstring)
+        spin: the final part of each wait, in seconds, that is busy-waited
+            instead of slept
+        max_lag: with 'catch-up', abort once the schedule is this many
+            seconds behind (default: never)
+        cpu: CPU index or list of CPU indices to pin the process to (Linux)
+        priority: SCHED_FIFO priority 1-99 to request (Linux)
+        disable_gc: suspend the garbage collector during the run so that
+            collections do not land inside a step
+    """
+
+    def __init__(self, period, dt=None, policy='catch-up', spin=2.0e-4,
+                 max_lag=None, cpu=None, priority=None, disable_gc=True):
+        if policy not in POLICIES:
+            raise ValueError(f'policy must be one of {POLICIES}, not '
+                             f'{policy!r}')
+        if period <= 0.0:
+            raise ValueError('period must be positive')
+        self.period = float(period)
+        self.dt = self.period if dt is None else float(dt)
+        self.policy = policy
+        self.spin = max(0.0, float(spin))
+        self.max_lag = max_lag
+        self.cpu = cpu
+        self.priority = priority
+        self.disable_gc = disable_gc
+
+    def _apply_hints(self, hints):
+        """Apply the OS hints; return a function that undoes them."""
+        undo = []
+        if self.cpu is not None:
+            if hasattr(os, 'sched_setaffinity'):
+                cpus = {self.cpu} if isinstance(self.cpu, int) else set(self.cpu)
+                try:
+                    old = os.sched_getaffinity(0)
+                    os.sched_setaffinity(0, cpus)
+                    undo.append(lambda: os.sched_setaffinity(0, old))
+                    hints['affinity'] = sorted(cpus)
+                except OSError as e:
+                    hints['affinity'] = f'not set: {e}'
+            else:
+                hints['affinity'] = 'not available on this platform'
+        if self.priority is not None:
+            if hasattr(os, 'sched_setscheduler'):
+                try:
+                    policy = os.sched_getscheduler(0)
+                    param = os.sched_getparam(0)
+                    os.sched_setscheduler(
+                        0, os.SCHED_FIFO, os.sched_param(int(self.priority)))
+                    undo.append(lambda: os.sched_setscheduler(0, policy, param))
+                    hints['priority'] = f'SCHED_FIFO {int(self.priority)}'
+                except OSError as e:
+                    hints['priority'] = f'not set: {e}'
+            else:
+                hints['priority'] = 'not available on this platform'
+        if self.disable_gc and gc.isenabled():
+            gc.disable()
+            undo.append(gc.enable)
+            hints['gc'] = 'disabled'
+
+        def restore():
+            for fn in reversed(undo):
+                try:
+                    fn()
+                except OSError:
+                    pass
+        return restore
+
+    def run(self, n_steps, callback=None):
+        """
+        Run n_steps analysis steps on the schedule.
+
+        Args:
+            n_steps: number of steps
+            callback: optional callable(step) called after each converged
+                step, inside the step's period; returning True stops the run
+
+        Returns:
+            RealTimeResult; the run stops early if analyze() fails.
+        """
+        ops = sys.modules[__package__]
+        analyze = ops.analyze
+        dt = self.dt
+        n_steps = int(n_steps)
+        result = RealTimeResult(n_steps)
+        clock = time.perf_counter_ns
+        sleep = time.sleep
+        period = int(round(self.period*1e9))
+        spin = int(round(self.spin*1e9))
+        max_lag = None if self.max_lag is None else int(self.max_lag*1e9)
+        policy = self.policy
+        target_row, start_row, end_row = (np.zeros(n_steps, dtype=np.int64)
+                                          for _ in range(3))
+
+        restore = self._apply_hints(result.hints)
+        try:
+            origin = clock()
+            target = origin
+            for k in range(n_steps):
+                # Sleep until shortly before the deadline, then spin
+                now = clock()
+                if target - now > spin:
+                    sleep((target - now - spin)*1e-9)
+                while clock() < target:
+                    pass
+                t0 = clock()
+                status = analyze(1, dt)
+                stop = status == 0 and callback is not None and callback(k)
+                t1 = clock()
+                target_row[k] = target
+                start_row[k] = t0
+                end_row[k] = t1
+                result.steps = k + 1
+                if status != 0:
+                    result.status = status
+                    break
+                if stop:
+                    break
+                target += period
+                if t1 > target:
+                    result.overruns += 1
+                    if policy == 'abort':
+                        result.aborted = True
+                        break
+                    if policy == 'skip':
+                        missed = (t1 - target)//period + 1
+                        result.skipped += missed
+                        target += missed*period
+                    elif max_lag is not None and t1 - target > max_lag:
+                        result.aborted = True
+                        break
+        finally:
+            restore()
+
+        n = result.steps
+        result.target[:n] = 1e-9*(target_row[:n] - origin)
+        result.start[:n] = 1e-9*(start_row[:n] - origin)
+        result.end[:n] = 1e-9*(end_row[:n] - origin)
+        return result.trim()
@@ -0,0 +1,405 @@
+# openfrescopy/opensees/_recorders.py
+"""
+Python-side binary recorders for openfrescopy.opensees.
+
+binary_recorder() accepts the same arguments as the Node and Element
+recorders, but writes fixed-dtype binary columns (see openfrescopy.recorders)
+instead of ASCII text:
+
+    ops.binary_recorder("Node", "-file", "Node_Dsp.bin", "-time",
+                        "-node", 3, 4, "-dof", 1, "disp")
+    ops.binary_recorder("Element", "-file", "Elmt_ctrlDsp.bin", "-time",
+                        "-ele", 1, 2, "ctrlDisp", dtype='float32')
+
+The recorder samples after every converged step and on record(), and is
+closed by wipe() or remove_binary_recorder().
+
+decimating_recorder() bounds the output of long tests. It keeps every k-th
+sample per channel, the min/max envelope of every channel over windows, and
+a fixed-size ring of recent full-rate samples. The ring is written out when
+a trigger fires:
+
+    ops.decimating_recorder("Element", "-file", "Elmt_daqDsp.bin", "-time",
+                            "-ele", 1, 2, "daqDisp", decimate=50, ring=2048,
+                            post=512, trigger=ops.LimitTrigger(
+                                ops.ElementOutput([1, 2], "daqForce"),
+                                limit=1.4))
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from ..recorders import RecordingWriter, parse_recorder_args
+from . import _hooks
+from ._driver import ElementOutput, NodeOutput, _samplers
+
+
+def _parse(args):
+    """Split recorder() arguments into (kind, path, options, spec)."""
+    info = parse_recorder_args(args)
+    if info['kind'] == 'Node':
+        spec = NodeOutput(info['tags'], info['dofs'], info['response'][0])
+    else:
+        spec = ElementOutput(info['tags'], info['response'][0],
+                             tuple(info['response'][1:]))
+    return info['kind'], info['path'], info, spec
+
+
+class BinaryRecorder:
+    """A Node or Element recorder that writes a binary recording."""
+
+    def __init__(self, *args, dtype=np.float64, block_rows=1024):
+        ops = sys.modules[__package__]
+        kind, path, options, spec = _parse(args)
+        self.path = path
+        self.time = options['time']
+        self.dT = options['dT']
+        self._get_time = ops.getTime
+        self._last = None
+        fill, labels = _samplers(ops, {'values': spec})['values']
+        self._fill = fill
+        if self.time:
+            labels = ['time'] + labels
+        meta = {'type': kind, 'args': [str(a) for a in args]}
+        self.writer = RecordingWriter(path, labels, dtype=dtype, meta=meta,
+                                      block_rows=block_rows)
+        _hooks.add_step_hook(self.record)
+        _hooks.add_wipe_hook(self.close)
+
+    def record(self):
+        """Sample the recorded quantities into the next row."""
+        t = self._get_time()
+        if self.dT > 0.0 and self._last is not None and \
+                t - self._last < self.dT - 1.0e-12:
+            return
+        self._last = t
+        row = self.writer.next_row()
+        if self.time:
+            row[0] = t
+            self._fill(row[1:])
+        else:
+            self._fill(row)
+        self.writer.commit()
+
+    def close(self):
+        """Flush the remaining rows and stop recording."""
+        _hooks.remove_step_hook(self.record)
+        _hooks.remove_wipe_hook(self.close)
+        self.writer.close()
+
+
+def binary_recorder(*args, dtype=np.float64, block_rows=1024):
+    """
+    Create a Node or Element recorder that writes binary columns.
+
+    Takes the same arguments as recorder('Node', ...) and
+    recorder('Element', ...), with 'time' as the first column if '-time' is
+    given and '-dT' sampling honored. Values are stored as `dtype` (float64
+    or float32) and can be read back with openfrescopy.recorders.
+
+    Returns:
+        The BinaryRecorder; pass it to remove_binary_recorder() to close it
+        before wipe().
+    """
+    return BinaryRecorder(*args, dtype=dtype, block_rows=block_rows)
+
+
+def remove_binary_recorder(recorder):
+    """Flush and close a recorder created by binary_recorder()."""
+    recorder.close()
+
+
+class LimitTrigger:
+    """
+    Trigger of a DecimatingRecorder that fires when values leave a range.
+
+    Args:
+        source: label or index of a channel of the recorder (e.g. '1/1'), or
+            a NodeOutput/ElementOutput sampled on its own, e.g.
+            ElementOutput([1, 2], 'daqForce') for a force limit while
+            recording daqDisp
+        limit: fire when the absolute value of any sampled value exceeds it
+        lower, upper: fire when a value drops below lower or rises above
+            upper (instead of, or in addition to, limit)
+    """
+
+    def __init__(self, source, limit=None, lower=None, upper=None):
+        if limit is None and lower is None and upper is None:
+            raise ValueError('LimitTrigger needs limit, lower or upper')
+        self.source = source
+        self.limit = limit
+        self.lower = lower
+        self.upper = upper
+        self._column = None
+        self._fill = None
+        self._values = None
+
+    def bind(self, ops, labels):
+        """Resolve the source against the channels of a recorder."""
+        if isinstance(self.source, (NodeOutput, ElementOutput)):
+            fill, own = _samplers(ops, {'trigger': self.source})['trigger']
+            self._fill = fill
+            self._values = np.zeros(len(own))
+        elif isinstance(self.source, str):
+            try:
+                self._column = labels.index(self.source)
+            except ValueError:
+                raise ValueError(f'LimitTrigger: the recorder has no channel '
+                                 f'{self.source!r}; channels are '
+                                 f'{labels}') from None
+        else:
+            self._column = int(self.source)
+
+    def __call__(self, t, values):
+        if self._fill is not None:
+            self._fill(self._values)
+            values = self._values
+        else:
+            values = values[self._column]
+        return bool(
+            (self.limit is not None and np.any(np.abs(values) > self.limit))
+            or (self.lower is not None and np.any(values < self.lower))
+            or (self.upper is not None and np.any(values > self.upper)))
+
+
+class DecimatingRecorder:
+    """
+    A Node or Element recorder with bounded output and memory.
+
+    Every sample (each converged step and record(), subject to -dT) is
+    taken at full rate and then reduced:
+
+    - decimation keeps every k-th sample per channel. Channels with the
+      same factor share one recording: `path` if all factors are equal,
+      otherwise '<stem>-d<k><ext>' per factor. As with BinaryRecorder,
+      'time' is the first column only if '-time' is given;
+    - the envelope writes the minimum and maximum of every channel over
+      windows of `envelope` samples to '<stem>-env<ext>', so peaks the
+      decimation drops are kept;
+    - the ring holds the last `ring` full-rate samples in memory. When the
+      trigger fires, the ring is written to '<stem>-trig<ext>', followed
+      by `post` more full-rate samples (extended while the trigger keeps
+      firing), with the event number as the first column. The trigger
+      re-arms once it stops firing.
+
+    The envelope and triggered recordings always hold the window and
+    sample times, since their rows cannot be placed without them.
+
+    Attributes:
+        paths: {'decimated': [paths], 'envelope': path, 'triggered': path}
+        samples: samples taken
+        events: times the trigger fired
+    """
+
+    def __init__(self, *args, decimate=1, envelope=True, ring=0,
+                 trigger=None, post=0, dtype=np.float64, block_rows=1024):
+        ops = sys.modules[__package__]
+        kind, path, options, spec = _parse(args)
+        self.time = options['time']
+        self.dT = options['dT']
+        self._get_time = ops.getTime
+        self._last = None
+        fill, labels = _samplers(ops, {'values': spec})['values']
+        self._fill = fill
+        self.labels = labels
+        width = len(labels)
+        if isinstance(decimate, dict):
+            factors = [int(decimate.get(label, 1)) for label in labels]
+        else:
+            factors = np.broadcast_to(np.asarray(decimate, dtype=np.int64),
+                                      (width,)).tolist()
+        if min(factors, default=1) < 1:
+            raise ValueError('decimation factors must be at least 1')
+        largest = max(factors, default=1)
+        if envelope is True:
+            envelope = largest if largest > 1 else 0
+        self.window = int(envelope or 0)
+        self.ring_size = int(ring)
+        self.post = int(post)
+        self.trigger = trigger
+        if trigger is not None and hasattr(trigger, 'bind'):
+            trigger.bind(ops, labels)
+        meta = {'type': kind, 'args': [str(a) for a in args]}
+        stem, ext = os.path.splitext(path)
+
+        def writer(name, columns, extra):
+            return RecordingWriter(name, columns, dtype=dtype,
+                                   meta=dict(meta, **extra),
+                                   block_rows=block_rows)
+
+        # One recording per decimation factor
+        self._groups = []
+        distinct = sorted(set(factors))
+        for k in distinct:
+            cols = np.array([j for j, f in enumerate(factors) if f == k],
+                            dtype=np.intp)
+            name = path if len(distinct) == 1 else f'{stem}-d{k}{ext}'
+            columns = [labels[j] for j in cols]
+            if self.time:
+                columns = ['time'] + columns
+            self._groups.append((k, cols, writer(name, columns,
+                                                 {'decimate': k})))
+        self._row = np.zeros(width)
+        self._env = None
+        if self.window:
+            self._env = writer(
+                f'{stem}-env{ext}', ['time_start', 'time_end'] +
+                [f'min:{label}' for label in labels] +
+                [f'max:{label}' for label in labels],
+                {'envelope': self.window})
+            self._lo = np.full(width, np.inf)
+            self._hi = np.full(width, -np.inf)
+            self._env_count = 0
+            self._env_start = 0.0
+        self._trig = None
+        if trigger is not None:
+            self._trig = writer(f'{stem}-trig{ext}',
+                                ['event', 'time'] + labels,
+                                {'ring': self.ring_size, 'post': self.post})
+            # Preallocated (time, values) rows of the most recent samples
+            self._ring = np.zeros((self.ring_size, 1 + width))
+            self._ring_next = 0
+            self._ring_count = 0
+            self._post_left = 0
+            self._armed = True
+        self.paths = {
+            'decimated': [w.path for _, _, w in self._groups],
+            'envelope': None if self._env is None else self._env.path,
+            'triggered': None if self._trig is None else self._trig.path,
+        }
+        self.samples = 0
+        self.events = 0
+        _hooks.add_step_hook(self.record)
+        _hooks.add_wipe_hook(self.close)
+
+    def record(self):
+        """Sample the recorded quantities and reduce them."""
+        t = self._get_time()
+        if self.dT > 0.0 and self._last is not None and \
+                t - self._last < self.dT - 1.0e-12:
+            return
+        self._last = t
+        row = self._row
+        self._fill(row)
+        n = self.samples
+        self.samples = n + 1
+        for k, cols, writer in self._groups:
+            if n % k == 0:
+                out = writer.next_row()
+                if self.time:
+                    out[0] = t
+                    out[1:] = row[cols]
+                else:
+                    out[:] = row[cols]
+                writer.commit()
+        if self._env is not None:
+            self._envelope(t, row)
+        if self._trig is not None:
+            self._capture(t, row)
+
+    def _envelope(self, t, row):
+        if self._env_count == 0:
+            self._env_start = t
+        np.minimum(self._lo, row, out=self._lo)
+        np.maximum(self._hi, row, out=self._hi)
+        self._env_count += 1
+        if self._env_count == self.window:
+            self._write_envelope(t)
+
+    def _write_envelope(self, t):
+        out = self._env.next_row()
+        width = len(self._row)
+        out[0] = self._env_start
+        out[1] = t
+        out[2:2 + width] = self._lo
+        out[2 + width:] = self._hi
+        self._env.commit()
+        self._lo.fill(np.inf)
+        self._hi.fill(-np.inf)
+        self._env_count = 0
+
+    def _capture(self, t, row):
+        fired = self.trigger(t, row)
+        if self._post_left > 0:
+            # Recording after an event: straight to the file
+            out = self._trig.next_row()
+            out[0] = self.events
+            out[1] = t
+            out[2:] = row
+            self._trig.commit()
+            self._post_left -= 1
+            if fired:
+                self._post_left = self.post
+            self._armed = not fired
+            return
+        if self.ring_size:
+            slot = self._ring[self._ring_next]
+            slot[0] = t
+            slot[1:] = row
+            self._ring_next = (self._ring_next + 1) % self.ring_size
+            self._ring_count = min(self._ring_count + 1, self.ring_size)
+        if fired and self._armed:
+            self.events += 1
+            self._flush_ring()
+            self._post_left = self.post
+        self._armed = not fired
+
+    def _flush_ring(self):
+        """Write the ring, oldest sample first, as rows of the event."""
+        n = self._ring_count
+        if not n:
+            return
+        order = (self._ring_next - n + np.arange(n)) % self.ring_size
+        block = np.empty((n, 1 + self._ring.shape[1]))
+        block[:, 0] = self.events
+        block[:, 1:] = self._ring[order]
+        self._trig.write_block(block)
+        self._ring_count = 0
+
+    def flush_ring(self):
+        """Write the ring now, as if the trigger had fired."""
+        if self._trig is not None:
+            self.events += 1
+            self._flush_ring()
+
+    def close(self):
+        """Write the partial envelope window and stop recording."""
+        _hooks.remove_step_hook(self.record)
+        _hooks.remove_wipe_hook(self.close)
+        if self._env is not None:
+            if self._env_count and not self._env.closed:
+                self._write_envelope(self._last)
+            self._env.close()
+        for _, _, writer in self._groups:
+            writer.close()
+        if self._trig is not None:
+            self._trig.close()
+
+
+def decimating_recorder(*args, decimate=1, envelope=True, ring=0,
+                        trigger=None, post=0, dtype=np.float64,
+                        block_rows=1024):
+    """
+    Create a Node or Element recorder with bounded output and memory.
+
+    See DecimatingRecorder for the recordings it writes. Takes the same
+    arguments as binary_recorder(), plus:
+        decimate: keep every k-th sample; an int for all channels, a
+            sequence with one factor per channel or a {label: factor} dict
+            (labels are 'node/dof' or 'element/component', default 1)
+        envelope: window in samples of the min/max envelope; True uses the
+            largest decimation factor (no envelope if it is 1), 0 disables it
+        ring: number of recent full-rate samples kept in memory
+        trigger: callable(t, values) -> bool called with every sample, or a
+            LimitTrigger; when it fires the ring is written out
+        post: full-rate samples written after the trigger fired
+
+    Returns:
+        The DecimatingRecorder; pass it to remove_binary_recorder() to close
+        it before wipe().
+    """
+    return DecimatingRecorder(*args, decimate=decimate, envelope=envelope,
+                              ring=ring, trigger=trigger, post=post,
+                              dtype=dtype, block_rows=block_rows)
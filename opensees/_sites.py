@@ -0,0 +1,67 @@
+# openfrescopy/opensees/_sites.py
+"""
+Concurrent site dispatch for openfrescopy.opensees.
+
+By default the trial responses of a step are sent to the experimental sites,
+and the measured responses collected, one site after another, so the step
+costs the sum of the site latencies. site_dispatch('concurrent') drives all
+sites in parallel (remote sites on their event loop, others on a thread
+pool), so the step costs about as much as the slowest site:
+
+    ops.site_dispatch('concurrent')
+    ops.analyze(100, dt)
+    ops.site_timing()    # {'step': {...}, 1: {...}, 2: {...}}
+
+The dispatch happens in the Python backend's element loop; with the native
+backend the sites are driven inside OpenFresco and these helpers raise
+RuntimeError.
+"""
+
+import sys
+
+
+def _dispatcher():
+    ops = sys.modules[__package__]
+    if ops.backend() != 'python':
+        raise RuntimeError('site dispatch is only available with the Python '
+                           'backend (OPENFRESCOPY_BACKEND=python)')
+    from ..pysim._commands import _session
+    return _session.dispatcher
+
+
+def site_dispatch(mode='concurrent', workers=None):
+    """
+    Select how the experimental sites are driven within a step.
+
+    Args:
+        mode: 'serial' (one site after another) or 'concurrent' (all sites
+            at once)
+        workers: thread pool size for non-remote sites in concurrent mode
+            (default chosen by concurrent.futures)
+    """
+    _dispatcher().configure(mode, workers)
+
+
+def _stats(entry):
+    last, total, peak, calls = entry
+    return {'last': last, 'mean': total/calls if calls else 0.0, 'max': peak,
+            'calls': calls}
+
+
+def site_timing(reset=False):
+    """
+    Return the wall time spent per site and per step exchange, in seconds.
+
+    The result maps 'step' and every site tag to a dict with the 'last',
+    'mean' and 'max' time and the number of 'calls'. Only sites on the
+    per-object path are timed; LocalSites compiled into the vectorized
+    element update have no latency of their own. With reset=True the
+    counters start over after this call.
+    """
+    dispatcher = _dispatcher()
+    timing = {'step': _stats(dispatcher.step_timing)}
+    for tag, entry in dispatcher.timing.items():
+        timing[tag] = _stats(entry)
+    if reset:
+        dispatcher.reset_timing()
+    return timing
@@ -0,0 +1,28 @@
+# openfrescopy/pysim/__init__.py
+"""
+Pure-Python/NumPy stand-in for opensees.pyd with the OpenFrescoPy package.
+
+The native OpenSees and OpenFresco binaries only exist for Windows. This
+backend implements the subset of commands needed by local hybrid simulations
+like examples/OneBayFrame so they can run anywhere NumPy is available:
+
+    model, node, fix, mass, uniaxialMaterial (Elastic, Steel02),
+    element (truss), expControlPoint, expControl (SimUniaxialMaterials,
+    SCRAMNetEmulator), expSetup (OneActuator), expSite (LocalSite,
+    RemoteSite, ActorSite, SharedMemorySite), startLabServer, expElement
+    (twoNodeLink, generic), timeSeries (Constant, Linear, Path), pattern
+    (Plain, UniformExcitation), load, loadConst, rayleigh, integrator
+    (NewmarkExplicit, Newmark, LoadControl), algorithm (Linear, Newton,
+    ModifiedNewton), test, analysis (Transient, Static), analyze, eigen,
+    recorder (Node, Element), record and the node/element response queries.
+
+Material states of all experimental controls and numerical elements are
+updated as one vectorized batch per step.
+
+openfrescopy.opensees falls back to this backend when opensees.pyd cannot be
+loaded; set OPENFRESCOPY_BACKEND=python to select it explicitly. Unsupported
+commands and options raise OpenSeesError.
+"""
+
+from ._commands import *
+from ._commands import __all__
@@ -0,0 +1,270 @@
+# openfrescopy/pysim/_analysis.py
+"""
+Analysis of the Python stand-in backend: integrators, solution algorithms,
+convergence tests and the eigenvalue solver.
+
+Supported settings (all system/numberer/constraints choices map to a dense
+NumPy solve with the Plain numbering of the free DOFs):
+
+    integrator  NewmarkExplicit gamma | Newmark gamma beta | LoadControl dlam
+    algorithm   Linear | Newton | ModifiedNewton  (with optional -initial)
+    test        NormDispIncr | EnergyIncr | NormUnbalance | FixedNumIter
+    analysis    Transient | Static
+"""
+
+import numpy as np
+
+from ._errors import OpenSeesError
+
+
+class ConvergenceTest:
+    """test(type, tol, maxIter, <printFlag>, <normType>)."""
+
+    TYPES = ('NormDispIncr', 'EnergyIncr', 'NormUnbalance', 'FixedNumIter')
+
+    def __init__(self, kind='NormUnbalance', tol=1.0e-6, max_iter=25):
+        if kind not in self.TYPES:
+            raise OpenSeesError(f"test '{kind}' is not supported by the "
+                                f"Python backend")
+        self.kind = kind
+        self.tol = tol
+        self.max_iter = int(max_iter)
+
+    def norm(self, du, r):
+        if self.kind == 'NormDispIncr':
+            return float(np.linalg.norm(du))
+        if self.kind == 'EnergyIncr':
+            return 0.5*abs(float(du @ r))
+        if self.kind == 'NormUnbalance':
+            return float(np.linalg.norm(r))
+        return 0.0
+
+    def converged(self, iteration, du, r):
+        if self.kind == 'FixedNumIter':
+            return iteration >= self.max_iter
+        return self.norm(du, r) <= self.tol
+
+
+class Analysis:
+    """The analysis components and the stepping logic for one domain."""
+
+    def __init__(self, session):
+        self.session = session
+        self.integrator = None
+        self.algorithm = ('Linear', False)
+        self.test = ConvergenceTest()
+        self.kind = None
+        self._damping_cache = None
+
+    # -- setup ---------------------------------------------------------------
+
+    def set_integrator(self, kind, args):
+        args = [float(a) for a in args if not isinstance(a, str)]
+        if kind == 'NewmarkExplicit':
+            self.integrator = (kind, args[0] if args else 0.5, 0.0)
+        elif kind == 'Newmark':
+            if len(args) < 2:
+                raise OpenSeesError('integrator Newmark: want gamma beta')
+            self.integrator = (kind, args[0], args[1])
+        elif kind == 'LoadControl':
+            if not args:
+                raise OpenSeesError('integrator LoadControl: want dLambda')
+            self.integrator = (kind, args[0], 0.0)
+        else:
+            raise OpenSeesError(f"integrator '{kind}' is not supported by the "
+                                f"Python backend")
+
+    def set_algorithm(self, kind, args):
+        if kind not in ('Linear', 'Newton', 'ModifiedNewton'):
+            raise OpenSeesError(f"algorithm '{kind}' is not supported by the "
+                                f"Python backend")
+        self.algorithm = (kind, '-initial' in args)
+
+    def set_analysis(self, kind):
+        if kind not in ('Transient', 'Static'):
+            raise OpenSeesError(f"analysis '{kind}' is not supported by the "
+                                f"Python backend")
+        if self.integrator is None:
+            self.integrator = (('NewmarkExplicit', 0.5, 0.0)
+                               if kind == 'Transient' else
+                               ('LoadControl', 1.0, 0.0))
+        self.kind = kind
+
+    # -- helpers -------------------------------------------------------------
+
+    def _damping(self, domain):
+        """
+        Return (c_diag, C) with the Rayleigh damping matrix as a diagonal
+        (mass-proportional part) plus an optional dense stiffness part.
+        """
+        alphaM, betaK, betaKinit, betaKcomm = domain.rayleigh
+        c_diag = alphaM*domain.m
+        C = None
+        if betaK or betaKcomm:
+            C = betaK*domain.stiffness('current')
+            if betaKcomm:
+                C += betaKcomm*domain.stiffness('committed')
+        if betaKinit:
+            key = (domain.version, betaKinit)
+            if self._damping_cache is None or self._damping_cache[0] != key:
+                self._damping_cache = (key, betaKinit*domain.stiffness('initial'))
+            C = self._damping_cache[1] if C is None else C + self._damping_cache[1]
+        return c_diag, C
+
+    def _tangent(self, domain, c1, c2, c3, which='current'):
+        c_diag, C = self._damping(domain)
+        K = c1*domain.stiffness(which) if c1 else np.zeros((domain.neq,)*2)
+        if C is not None and c2:
+            K += c2*C
+        K[np.diag_indices_from(K)] += c2*c_diag + c3*domain.m
+        return K
+
+    def _unbalance(self, domain, with_inertia):
+        d = domain
+        r = d.to_eq(d.load(d.time)) - d.to_eq(d.resisting_force())
+        if with_inertia:
+            v = d.to_eq(d.V)
+            c_diag, C = self._damping(d)
+            r -= c_diag*v + d.m*d.to_eq(d.A)
+            if C is not None:
+                r -= C @ v
+        return r
+
+    # -- stepping ------------------------------------------------------------
+
+    def analyze(self, num_incr=1, dt=0.0):
+        if self.kind is None:
+            raise OpenSeesError('analyze: no analysis has been defined')
+        domain = self.session.require_domain()
+        domain.build()
+        if domain.neq == 0:
+            raise OpenSeesError('analyze: the model has no free DOFs')
+        step = {'NewmarkExplicit': self._step_explicit,
+                'Newmark': self._step_newmark,
+                'LoadControl': self._step_static}[self.integrator[0]]
+        if self.kind == 'Transient' and self.integrator[0] == 'LoadControl':
+            raise OpenSeesError('analyze: LoadControl needs a Static analysis')
+        if self.kind == 'Static' and self.integrator[0] != 'LoadControl':
+            raise OpenSeesError('analyze: a Static analysis needs LoadControl')
+        for i in range(int(num_incr)):
+            if step(domain, float(dt)) != 0:
+                domain.revert()
+                return -3
+            domain.commit()
+            self.session.after_commit()
+        return 0
+
+    def _step_explicit(self, domain, dt):
+        if dt <= 0.0:
+            raise OpenSeesError('analyze: a transient analysis needs dt > 0')
+        gamma = self.integrator[1]
+        d = domain
+        # Predict displacement and velocity, then solve for the acceleration
+        d.U += dt*d.V + 0.5*dt*dt*d.A
+        d.V += (1.0 - gamma)*dt*d.A
+        d.A[:] = 0.0
+        d.time += dt
+        d.update()
+        r = self._unbalance(d, with_inertia=True)
+        c2 = gamma*dt
+        c_diag, C = self._damping(d)
+        if C is None:
+            diag = d.m + c2*c_diag
+            if (diag <= 0.0).any():
+                raise OpenSeesError('analyze: NewmarkExplicit needs mass at '
+                                    'every free DOF')
+            a = r/diag
+        else:
+            M = c2*C
+            M[np.diag_indices_from(M)] += d.m + c2*c_diag
+            a = np.linalg.solve(M, r)
+        d.from_eq(a, d.A)
+        d.V.ravel()[d.free] += c2*a
+        return 0
+
+    def _iterate(self, domain, c1, c2, c3, with_inertia):
+        """Newton-type iterations on the current step; returns 0 or -3."""
+        d = domain
+        kind, initial = self.algorithm
+        which = 'initial' if initial else 'current'
+        K = None
+        iteration = 0
+        while True:
+            d.update()
+            r = self._unbalance(d, with_inertia)
+            if K is None or kind == 'Newton' and not initial:
+                K = self._tangent(d, c1, c2, c3, which)
+            try:
+                du = np.linalg.solve(K, r)
+            except np.linalg.LinAlgError:
+                return -3
+            d.U.ravel()[d.free] += du
+            if c2:
+                d.V.ravel()[d.free] += c2*du
+                d.A.ravel()[d.free] += c3*du
+            iteration += 1
+            if kind == 'Linear':
+                d.update()
+                return 0
+            if self.test.converged(iteration, du, r):
+                d.update()
+                return 0
+            if iteration >= self.test.max_iter:
+                return -3
+
+    def _step_newmark(self, domain, dt):
+        if dt <= 0.0:
+            raise OpenSeesError('analyze: a transient analysis needs dt > 0')
+        gamma, beta = self.integrator[1], self.integrator[2]
+        d = domain
+        V, A = d.V.copy(), d.A.copy()
+        d.V[:] = (1.0 - gamma/beta)*V + dt*(1.0 - 0.5*gamma/beta)*A
+        d.A[:] = -V/(beta*dt) + (1.0 - 0.5/beta)*A
+        d.time += dt
+        return self._iterate(d, 1.0, gamma/(beta*dt), 1.0/(beta*dt*dt), True)
+
+    def _step_static(self, domain, dt):
+        d = domain
+        d.time += self.integrator[1]
+        return self._iterate(d, 1.0, 0.0, 0.0, False)
+
+    # -- eigenvalues ---------------------------------------------------------
+
+    def eigen(self, num_modes):
+        """
+        Solve K phi = lambda M phi for the lowest modes with a dense solver.
+
+        DOFs without mass are condensed out statically, as the generalized
+        LAPACK solver effectively does by placing their eigenvalues at
+        infinity.
+        """
+        d = self.session.require_domain()
+        d.update()
+        K = d.stiffness('current')
+        m = d.m
+        has = m > 0.0
+        nm = int(has.sum())
+        if num_modes > nm:
+            raise OpenSeesError(f'eigen: {num_modes} modes requested but only '
+                                f'{nm} DOFs have mass')
+        Kmm = K[np.ix_(has, has)]
+        if nm < len(m):
+            Kmo = K[np.ix_(has, ~has)]
+            Koo = K[np.ix_(~has, ~has)]
+            T = -np.linalg.solve(Koo, Kmo.T)
+            Kmm = Kmm + Kmo @ T
+        s = 1.0/np.sqrt(m[has])
+        lam, vec = np.linalg.eigh(s[:, None]*Kmm*s[None, :])
+        lam, vec = lam[:num_modes], s[:, None]*vec[:, :num_modes]
+        full = np.zeros((len(m), num_modes))
+        full[has] = vec
+        if nm < len(m):
+            full[~has] = T @ vec
+        # Normalize like OpenSees: unit generalized mass
+        full /= np.sqrt(np.einsum('ij,i,ij->j', full, m, full))
+        modes = np.zeros((num_modes,) + d.U.shape)
+        for k in range(num_modes):
+            d.from_eq(full[:, k], modes[k])
+        self.session.eigen_values = lam
+        self.session.eigen_vectors = modes
+        return [float(v) for v in lam]
@@ -0,0 +1,653 @@
+# openfrescopy/pysim/_commands.py
+"""
+OpenSees/OpenFresco command functions of the Python stand-in backend.
+
+Like the native interpreter, the commands act on one process-wide model
+(the module-level _session). The command names and argument conventions are
+those of OpenSeesPy and OpenFrescoPy, so scripts written for
+openfrescopy.opensees run unchanged on this backend.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from ..recorders import parse_recorder_args
+from ._analysis import Analysis, ConvergenceTest
+from ._domain import Domain, Pattern, TimeSeries
+from ._errors import OpenSeesError
+from ._experimental import (ControlPoint, LocalSite, OneActuator,
+                            SimUniaxialMaterials, SiteDispatcher)
+from ._materials import MaterialTable, parse_material
+
+__all__ = [
+    'OpenSeesError',
+    'wipe', 'wipeExp', 'model', 'node', 'fix', 'mass', 'uniaxialMaterial',
+    'element', 'expControlPoint', 'expControl', 'expSetup', 'expSite',
+    'expElement', 'timeSeries', 'pattern', 'load', 'loadConst', 'rayleigh',
+    'system', 'numberer', 'constraints', 'test', 'integrator', 'algorithm',
+    'analysis', 'wipeAnalysis', 'recorder', 'record', 'remove', 'analyze',
+    'eigen', 'start', 'stop', 'logFile', 'defaultUnits', 'loadPackage',
+    'getTime', 'setTime', 'getNodeTags', 'getEleTags', 'nodeCoord',
+    'nodeDisp', 'nodeVel', 'nodeAccel', 'nodeReaction', 'nodeEigenvector',
+    'eleResponse', 'reset', 'startLabServer',
+]
+
+
+class _TextRecorder:
+    """Node/Element recorder writing whitespace-separated text lines."""
+
+    def __init__(self, session, args):
+        try:
+            spec = parse_recorder_args(args)
+        except ValueError as e:
+            raise OpenSeesError(str(e)) from None
+        if spec['format'] != 'text':
+            raise OpenSeesError(f"recorder {spec['kind']}: the "
+                                f"'-{spec['format']}' output is not supported "
+                                f"by the Python backend (use '-file', or "
+                                f"binary_recorder() for binary output)")
+        self.session = session
+        self.kind = spec['kind']
+        self.time = spec['time']
+        self.dT = spec['dT']
+        self.tags = spec['tags']
+        self.dofs = spec['dofs']
+        self.response = spec['response']
+        self.precision = spec['precision']
+        self._last = None
+        if self.kind == 'Node':
+            if self.response not in (['disp'], ['vel'], ['accel'],
+                                     ['reaction']):
+                raise OpenSeesError(f'recorder Node: response '
+                                    f'{self.response} is not supported')
+        self.file = open(spec['path'], 'w')
+
+    def record(self):
+        s = self.session
+        t = s.domain.time
+        if self.dT > 0.0 and self._last is not None and \
+                t - self._last < self.dT - 1.0e-12:
+            return
+        self._last = t
+        values = [t] if self.time else []
+        if self.kind == 'Node':
+            get = _NODE_GETTERS[self.response[0]]
+            for tag in self.tags:
+                values.extend(get(tag, dof) for dof in self.dofs)
+        else:
+            for tag in self.tags:
+                values.extend(s.domain.element_response(tag, self.response))
+        fmt = f'%.{self.precision}g'
+        self.file.write(' '.join(fmt % v for v in values) + '\n')
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class _Session:
+    """The process-wide model, analysis and experimental objects."""
+
+    def __init__(self):
+        self.clear()
+        self.clear_exp()
+        # How the sites of all models are driven (see site_dispatch())
+        self.dispatcher = SiteDispatcher()
+        self.log = None
+        self.timer = None
+
+    def clear(self):
+        for rec in getattr(self, 'recorders', []):
+            rec.close()
+        self.table = MaterialTable()
+        self.materials = {}
+        self.domain = None
+        self.analysis = Analysis(self)
+        self.recorders = []
+        self.eigen_values = None
+        self.eigen_vectors = None
+
+    def clear_exp(self):
+        # Remote sites hold a connection to their lab server (ActorSite
+        # servers shut down by themselves when startLabServer returns)
+        for site in getattr(self, 'sites', {}).values():
+            if hasattr(site, 'close') and not hasattr(site, 'serve'):
+                site.close()
+        # Emulator controls are attached to a shared-memory mailbox
+        for control in getattr(self, 'controls', {}).values():
+            if hasattr(control, 'close'):
+                control.close()
+        self.control_points = {}
+        self.controls = {}
+        self.setups = {}
+        self.sites = {}
+
+    def require_domain(self):
+        if self.domain is None:
+            raise OpenSeesError('no model has been defined (call model first)')
+        return self.domain
+
+    def after_commit(self):
+        for rec in self.recorders:
+            rec.record()
+
+
+_session = _Session()
+
+
+def _lookup(registry, tag, what):
+    try:
+        return registry[int(tag)]
+    except KeyError:
+        raise OpenSeesError(f'{what} {tag} does not exist') from None
+
+
+# -- model building ----------------------------------------------------------
+
+def wipe():
+    """Remove the model, analysis and recorders."""
+    _session.clear()
+
+
+def wipeExp():
+    """Remove all experimental control points, controls, setups and sites."""
+    _session.clear_exp()
+
+
+def model(kind, *args):
+    """model('BasicBuilder' | 'basic', '-ndm', ndm, <'-ndf', ndf>)."""
+    if kind not in ('BasicBuilder', 'basic', 'Basic', '-basic'):
+        raise OpenSeesError(f"model '{kind}' is not supported")
+    opts = dict(zip(args[::2], args[1::2]))
+    ndm = int(opts.get('-ndm', 0))
+    if ndm not in (1, 2, 3):
+        raise OpenSeesError('model: -ndm must be 1, 2 or 3')
+    ndf = int(opts.get('-ndf', {1: 1, 2: 3, 3: 6}[ndm]))
+    _session.domain = Domain(ndm, ndf, _session.table)
+    _session.domain.exp.dispatcher = _session.dispatcher
+
+
+def node(tag, *args):
+    """node(tag, *coords, <'-mass', *masses>)."""
+    d = _session.require_domain()
+    args = list(args)
+    mass_values = None
+    if '-mass' in args:
+        k = args.index('-mass')
+        mass_values = [float(v) for v in args[k + 1:k + 1 + d.ndf]]
+        del args[k:k + 1 + d.ndf]
+    if any(isinstance(a, str) for a in args):
+        raise OpenSeesError(f'node {tag}: only -mass is supported')
+    d.add_node(int(tag), [float(a) for a in args], mass_values)
+
+
+def fix(tag, *flags):
+    _session.require_domain().fix(int(tag), flags)
+
+
+def mass(tag, *values):
+    _session.require_domain().set_mass(int(tag), [float(v) for v in values])
+
+
+def uniaxialMaterial(mat_type, tag, *args):
+    _session.materials[int(tag)] = parse_material((mat_type,) + args)
+
+
+def _material_copy(tag):
+    kind, params = _lookup(_session.materials, tag, 'uniaxialMaterial')
+    return _session.table.add(kind, params)
+
+
+def element(ele_type, tag, *args):
+    """element('truss', tag, iNode, jNode, A, matTag, <'-rho', rho>)."""
+    d = _session.require_domain()
+    if ele_type != 'truss':
+        raise OpenSeesError(f"element '{ele_type}' is not supported by the "
+                            f"Python backend (use truss)")
+    args = list(args)
+    rho = 0.0
+    if '-rho' in args:
+        k = args.index('-rho')
+        rho = float(args[k + 1])
+        del args[k:k + 2]
+    if len(args) != 4:
+        raise OpenSeesError(f'element truss {tag}: want iNode jNode A matTag')
+    ni, nj, area, mat = args
+    d.add_truss(int(tag), int(ni), int(nj), float(area), _material_copy(mat),
+                rho)
+
+
+# -- experimental objects ----------------------------------------------------
+
+def expControlPoint(tag, *args):
+    _session.control_points[int(tag)] = ControlPoint(int(tag), args)
+
+
+def expControl(ctrl_type, tag, *args):
+    """
+    expControl('SimUniaxialMaterials', tag, *matTags)
+    expControl('SCRAMNetEmulator', tag, memName, '-trialCP', cpTags...,
+               '-outCP', cpTags..., <'-timeout', seconds>)
+
+    SCRAMNetEmulator exchanges commands and measurements with an
+    openfrescopy.emulator controller through the shared-memory mailbox
+    memName (ControllerEmulator.name), using the handshake of the
+    SCRAMNet control. The trial control points give the actuators.
+    """
+    if ctrl_type == 'SCRAMNetEmulator':
+        _session.controls[int(tag)] = _emulator_control(int(tag), args)
+        return
+    if ctrl_type != 'SimUniaxialMaterials':
+        raise OpenSeesError(f"expControl '{ctrl_type}' is not supported by "
+                            f"the Python backend")
+    if not args or any(isinstance(a, str) for a in args):
+        raise OpenSeesError(f'expControl SimUniaxialMaterials {tag}: want '
+                            f'matTags')
+    slots = [_material_copy(m) for m in args]
+    _session.controls[int(tag)] = SimUniaxialMaterials(int(tag),
+                                                       _session.table, slots)
+
+
+def _emulator_control(tag, args):
+    from ..emulator import EmulatorControl
+
+    if not args:
+        raise OpenSeesError(f'expControl SCRAMNetEmulator {tag}: want memName')
+    name = str(args[0])
+    options = {'-trialCP': [], '-outCP': []}
+    timeout = 10.0
+    i = 1
+    while i < len(args):
+        flag = args[i]
+        if flag == '-timeout':
+            timeout = float(args[i + 1])
+            i += 2
+        elif flag in options:
+            i += 1
+            while i < len(args) and not isinstance(args[i], str):
+                options[flag].append(int(args[i]))
+                i += 1
+        else:
+            raise OpenSeesError(f'expControl SCRAMNetEmulator {tag}: unknown '
+                                f'option {flag!r}')
+    if not options['-trialCP']:
+        raise OpenSeesError(f'expControl SCRAMNetEmulator {tag}: want '
+                            f'-trialCP cpTags')
+    size = 0
+    for cp in options['-trialCP'] + options['-outCP']:
+        _lookup(_session.control_points, cp, 'expControlPoint')
+    for cp in options['-trialCP']:
+        size += len(_session.control_points[cp].entries)
+    try:
+        return EmulatorControl(tag, name, size, timeout)
+    except (OSError, ValueError) as e:
+        raise OpenSeesError(f'expControl SCRAMNetEmulator {tag}: {e}') \
+            from None
+
+
+def expSetup(setup_type, tag, *args):
+    """expSetup('OneActuator', tag, <'-control', ctrlTag,> dir, ...)."""
+    if setup_type != 'OneActuator':
+        raise OpenSeesError(f"expSetup '{setup_type}' is not supported by "
+                            f"the Python backend")
+    _session.setups[int(tag)] = OneActuator(int(tag), args, _session.controls)
+
+
+def expSite(site_type, tag, *args):
+    """
+    expSite('LocalSite', tag, setupTag)
+    expSite('RemoteSite', tag, ipAddr, ipPort, <'-dataSize', size>,
+            <'-pipeline'>)
+    expSite('ActorSite', tag, '-setup', setupTag, ipPort, <'-dataSize', size>)
+    expSite('SharedMemorySite', tag, memName, <'-timeout', seconds>)
+
+    RemoteSite and ActorSite talk through openfrescopy.sites, so both ends
+    must use the Python backend. startLabServer(tag) runs an ActorSite.
+    SharedMemorySite connects to a channel served by an
+    openfrescopy.substructure worker on this machine.
+    """
+    tag = int(tag)
+    if site_type == 'LocalSite':
+        setup = _lookup(_session.setups, args[0], 'expSetup')
+        _session.sites[tag] = LocalSite(tag, setup)
+        return
+    if site_type == 'SharedMemorySite':
+        _session.sites[tag] = _shared_memory_site(tag, args)
+        return
+    if site_type not in ('RemoteSite', 'ActorSite'):
+        raise OpenSeesError(f"expSite '{site_type}' is not supported by the "
+                            f"Python backend")
+    from .. import sites
+
+    args = list(args)
+    setup = None
+    if site_type == 'ActorSite':
+        if len(args) < 3 or args[0] != '-setup':
+            raise OpenSeesError(f'expSite ActorSite {tag}: want -setup '
+                                f'setupTag ipPort')
+        setup = _lookup(_session.setups, args[1], 'expSetup')
+        address, args = ('0.0.0.0', args[2]), args[3:]
+    else:
+        if len(args) < 2:
+            raise OpenSeesError(f'expSite RemoteSite {tag}: want ipAddr '
+                                f'ipPort')
+        address, args = (str(args[0]), args[1]), args[2:]
+    data_size, pipeline = sites.DATA_SIZE, False
+    i = 0
+    while i < len(args):
+        if args[i] == '-dataSize':
+            data_size = int(args[i + 1])
+            i += 2
+        elif args[i] == '-pipeline' and site_type == 'RemoteSite':
+            pipeline = True
+            i += 1
+        else:
+            raise OpenSeesError(f'expSite {site_type} {tag}: option '
+                                f'{args[i]} is not supported')
+    if site_type == 'ActorSite':
+        _session.sites[tag] = sites.SiteServer(
+            setup, address[0], int(address[1]), data_size)
+        return
+    try:
+        _session.sites[tag] = sites.BlockingRemoteSite(
+            address[0], int(address[1]), pipeline, data_size, tag=tag)
+    except OSError as e:
+        raise OpenSeesError(f'expSite RemoteSite {tag}: cannot connect to '
+                            f'{address[0]}:{address[1]} ({e})') from None
+
+
+def _shared_memory_site(tag, args):
+    from ..substructure import SharedMemorySite
+
+    if not args:
+        raise OpenSeesError(f'expSite SharedMemorySite {tag}: want memName')
+    timeout = 10.0
+    if len(args) > 1:
+        if args[1] != '-timeout' or len(args) != 3:
+            raise OpenSeesError(f'expSite SharedMemorySite {tag}: option '
+                                f'{args[1]!r} is not supported')
+        timeout = float(args[2])
+    try:
+        return SharedMemorySite(str(args[0]), tag=tag, timeout=timeout)
+    except (OSError, ValueError) as e:
+        raise OpenSeesError(f'expSite SharedMemorySite {tag}: {e}') from None
+
+
+def startLabServer(tag):
+    """Serve the ActorSite `tag` until its RemoteSite client disconnects."""
+    server = _lookup(_session.sites, tag, 'expSite')
+    if not hasattr(server, 'serve'):
+        raise OpenSeesError(f'startLabServer: expSite {tag} is not an '
+                            f'ActorSite')
+    server.serve(once=True)
+
+
+def expElement(ele_type, tag, *args):
+    """
+    expElement('twoNodeLink', tag, iNode, jNode, '-dir', ..., '-site', ...)
+    expElement('generic', tag, '-node', nodes..., '-dof', dofs...,
+               <'-dof', dofs...,> '-site', siteTag, '-initStif', Kij...,
+               <'-iMod'>)
+    """
+    if ele_type not in ('twoNodeLink', 'generic'):
+        raise OpenSeesError(f"expElement '{ele_type}' is not supported by "
+                            f"the Python backend")
+    d = _session.require_domain()
+    if ele_type == 'generic':
+        d.add_generic_exp_element(int(tag), args, _session.sites)
+        return
+    d.add_exp_element(int(tag), int(args[0]), int(args[1]), args[2:],
+                      _session.sites)
+
+
+# -- loads -------------------------------------------------------------------
+
+def timeSeries(series_type, tag, *args):
+    d = _session.require_domain()
+    d.series[int(tag)] = TimeSeries(int(tag), series_type, args)
+
+
+def pattern(pattern_type, tag, *args):
+    """pattern('Plain', tag, tsTag) or pattern('UniformExcitation', tag,
+    dir, '-accel', tsTag, <'-fact', f>)."""
+    d = _session.require_domain()
+    tag = int(tag)
+    if pattern_type == 'Plain':
+        series = _lookup(d.series, args[0], 'timeSeries')
+        opts = dict(zip(args[1::2], args[2::2]))
+        p = Pattern(tag, 'Plain', series, fact=float(opts.get('-fact', 1.0)))
+    elif pattern_type == 'UniformExcitation':
+        opts = dict(zip(args[1::2], args[2::2]))
+        if '-accel' not in opts or set(opts) - {'-accel', '-fact'}:
+            raise OpenSeesError(f'pattern UniformExcitation {tag}: want dir '
+                                f'-accel tsTag <-fact f>')
+        series = _lookup(d.series, opts['-accel'], 'timeSeries')
+        p = Pattern(tag, 'UniformExcitation', series,
+                    direction=int(args[0]) - 1,
+                    fact=float(opts.get('-fact', 1.0)))
+    else:
+        raise OpenSeesError(f"pattern '{pattern_type}' is not supported by "
+                            f"the Python backend")
+    d.patterns[tag] = p
+    d.current_pattern = p
+
+
+def load(tag, *values):
+    d = _session.require_domain()
+    p = d.current_pattern
+    if p is None or p.kind != 'Plain':
+        raise OpenSeesError('load: no Plain pattern has been defined')
+    v = np.zeros(d.ndf)
+    v[:len(values)] = values
+    i = d.node(int(tag))
+    p.loads[i] = p.loads.get(i, 0.0) + v
+
+
+def loadConst(*args):
+    """loadConst(<'-time', t>): hold all current pattern loads constant."""
+    d = _session.require_domain()
+    for p in d.patterns.values():
+        p.constant = p.factor(d.time)
+    if '-time' in args:
+        d.time = d.committed_time = float(args[list(args).index('-time') + 1])
+
+
+def rayleigh(alphaM, betaK, betaKinit, betaKcomm):
+    _session.require_domain().rayleigh = (float(alphaM), float(betaK),
+                                          float(betaKinit), float(betaKcomm))
+
+
+# -- analysis ----------------------------------------------------------------
+
+def system(*args):
+    """Any system type; the Python backend always uses a dense solver."""
+
+
+def numberer(*args):
+    """Any numberer; the Python backend always uses the Plain numbering."""
+
+
+def constraints(kind, *args):
+    if kind not in ('Plain', 'Transformation', 'Penalty', 'Lagrange'):
+        raise OpenSeesError(f"constraints '{kind}' is not supported")
+
+
+def test(kind, *args):
+    tol = float(args[0]) if args else 1.0e-6
+    max_iter = int(args[1]) if len(args) > 1 else 25
+    _session.analysis.test = ConvergenceTest(kind, tol, max_iter)
+
+
+def integrator(kind, *args):
+    _session.analysis.set_integrator(kind, args)
+
+
+def algorithm(kind, *args):
+    _session.analysis.set_algorithm(kind, args)
+
+
+def analysis(kind, *args):
+    _session.analysis.set_analysis(kind)
+
+
+def wipeAnalysis():
+    _session.analysis = Analysis(_session)
+
+
+def analyze(num_incr=1, dt=0.0, *args):
+    """Run num_incr analysis steps; returns 0 on success, < 0 on failure."""
+    return _session.analysis.analyze(num_incr, dt)
+
+
+def eigen(*args):
+    """eigen(<solver flag>, numModes); the solver flag is ignored."""
+    num_modes = [a for a in args if not isinstance(a, str)]
+    if not num_modes:
+        raise OpenSeesError('eigen: number of modes missing')
+    return _session.analysis.eigen(int(num_modes[0]))
+
+
+def reset():
+    """Revert the domain to its initial state."""
+    d = _session.require_domain()
+    d.build()
+    for name in ('U', 'V', 'A', 'Uc', 'Vc', 'Ac'):
+        getattr(d, name)[:] = 0.0
+    d.time = d.committed_time = 0.0
+    _session.table.revert_to_start()
+
+
+def setTime(t):
+    d = _session.require_domain()
+    d.time = d.committed_time = float(t)
+
+
+# -- recorders and output ----------------------------------------------------
+
+def recorder(rec_type, *args):
+    """recorder('Node' | 'Element', '-file', path, ...): text output."""
+    _session.require_domain()
+    rec = _TextRecorder(_session, (rec_type,) + args)
+    _session.recorders.append(rec)
+    return len(_session.recorders)
+
+
+def record():
+    """Record the current state with all recorders."""
+    _session.require_domain().build()
+    for rec in _session.recorders:
+        rec.record()
+
+
+def remove(kind, *args):
+    """remove('recorders') closes all recorders."""
+    if kind != 'recorders':
+        raise OpenSeesError(f"remove '{kind}' is not supported")
+    for rec in _session.recorders:
+        rec.close()
+    _session.recorders = []
+
+
+def start():
+    """Start the wall-clock timer reported by stop()."""
+    _session.timer = time.perf_counter()
+
+
+def stop():
+    """Print and return the wall-clock time since start()."""
+    if _session.timer is None:
+        return 0.0
+    elapsed = time.perf_counter() - _session.timer
+    _session.timer = None
+    print(f'Time Elapsed: {elapsed:.6g} sec', file=sys.stderr)
+    return elapsed
+
+
+def logFile(path, *args):
+    """Create the log file; the Python backend writes its messages there."""
+    mode = 'a' if '-append' in args else 'w'
+    with open(path, mode):
+        pass
+    _session.log = os.path.abspath(path)
+
+
+def defaultUnits(*args):
+    """Accepted for compatibility; the Python backend is unit-agnostic."""
+
+
+def loadPackage(name, *args):
+    """The OpenFresco commands are built into the Python backend."""
+
+
+# -- queries -----------------------------------------------------------------
+
+def getTime():
+    return 0.0 if _session.domain is None else _session.domain.time
+
+
+def getNodeTags():
+    return list(_session.require_domain().node_tags)
+
+
+def getEleTags():
+    return list(_session.require_domain().elements)
+
+
+def nodeCoord(tag, dim=None):
+    d = _session.require_domain()
+    d.build()
+    xyz = d.coords[d.node(int(tag))]
+    return [float(v) for v in xyz] if dim is None else float(xyz[int(dim) - 1])
+
+
+def _node_value(array_name, tag, dof):
+    d = _session.require_domain()
+    d.build()
+    row = getattr(d, array_name)[d.node(int(tag))]
+    if dof is None:
+        return [float(v) for v in row]
+    return float(row[int(dof) - 1])
+
+
+def nodeDisp(tag, dof=None):
+    return _node_value('U', tag, dof)
+
+
+def nodeVel(tag, dof=None):
+    return _node_value('V', tag, dof)
+
+
+def nodeAccel(tag, dof=None):
+    return _node_value('A', tag, dof)
+
+
+def nodeReaction(tag, dof=None):
+    """Static reaction (resisting force minus applied load) at a node."""
+    d = _session.require_domain()
+    d.build()
+    reaction = d.resisting_force() - d.load(d.time)
+    row = reaction[d.node(int(tag))]
+    if dof is None:
+        return [float(v) for v in row]
+    return float(row[int(dof) - 1])
+
+
+def nodeEigenvector(tag, mode, dof=None):
+    d = _session.require_domain()
+    if _session.eigen_vectors is None:
+        raise OpenSeesError('nodeEigenvector: call eigen first')
+    row = _session.eigen_vectors[int(mode) - 1][d.node(int(tag))]
+    if dof is None:
+        return [float(v) for v in row]
+    return float(row[int(dof) - 1])
+
+
+def eleResponse(tag, *args):
+    return _session.require_domain().element_response(int(tag), args)
+
+
+_NODE_GETTERS = {'disp': nodeDisp, 'vel': nodeVel, 'accel': nodeAccel,
+                 'reaction': nodeReaction}
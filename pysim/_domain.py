@@ -0,0 +1,584 @@
+# openfrescopy/pysim/_domain.py
+"""
+Model domain of the Python stand-in backend: nodes, constraints, numerical
+and experimental elements, time series and load patterns.
+
+Nodal quantities are stored as (n_nodes, ndf) arrays, and elements of one
+type are processed as a batch, so updating the domain, forming the resisting
+force and assembling matrices are array operations over all elements.
+Equations are numbered like the Plain numberer: free DOFs in node order.
+"""
+
+import time
+
+import numpy as np
+
+from . import _experimental
+from ._errors import OpenSeesError
+from ._experimental import PHASE_CONTROL, ExperimentalElements
+from ._materials import S_TAN
+
+
+class TimeSeries:
+    """Constant, Linear and Path time series."""
+
+    def __init__(self, tag, kind, args):
+        self.tag = tag
+        self.kind = kind
+        self.factor = 1.0
+        self.start = 0.0
+        self.use_last = False
+        self.times = None
+        self.values = None
+        self.dt = None
+        dt = None
+        prepend = False
+        args = list(args)
+        i = 0
+        while i < len(args):
+            opt = args[i]
+            if opt == '-factor':
+                self.factor = float(args[i + 1])
+                i += 2
+            elif opt == '-dt':
+                dt = float(args[i + 1])
+                i += 2
+            elif opt == '-startTime':
+                self.start = float(args[i + 1])
+                i += 2
+            elif opt == '-values':
+                i += 1
+                if i < len(args) and isinstance(args[i], np.ndarray):
+                    # A floating-point NumPy array (e.g. a memory-mapped
+                    # float32 ground motion) is used as it is, without
+                    # copying; the lookup below computes in float64
+                    values = args[i]
+                    if values.dtype.kind != 'f':
+                        values = values.astype(float)
+                    self.values = values
+                    i += 1
+                    continue
+                values = []
+                while i < len(args) and not isinstance(args[i], str):
+                    values.append(args[i])
+                    i += 1
+                self.values = np.asarray(values, dtype=float)
+            elif opt == '-time':
+                times = []
+                i += 1
+                while i < len(args) and not isinstance(args[i], str):
+                    times.append(args[i])
+                    i += 1
+                self.times = np.asarray(times, dtype=float)
+            elif opt == '-filePath':
+                self.values = _read_numbers(args[i + 1])
+                i += 2
+            elif opt == '-fileTime':
+                self.times = _read_numbers(args[i + 1])
+                i += 2
+            elif opt == '-useLast':
+                self.use_last = True
+                i += 1
+            elif opt == '-prependZero':
+                prepend = True
+                i += 1
+            else:
+                raise OpenSeesError(f'timeSeries {kind} {tag}: option {opt} '
+                                    f'is not supported by the Python backend')
+        if kind == 'Path':
+            if self.values is None:
+                raise OpenSeesError(f'timeSeries Path {tag}: no values given')
+            if prepend:
+                self.values = np.concatenate([[0.0], self.values])
+            if self.times is None:
+                if dt is None:
+                    raise OpenSeesError(f'timeSeries Path {tag}: -dt or '
+                                        f'-time is required')
+                # Equally spaced values are looked up by index, so no time
+                # array is needed
+                self.dt = dt
+            elif len(self.times) != len(self.values):
+                raise OpenSeesError(f'timeSeries Path {tag}: time and value '
+                                    f'counts differ')
+        elif kind not in ('Constant', 'Linear'):
+            raise OpenSeesError(f"timeSeries '{kind}' is not supported by the "
+                                f"Python backend")
+
+    def __call__(self, t):
+        if self.kind == 'Constant':
+            return self.factor
+        if self.kind == 'Linear':
+            return self.factor*t
+        values = self.values
+        if self.dt is not None:
+            x = (t - self.start)/self.dt
+            n = len(values)
+            if x < 0.0:
+                return 0.0
+            if x > n - 1:
+                return self.factor*float(values[-1]) if self.use_last else 0.0
+            k = min(int(x), n - 2)
+            if k < 0:
+                return self.factor*float(values[0])
+            v0 = float(values[k])
+            return self.factor*(v0 + (float(values[k + 1]) - v0)*(x - k))
+        times = self.times
+        if t < times[0]:
+            return 0.0
+        if t > times[-1]:
+            return self.factor*float(values[-1]) if self.use_last else 0.0
+        return self.factor*float(np.interp(t, times, values))
+
+
+def _read_numbers(path):
+    with open(path, 'r') as f:
+        return np.array(f.read().split(), dtype=float)
+
+
+class Pattern:
+    """Plain and UniformExcitation load patterns."""
+
+    def __init__(self, tag, kind, series, direction=None, fact=1.0):
+        self.tag = tag
+        self.kind = kind
+        self.series = series
+        self.direction = direction
+        self.fact = fact
+        self.loads = {}
+        self.constant = None
+
+    def factor(self, t):
+        if self.constant is not None:
+            return self.constant
+        return self.series(t)*self.fact
+
+
+class Trusses:
+    """truss elements: strain = cos . (uj - ui)/L, force = A*stress."""
+
+    def __init__(self, ndm, ndf):
+        self.ndm = ndm
+        self.ndf = ndf
+        self.tags = []
+        self.index = {}
+        self._data = []
+
+    def __len__(self):
+        return len(self.tags)
+
+    def add(self, tag, ni, nj, area, slot, rho):
+        self.index[tag] = len(self.tags)
+        self.tags.append(tag)
+        self._data.append((ni, nj, area, slot, rho))
+
+    def add_many(self, tags, ni, nj, area, slots, rho):
+        """Add trusses from equal-length lists (see add())."""
+        start = len(self.tags)
+        self.index.update(zip(tags, range(start, start + len(tags))))
+        self.tags.extend(tags)
+        self._data.extend(zip(ni, nj, area, slots, rho))
+
+    def finalize(self, coords):
+        data = self._data
+        self.conn = np.array([d[:2] for d in data], dtype=np.intp).reshape(-1, 2)
+        self.area = np.array([d[2] for d in data], dtype=float)
+        self.slots = np.array([d[3] for d in data], dtype=np.intp)
+        self.rho = np.array([d[4] for d in data], dtype=float)
+        d = coords[self.conn[:, 1]] - coords[self.conn[:, 0]]
+        self.L = np.linalg.norm(d, axis=1)
+        if (self.L == 0.0).any():
+            bad = self.tags[int(np.flatnonzero(self.L == 0.0)[0])]
+            raise OpenSeesError(f'truss {bad}: element has zero length')
+        self.cos = d/self.L[:, None]
+
+    def set_trial(self, U, table):
+        if len(self.tags):
+            ndm = self.ndm
+            du = U[self.conn[:, 1], :ndm] - U[self.conn[:, 0], :ndm]
+            table.set_trial_strain(self.slots,
+                                   np.einsum('ki,ki->k', self.cos, du)/self.L)
+
+    def axial_forces(self, table):
+        return self.area*table.stress[self.slots]
+
+    def global_forces(self, table):
+        N = self.axial_forces(table)
+        fe = np.zeros((len(self.tags), 2*self.ndf))
+        fe[:, :self.ndm] = -N[:, None]*self.cos
+        fe[:, self.ndf:self.ndf + self.ndm] = N[:, None]*self.cos
+        return fe
+
+    def stiffness(self, table, which='current'):
+        if which == 'initial':
+            tangent = table.initial_tangent[self.slots]
+        elif which == 'committed':
+            tangent = table.committed[self.slots, S_TAN]
+        else:
+            tangent = table.tangent[self.slots]
+        k = self.area*tangent/self.L
+        ndm, ndf = self.ndm, self.ndf
+        cc = np.einsum('ki,kj->kij', self.cos, self.cos)*k[:, None, None]
+        ke = np.zeros((len(self.tags), 2*ndf, 2*ndf))
+        ke[:, :ndm, :ndm] = cc
+        ke[:, ndf:ndf + ndm, ndf:ndf + ndm] = cc
+        ke[:, :ndm, ndf:ndf + ndm] = -cc
+        ke[:, ndf:ndf + ndm, :ndm] = -cc
+        return ke
+
+    def response(self, k, args, table):
+        what = args[0] if args else ''
+        if what in ('force', 'forces', 'globalForce', 'globalForces'):
+            return self.global_forces(table)[k]
+        if what in ('axialForce', 'basicForce', 'basicForces'):
+            return self.axial_forces(table)[k:k + 1]
+        if what in ('deformation', 'deformations', 'basicDeformation'):
+            return table.strain[self.slots[k:k + 1]]*self.L[k]
+        return None
+
+
+class Domain:
+    """Nodes, elements, loads and the trial/committed response state."""
+
+    def __init__(self, ndm, ndf, table):
+        self.ndm = ndm
+        self.ndf = ndf
+        self.table = table
+        self.node_tags = []
+        self.node_index = {}
+        self._coords = []
+        self._mass = []
+        self._fix = []
+        self.trusses = Trusses(ndm, ndf)
+        self.exp = ExperimentalElements(ndm, ndf)
+        self.elements = {}
+        self.series = {}
+        self.patterns = {}
+        self.current_pattern = None
+        self.rayleigh = (0.0, 0.0, 0.0, 0.0)
+        self.time = 0.0
+        self.committed_time = 0.0
+        self.version = 0
+        self._built = -1
+        n = 0
+        self.U = np.zeros((n, ndf))
+        self.V = np.zeros((n, ndf))
+        self.A = np.zeros((n, ndf))
+        self.Uc = np.zeros((n, ndf))
+        self.Vc = np.zeros((n, ndf))
+        self.Ac = np.zeros((n, ndf))
+        self.F = np.zeros((n, ndf))
+
+    # -- model definition ----------------------------------------------------
+
+    def add_node(self, tag, coords, mass=None):
+        if tag in self.node_index:
+            raise OpenSeesError(f'node {tag}: a node with this tag exists')
+        if len(coords) != self.ndm:
+            raise OpenSeesError(f'node {tag}: {self.ndm} coordinates needed')
+        m = np.zeros(self.ndf)
+        if mass is not None:
+            m[:len(mass)] = mass
+        self.node_index[tag] = len(self.node_tags)
+        self.node_tags.append(tag)
+        self._coords.append(np.asarray(coords, dtype=float))
+        self._mass.append(m)
+        self._fix.append(np.zeros(self.ndf, dtype=bool))
+        self.version += 1
+
+    def add_nodes(self, tags, coords, masses=None):
+        """
+        Add many nodes at once.
+
+        tags is a list of new, unique tags, coords an (n, ndm) array and
+        masses an optional (n, <=ndf) array.
+        """
+        clash = self.node_index.keys() & tags
+        if clash:
+            raise OpenSeesError(f'node {min(clash)}: a node with this tag '
+                                f'exists')
+        n, ndf = len(tags), self.ndf
+        start = len(self.node_tags)
+        self.node_index.update(zip(tags, range(start, start + n)))
+        self.node_tags.extend(tags)
+        self._coords.extend(np.asarray(coords, dtype=float).reshape(n, self.ndm))
+        m = np.zeros((n, ndf))
+        if masses is not None:
+            masses = np.asarray(masses, dtype=float).reshape(n, -1)
+            m[:, :masses.shape[1]] = masses
+        self._mass.extend(m)
+        self._fix.extend(np.zeros((n, ndf), dtype=bool))
+        self.version += 1
+
+    def node(self, tag):
+        try:
+            return self.node_index[tag]
+        except KeyError:
+            raise OpenSeesError(f'node {tag} does not exist') from None
+
+    def fix(self, tag, flags):
+        i = self.node(tag)
+        if len(flags) != self.ndf:
+            raise OpenSeesError(f'fix {tag}: {self.ndf} flags needed')
+        self._fix[i] = np.asarray(flags, dtype=float) != 0.0
+        self.version += 1
+
+    def fix_nodes(self, tags, flags):
+        """Set the (n, ndf) constraint flags of many nodes."""
+        for tag, row in zip(tags, np.asarray(flags) != 0):
+            self._fix[self.node(tag)] = row
+        self.version += 1
+
+    def set_masses(self, tags, values):
+        """Set the masses of many nodes from an (n, <=ndf) array."""
+        values = np.asarray(values, dtype=float)
+        for tag, row in zip(tags, values):
+            m = np.zeros(self.ndf)
+            m[:len(row)] = row
+            self._mass[self.node(tag)] = m
+        self.version += 1
+
+    def set_mass(self, tag, values):
+        m = np.zeros(self.ndf)
+        m[:len(values)] = values
+        self._mass[self.node(tag)] = m
+        self.version += 1
+
+    def _check_element(self, tag):
+        if tag in self.elements:
+            raise OpenSeesError(f'element {tag}: an element with this tag '
+                                f'exists')
+
+    def add_truss(self, tag, ni, nj, area, slot, rho=0.0):
+        self._check_element(tag)
+        self.trusses.add(tag, self.node(ni), self.node(nj), area, slot, rho)
+        self.elements[tag] = ('truss', len(self.trusses) - 1)
+        self.version += 1
+
+    def add_trusses(self, tags, ni, nj, area, slots, rho):
+        """Add many trusses; node tags are checked, element tags must be new."""
+        clash = self.elements.keys() & tags
+        if clash:
+            raise OpenSeesError(f'element {min(clash)}: an element with this '
+                                f'tag exists')
+        start = len(self.trusses)
+        self.trusses.add_many(tags, [self.node(t) for t in ni],
+                              [self.node(t) for t in nj], area, slots, rho)
+        self.elements.update((tag, ('truss', start + k))
+                             for k, tag in enumerate(tags))
+        self.version += 1
+
+    def add_exp_element(self, tag, ni, nj, args, sites):
+        self._check_element(tag)
+        i, j = self.node(ni), self.node(nj)
+        mass = self.exp.add(tag, i, j, self._coords[i], self._coords[j], args,
+                            sites)
+        if mass:
+            for k in (i, j):
+                self._mass[k][:self.ndm] += 0.5*mass
+        self.elements[tag] = ('exp', len(self.exp) - 1)
+        self.version += 1
+
+    def add_generic_exp_element(self, tag, args, sites):
+        self._check_element(tag)
+        self.exp.add_generic(tag, args, sites, self.node)
+        self.elements[tag] = ('exp', len(self.exp) - 1)
+        self.version += 1
+
+    # -- array form ----------------------------------------------------------
+
+    def build(self):
+        """(Re)build the batch arrays after the model has changed."""
+        if self._built == self.version:
+            return
+        n, ndf = len(self.node_tags), self.ndf
+        self.coords = np.array(self._coords).reshape(n, self.ndm)
+        self.mass = np.array(self._mass).reshape(n, ndf)
+        fixed = np.array(self._fix).reshape(n, ndf)
+        self.free = np.flatnonzero(~fixed.ravel())
+        self.eq = np.full(n*ndf, -1, dtype=np.intp)
+        self.eq[self.free] = np.arange(len(self.free))
+        self.eq = self.eq.reshape(n, ndf)
+        self.trusses.finalize(self.coords)
+        if len(self.trusses):
+            half = 0.5*self.trusses.rho*self.trusses.L
+            for col in range(self.ndm):
+                np.add.at(self.mass[:, col], self.trusses.conn[:, 0], half)
+                np.add.at(self.mass[:, col], self.trusses.conn[:, 1], half)
+        self.exp.finalize()
+        self.exp_conn = self.exp.conn
+        self.m = self.mass.ravel()[self.free]
+        # Grow the response arrays for nodes added since the last build
+        for name in ('U', 'V', 'A', 'Uc', 'Vc', 'Ac', 'F'):
+            old = getattr(self, name)
+            new = np.zeros((n, ndf))
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self._edofs = {
+            'truss': self.eq[self.trusses.conn].reshape(-1, 2*ndf),
+            'exp': self.eq[self.exp_conn].reshape(
+                -1, self.exp_conn.shape[1]*ndf),
+        }
+        self._built = self.version
+
+    @property
+    def neq(self):
+        self.build()
+        return len(self.free)
+
+    def to_eq(self, X):
+        return X.ravel()[self.free]
+
+    def from_eq(self, x, X):
+        X.ravel()[self.free] = x
+
+    # -- state update --------------------------------------------------------
+
+    def update(self):
+        """Send the trial displacements U to all elements."""
+        self.build()
+        self.trusses.set_trial(self.U, self.table)
+        if len(self.exp):
+            self.exp.set_trial(self.U[self.exp_conn].reshape(len(self.exp), -1))
+            # The controls are evaluated in the same batch as the materials
+            # of the numerical elements; the batch counts as control time
+            if _experimental._timing:
+                t0 = time.perf_counter_ns()
+                self.table.evaluate_if_dirty()
+                self.exp.phases[PHASE_CONTROL] += time.perf_counter_ns() - t0
+            else:
+                self.table.evaluate_if_dirty()
+            self.exp.get_daq()
+        else:
+            self.table.evaluate_if_dirty()
+
+    def resisting_force(self):
+        """Assemble the (n_nodes, ndf) element resisting forces."""
+        F = self.F
+        F[:] = 0.0
+        ndf = self.ndf
+        for conn, fe in ((self.trusses.conn,
+                          self.trusses.global_forces(self.table)),
+                         (self.exp_conn, self.exp.global_forces())):
+            for c in range(conn.shape[1] if len(fe) else 0):
+                np.add.at(F, conn[:, c], fe[:, c*ndf:(c + 1)*ndf])
+        return F
+
+    def load(self, t):
+        """Return the (n_nodes, ndf) applied loads at time t."""
+        P = np.zeros_like(self.U)
+        for pattern in self.patterns.values():
+            lam = pattern.factor(t)
+            if pattern.kind == 'UniformExcitation':
+                d = pattern.direction
+                P[:, d] -= self.mass[:, d]*lam
+            else:
+                for i, values in pattern.loads.items():
+                    P[i] += lam*values
+        return P
+
+    def stiffness_triplets(self, which='current'):
+        """Return (rows, cols, values) of the assembled stiffness matrix."""
+        self.build()
+        parts = []
+        for key, ke in (('truss', self.trusses.stiffness(self.table, which)),
+                        ('exp', self.exp.stiffness())):
+            edofs = self._edofs[key]
+            if not len(ke):
+                continue
+            rows = np.broadcast_to(edofs[:, :, None], ke.shape)
+            cols = np.broadcast_to(edofs[:, None, :], ke.shape)
+            mask = (rows >= 0) & (cols >= 0)
+            parts.append((rows[mask], cols[mask], ke[mask]))
+        if not parts:
+            return (np.zeros(0, dtype=np.intp),)*2 + (np.zeros(0),)
+        return tuple(np.concatenate(p) for p in zip(*parts))
+
+    def stiffness(self, which='current'):
+        """Return the dense (neq, neq) stiffness matrix."""
+        rows, cols, vals = self.stiffness_triplets(which)
+        K = np.zeros((self.neq, self.neq))
+        np.add.at(K, (rows, cols), vals)
+        return K
+
+    def commit(self):
+        self.Uc[:] = self.U
+        self.Vc[:] = self.V
+        self.Ac[:] = self.A
+        self.table.commit()
+        self.exp.commit()
+        self.committed_time = self.time
+
+    def revert(self):
+        self.U[:] = self.Uc
+        self.V[:] = self.Vc
+        self.A[:] = self.Ac
+        self.table.revert()
+        self.time = self.committed_time
+
+    # -- checkpoints ---------------------------------------------------------
+
+    def signature(self):
+        """Arrays that identify the model a checkpoint belongs to."""
+        return {'node_tags': np.array(self.node_tags, dtype=np.int64),
+                'element_tags': np.array(sorted(self.elements), dtype=np.int64),
+                'material_kinds': self.table.kind[:self.table.size].copy()}
+
+    def get_state(self):
+        """
+        Return the committed response state, and the signature() of the
+        model it belongs to, as a dict of arrays.
+        """
+        self.build()
+        exp = self.exp
+        tags = sorted(self.patterns)
+        state = {
+            'time': np.array([self.committed_time]),
+            'U': self.Uc.copy(), 'V': self.Vc.copy(), 'A': self.Ac.copy(),
+            'materials': self.table.committed[:self.table.size].copy(),
+            'exp': np.stack([exp.ctrl_disp, exp.daq_disp, exp.daq_force,
+                             exp.q]),
+            'pattern_tags': np.array(tags, dtype=np.int64),
+            'pattern_constants': np.array(
+                [np.nan if self.patterns[t].constant is None
+                 else self.patterns[t].constant for t in tags]),
+        }
+        state.update(self.signature())
+        return state
+
+    def set_state(self, state):
+        """Make a state from get_state() the committed and trial state."""
+        self.build()
+        signature = self.signature()
+        for name, values in signature.items():
+            if not np.array_equal(state[name], values):
+                raise OpenSeesError(f'restore: the checkpoint was taken from '
+                                    f'a different model ({name} differ)')
+        for name in ('U', 'V', 'A'):
+            getattr(self, name)[:] = state[name]
+            getattr(self, name + 'c')[:] = state[name]
+        table, n = self.table, self.table.size
+        table.committed[:n] = state['materials']
+        table.revert()
+        exp = self.exp
+        exp.ctrl_disp[:], exp.daq_disp[:], exp.daq_force[:], exp.q[:] = \
+            state['exp']
+        for tag, value in zip(state['pattern_tags'].tolist(),
+                              state['pattern_constants']):
+            pattern = self.patterns.get(tag)
+            if pattern is not None:
+                pattern.constant = None if np.isnan(value) else float(value)
+        self.time = self.committed_time = float(state['time'][0])
+
+    # -- queries -------------------------------------------------------------
+
+    def element_response(self, tag, args):
+        try:
+            group, k = self.elements[tag]
+        except KeyError:
+            raise OpenSeesError(f'element {tag} does not exist') from None
+        self.build()
+        if group == 'truss':
+            value = self.trusses.response(k, args, self.table)
+        else:
+            value = self.exp.response(k, args)
+        return [] if value is None else [float(v) for v in value]
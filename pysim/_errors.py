@@ -0,0 +1,6 @@
+# openfrescopy/pysim/_errors.py
+"""Errors raised by the Python stand-in backend."""
+
+
+class OpenSeesError(Exception):
+    """A command failed or is not supported by the Python backend."""
@@ -0,0 +1,715 @@
+# openfrescopy/pysim/_experimental.py
+"""
+Experimental control points, controls, setups, sites and elements of the
+Python stand-in backend.
+
+The objects follow the OpenFresco chain
+
+    expElement -> expSite -> expSetup -> expControl
+
+and each exposes set_trial_response()/get_daq_response() so a site can be
+driven on its own. Stepping every element through that chain one object at a
+time is what makes hybrid steps expensive, though, so ExperimentalElements
+compiles all twoNodeLink elements that use a LocalSite -> OneActuator ->
+SimUniaxialMaterials chain into index and factor arrays. A step then costs one
+gather of the trial displacements, one vectorized material update for all
+controls and one scatter of the measured responses. Elements whose chain does
+not fit (e.g. several elements sharing one site) go through the per-object
+path, and SiteDispatcher can fan those out to all sites at once.
+"""
+
+import time
+
+import numpy as np
+
+from ._errors import OpenSeesError
+
+# Phases of an experimental element update, indices into
+# ExperimentalElements.phases
+PHASE_ELEMENT = 0   # basic <-> global transformations of the elements
+PHASE_SITE = 1      # sites on the per-object path (incl. what they drive)
+PHASE_SETUP = 2     # actuator factors of the vectorized chains
+PHASE_CONTROL = 3   # material updates of the vectorized controls
+
+_clock = time.perf_counter_ns
+
+# The phases are only timed while a profiler is active (set_timing()), so
+# that unprofiled steps do not pay for the clock calls
+_timing = False
+
+
+def set_timing(on):
+    """Switch the phase timers of the experimental elements on or off."""
+    global _timing
+    _timing = bool(on)
+
+
+def _numbers(args, i):
+    """Collect the numeric arguments starting at args[i]."""
+    values = []
+    while i < len(args) and not isinstance(args[i], str):
+        values.append(args[i])
+        i += 1
+    return values, i
+
+
+class ControlPoint:
+    """expControlPoint(tag, <'-node', nodeTag,> dof, rspType, ...)."""
+
+    def __init__(self, tag, args):
+        self.tag = tag
+        self.node = None
+        self.entries = []
+        args = list(args)
+        if args and args[0] == '-node':
+            self.node = int(args[1])
+            args = args[2:]
+        i = 0
+        while i + 1 < len(args) and args[i] not in (
+                '-fact', '-lim', '-relTrial', '-relCtrl', '-relDaq'):
+            self.entries.append((str(args[i]), str(args[i + 1])))
+            i += 2
+        self.options = args[i:]
+
+
+class SimUniaxialMaterials:
+    """
+    expControl('SimUniaxialMaterials', tag, matTags...).
+
+    Each actuator is simulated by a copy of a uniaxial material whose strain
+    is the commanded displacement and whose stress is the measured force. The
+    material copies live in the shared MaterialTable.
+    """
+
+    def __init__(self, tag, table, slots):
+        self.tag = tag
+        self.table = table
+        self.slots = np.asarray(slots, dtype=np.intp)
+        self.size = len(self.slots)
+
+    def set_trial_response(self, disp):
+        self.table.set_trial_strain(self.slots, disp)
+
+    def get_daq_response(self):
+        self.table.evaluate_if_dirty()
+        return (self.table.strain[self.slots].copy(),
+                self.table.stress[self.slots].copy())
+
+    def commit(self):
+        t = self.table
+        t.committed[self.slots] = t.trial[self.slots]
+
+
+class OneActuator:
+    """
+    expSetup('OneActuator', tag, <'-control', ctrlTag,> dir,
+             '-sizeTrialOut', t, o, <factor options>).
+
+    The actuator follows component `dir` of the trial displacement; the
+    measured displacement and force are placed back into that component of
+    the output vectors. Supported factor options are -trialDispFact,
+    -outDispFact, -outForceFact, -ctrlDispFact, -daqDispFact and
+    -daqForceFact.
+    """
+
+    _FACTORS = {
+        '-trialDispFact': 'trial', '-outDispFact': 'out_disp',
+        '-outForceFact': 'out_force', '-ctrlDispFact': 'ctrl',
+        '-daqDispFact': 'daq_disp', '-daqForceFact': 'daq_force',
+    }
+
+    def __init__(self, tag, args, controls):
+        self.tag = tag
+        self.control = None
+        args = list(args)
+        if args and args[0] == '-control':
+            try:
+                self.control = controls[int(args[1])]
+            except KeyError:
+                raise OpenSeesError(f'expSetup OneActuator {tag}: control '
+                                    f'{args[1]} not found') from None
+            args = args[2:]
+        if len(args) < 4 or args[1] != '-sizeTrialOut':
+            raise OpenSeesError(f'expSetup OneActuator {tag}: want <-control '
+                                f'ctrlTag> dir -sizeTrialOut t o')
+        self.direction = int(args[0]) - 1
+        self.size_trial = int(args[2])
+        self.size_out = int(args[3])
+        if not (0 <= self.direction < min(self.size_trial, self.size_out)):
+            raise OpenSeesError(f'expSetup OneActuator {tag}: dir '
+                                f'{self.direction + 1} outside -sizeTrialOut')
+        self.factors = {'trial': np.ones(self.size_trial),
+                        'out_disp': np.ones(self.size_out),
+                        'out_force': np.ones(self.size_out),
+                        'ctrl': np.ones(1), 'daq_disp': np.ones(1),
+                        'daq_force': np.ones(1)}
+        i = 4
+        while i < len(args):
+            opt = args[i]
+            key = self._FACTORS.get(opt)
+            if key is None:
+                raise OpenSeesError(f'expSetup OneActuator {tag}: option '
+                                    f'{opt} is not supported')
+            values, i = _numbers(args, i + 1)
+            fact = self.factors[key]
+            if len(values) not in (1, len(fact)):
+                raise OpenSeesError(f'expSetup OneActuator {tag}: {len(fact)} '
+                                    f'values expected after {opt}')
+            fact[:] = values
+        self.ctrl_disp = np.zeros(1)
+
+    def trial_factor(self):
+        """Factor from the trial component to the actuator command."""
+        return self.factors['trial'][self.direction]*self.factors['ctrl'][0]
+
+    def out_factors(self):
+        """Factors from measured actuator disp/force to the output vectors."""
+        d = self.direction
+        return (self.factors['daq_disp'][0]*self.factors['out_disp'][d],
+                self.factors['daq_force'][0]*self.factors['out_force'][d])
+
+    def set_trial_response(self, disp):
+        self.ctrl_disp[0] = disp[self.direction]*self.trial_factor()
+        self.control.set_trial_response(self.ctrl_disp)
+
+    def get_daq_response(self):
+        d_act, f_act = self.control.get_daq_response()
+        fd, ff = self.out_factors()
+        disp = np.zeros(self.size_out)
+        force = np.zeros(self.size_out)
+        disp[self.direction] = d_act[0]*fd
+        force[self.direction] = f_act[0]*ff
+        return disp, force
+
+    def commit(self):
+        self.control.commit()
+
+
+class LocalSite:
+    """expSite('LocalSite', tag, setupTag): the setup runs in this process."""
+
+    def __init__(self, tag, setup):
+        if setup.control is None:
+            raise OpenSeesError(f'expSite LocalSite {tag}: setup {setup.tag} '
+                                f'has no control')
+        self.tag = tag
+        self.setup = setup
+
+    def set_trial_response(self, disp):
+        self.setup.set_trial_response(disp)
+
+    def get_daq_response(self):
+        return self.setup.get_daq_response()
+
+    def commit(self):
+        self.setup.commit()
+
+
+def _accumulate(entry, seconds):
+    """Add one duration to a [last, total, max, calls] timing entry."""
+    entry[0] = seconds
+    entry[1] += seconds
+    entry[2] = max(entry[2], seconds)
+    entry[3] += 1
+
+
+class SiteDispatcher:
+    """
+    Send trial responses to, and collect measurements from, the sites of the
+    per-object path.
+
+    In 'serial' mode (the default) every site gets its trial response, then
+    every site is asked for its measured response, one after the other, so a
+    step costs the sum of the site latencies. In 'concurrent' mode the sites
+    are driven in parallel: remote sites as coroutines on their shared event
+    loop, other sites on a thread pool of `workers` threads, and a step costs
+    about as much as the slowest site. Sites backed by the shared
+    MaterialTable (SimUniaxialMaterials controls) and sites used by several
+    elements always run in the calling thread.
+
+    timing holds per-site wall times as {tag: [last, total, max, calls]}
+    and step_timing the same for the whole exchange.
+    """
+
+    def __init__(self):
+        self.mode = 'serial'
+        self.workers = None
+        self._pool = None
+        self._pending = None
+        self._start = 0.0
+        self.timing = {}
+        self.step_timing = [0.0, 0.0, 0.0, 0]
+
+    def configure(self, mode, workers=None):
+        if mode not in ('serial', 'concurrent'):
+            raise OpenSeesError(f"site dispatch mode must be 'serial' or "
+                                f"'concurrent', not {mode!r}")
+        if self._pool is not None and (mode == 'serial' or
+                                       workers != self.workers):
+            self._pool.shutdown()
+            self._pool = None
+        self.mode = mode
+        self.workers = workers
+
+    def reset_timing(self):
+        self.timing = {}
+        self.step_timing = [0.0, 0.0, 0.0, 0]
+
+    def _time(self, tag, seconds):
+        _accumulate(self.timing.setdefault(tag, [0.0, 0.0, 0.0, 0]), seconds)
+
+    def _time_step(self, seconds):
+        _accumulate(self.step_timing, seconds)
+
+    @staticmethod
+    def _exchange(site, disp):
+        start = time.perf_counter()
+        site.set_trial_response(disp)
+        disp, force = site.get_daq_response()
+        return disp, force, time.perf_counter() - start
+
+    @staticmethod
+    def _inline(site, count):
+        control = getattr(getattr(site, 'setup', None), 'control', None)
+        return count > 1 or isinstance(control, SimUniaxialMaterials)
+
+    def start(self, sites, trials):
+        """Send the trial responses (and, if concurrent, start the sites)."""
+        self._start = time.perf_counter()
+        if self.mode == 'serial':
+            spent = []
+            for site, disp in zip(sites, trials):
+                t0 = time.perf_counter()
+                site.set_trial_response(disp)
+                spent.append(time.perf_counter() - t0)
+            self._pending = (sites, spent)
+            return
+        counts = {}
+        for site in sites:
+            counts[id(site)] = counts.get(id(site), 0) + 1
+        jobs = []
+        for k, (site, disp) in enumerate(zip(sites, trials)):
+            if self._inline(site, counts[id(site)]):
+                kind = 'inline'
+            elif getattr(site, 'loop', None) is not None:
+                kind = 'async'
+            else:
+                if self._pool is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._pool = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix='expSite')
+                kind = self._pool.submit(self._exchange, site, disp)
+            jobs.append(kind)
+        self._pending = (sites, (trials, jobs))
+
+    def finish(self):
+        """Return the measured (disp, force) of every site, in order."""
+        sites, state = self._pending
+        self._pending = None
+        results = [None]*len(sites)
+        if self.mode == 'serial':
+            for k, site in enumerate(sites):
+                t0 = time.perf_counter()
+                results[k] = site.get_daq_response()
+                self._time(site.tag, state[k] + time.perf_counter() - t0)
+        else:
+            trials, jobs = state
+            loops = {}
+            for k, (site, job) in enumerate(zip(sites, jobs)):
+                if job == 'inline':
+                    results[k] = self._collect(site, *self._exchange(
+                        site, trials[k]))
+                elif job == 'async':
+                    loops.setdefault(site.loop, []).append(k)
+            for loop, ks in loops.items():
+                for k, (disp, force, seconds) in zip(ks, loop.run_until_complete(
+                        self._gather([(sites[k], trials[k]) for k in ks]))):
+                    results[k] = self._collect(sites[k], disp, force, seconds)
+            for k, job in enumerate(jobs):
+                if not isinstance(job, str):
+                    results[k] = self._collect(sites[k], *job.result())
+        self._time_step(time.perf_counter() - self._start)
+        return results
+
+    def _collect(self, site, disp, force, seconds):
+        self._time(site.tag, seconds)
+        return disp, force
+
+    @staticmethod
+    async def _gather(pairs):
+        import asyncio
+
+        async def exchange(site, disp):
+            start = time.perf_counter()
+            disp, force = await site.site.exchange(disp)
+            return disp, force, time.perf_counter() - start
+
+        return await asyncio.gather(*(exchange(s, d) for s, d in pairs))
+
+
+def _local_axes(ndm, xi, xj, orient):
+    """Return the 3x3 rows [x, y, z] of the twoNodeLink local system."""
+    x = np.zeros(3)
+    y = np.zeros(3)
+    xp = np.zeros(3)
+    xp[:ndm] = xj - xi
+    L = np.linalg.norm(xp)
+    if len(orient) == 6:
+        x[:] = orient[:3]
+        y[:] = orient[3:]
+    elif len(orient) == 3:
+        y[:] = orient
+    if len(orient) != 6:
+        if L > np.finfo(float).eps:
+            x = xp.copy()
+            if ndm == 2 and len(orient) == 0:
+                y[:] = (-x[1], x[0], 0.0)
+        else:
+            x[:] = (1.0, 0.0, 0.0)
+        if not y.any():
+            y[:] = (0.0, 1.0, 0.0)
+    z = np.cross(x, y)
+    y = np.cross(z, x)
+    norms = np.array([np.linalg.norm(x), np.linalg.norm(y), np.linalg.norm(z)])
+    if (norms == 0.0).any():
+        raise OpenSeesError('twoNodeLink: orientation vectors are parallel')
+    return np.vstack([x, y, z])/norms[:, None]
+
+
+class ExperimentalElements:
+    """
+    All expElement('twoNodeLink', ...) and expElement('generic', ...)
+    elements of the domain.
+
+    Per element the basic displacement is db = Tb @ ue, where ue stacks the
+    displacements of the element nodes. Tb is zero-padded to the largest
+    number of directions and nodes (conn repeats the first node of shorter
+    elements), so all elements are processed as one (n, nb, nn*ndf) batch.
+    """
+
+    def __init__(self, ndm, ndf):
+        self.ndm = ndm
+        self.ndf = ndf
+        self.tags = []
+        self.index = {}
+        self.nodes = []
+        self.sites = []
+        self._Tb = []
+        self._kinit = []
+        self._imod = []
+        self._plan = None
+        self.dispatcher = SiteDispatcher()
+        # Cumulative nanoseconds spent per PHASE_* while timing is on (read
+        # by the profiler)
+        self.phases = [0, 0, 0, 0]
+
+    def __len__(self):
+        return len(self.tags)
+
+    def add(self, tag, ni, nj, xi, xj, args, sites):
+        """Parse the twoNodeLink arguments after the node tags and add it."""
+        dirs, site, kinit, orient, imod, mass = [], None, None, [], False, 0.0
+        args = list(args)
+        i = 0
+        while i < len(args):
+            opt = args[i]
+            if opt == '-dir':
+                dirs, i = _numbers(args, i + 1)
+            elif opt == '-site':
+                try:
+                    site = sites[int(args[i + 1])]
+                except KeyError:
+                    raise OpenSeesError(f'expElement twoNodeLink {tag}: site '
+                                        f'{args[i + 1]} not found') from None
+                i += 2
+            elif opt == '-initStif':
+                kinit, i = _numbers(args, i + 1)
+            elif opt == '-orient':
+                orient, i = _numbers(args, i + 1)
+            elif opt == '-iMod':
+                imod = True
+                i += 1
+            elif opt == '-mass':
+                mass = float(args[i + 1])
+                i += 2
+            else:
+                raise OpenSeesError(f'expElement twoNodeLink {tag}: option '
+                                    f'{opt} is not supported by the Python '
+                                    f'backend')
+        nb = len(dirs)
+        if nb == 0 or site is None or kinit is None:
+            raise OpenSeesError(f'expElement twoNodeLink {tag}: -dir, -site '
+                                f'and -initStif are required')
+        if len(kinit) != nb*nb:
+            raise OpenSeesError(f'expElement twoNodeLink {tag}: -initStif '
+                                f'needs {nb*nb} values')
+        ndm, ndf = self.ndm, self.ndf
+        axes = _local_axes(ndm, xi, xj, orient)
+        # Map local directions (1..3 translations, 4..6 rotations) to the
+        # global DOFs of the two nodes
+        Tb = np.zeros((nb, 2*ndf))
+        for k, d in enumerate(int(d) - 1 for d in dirs):
+            rot = d >= 3
+            row = axes[d - 3] if rot else axes[d]
+            if ndm == 2:
+                if rot:
+                    if d != 5 or ndf < 3:
+                        raise OpenSeesError(f'expElement twoNodeLink {tag}: '
+                                            f'dir {d + 1} not available')
+                    Tb[k, 2] = -1.0
+                    Tb[k, ndf + 2] = 1.0
+                    continue
+                cols = slice(0, 2)
+                row = row[:2]
+            else:
+                if rot and ndf < 6:
+                    raise OpenSeesError(f'expElement twoNodeLink {tag}: '
+                                        f'dir {d + 1} not available')
+                cols = slice(3, 6) if rot else slice(0, 3)
+            Tb[k, cols] = -row
+            Tb[k, ndf + cols.start:ndf + cols.stop] = row
+        self.index[tag] = len(self.tags)
+        self.tags.append(tag)
+        self.nodes.append((ni, nj))
+        self.sites.append(site)
+        self._Tb.append(Tb)
+        self._kinit.append(np.asarray(kinit, dtype=float).reshape(nb, nb))
+        self._imod.append(imod)
+        self._plan = None
+        return mass
+
+    def add_generic(self, tag, args, sites, node):
+        """
+        Parse the generic element arguments after the tag and add it.
+
+        The basic system is the listed global DOFs of the nodes, in order:
+        '-node', n1, n2, ..., '-dof', <dofs of n1>, '-dof', <dofs of n2>,
+        ... node(tag) returns the domain index of a node.
+        """
+        nodes, dofs, site, kinit, imod = [], [], None, None, False
+        args = list(args)
+        i = 0
+        while i < len(args):
+            opt = args[i]
+            if opt == '-node':
+                nodes, i = _numbers(args, i + 1)
+            elif opt == '-dof':
+                values, i = _numbers(args, i + 1)
+                dofs.append(values)
+            elif opt == '-site':
+                try:
+                    site = sites[int(args[i + 1])]
+                except KeyError:
+                    raise OpenSeesError(f'expElement generic {tag}: site '
+                                        f'{args[i + 1]} not found') from None
+                i += 2
+            elif opt == '-initStif':
+                kinit, i = _numbers(args, i + 1)
+            elif opt == '-iMod':
+                imod = True
+                i += 1
+            else:
+                raise OpenSeesError(f'expElement generic {tag}: option {opt} '
+                                    f'is not supported by the Python backend')
+        if not nodes or site is None or kinit is None:
+            raise OpenSeesError(f'expElement generic {tag}: -node, -dof, '
+                                f'-site and -initStif are required')
+        if len(dofs) != len(nodes):
+            raise OpenSeesError(f'expElement generic {tag}: one -dof list '
+                                f'per node needed')
+        ndf = self.ndf
+        nb = sum(len(d) for d in dofs)
+        if len(kinit) != nb*nb:
+            raise OpenSeesError(f'expElement generic {tag}: -initStif needs '
+                                f'{nb*nb} values')
+        Tb = np.zeros((nb, len(nodes)*ndf))
+        row = 0
+        for k, values in enumerate(dofs):
+            for d in values:
+                if not 1 <= int(d) <= ndf:
+                    raise OpenSeesError(f'expElement generic {tag}: dof {d} '
+                                        f'of node {nodes[k]} out of range')
+                Tb[row, k*ndf + int(d) - 1] = 1.0
+                row += 1
+        self.index[tag] = len(self.tags)
+        self.tags.append(tag)
+        self.nodes.append(tuple(node(int(n)) for n in nodes))
+        self.sites.append(site)
+        self._Tb.append(Tb)
+        self._kinit.append(np.asarray(kinit, dtype=float).reshape(nb, nb))
+        self._imod.append(imod)
+        self._plan = None
+
+    def finalize(self):
+        """Stack the per-element data into batch arrays."""
+        n = len(self.tags)
+        nb = max((len(T) for T in self._Tb), default=0)
+        nn = max((len(nodes) for nodes in self.nodes), default=2)
+        self.nb = np.array([len(T) for T in self._Tb], dtype=np.intp)
+        self.width = np.array([T.shape[1] for T in self._Tb], dtype=np.intp)
+        self.conn = np.array([nodes + nodes[:1]*(nn - len(nodes))
+                              for nodes in self.nodes],
+                             dtype=np.intp).reshape(n, nn)
+        self.Tb = np.zeros((n, nb, nn*self.ndf))
+        self.kinit = np.zeros((n, nb, nb))
+        for k, (T, K) in enumerate(zip(self._Tb, self._kinit)):
+            self.Tb[k, :len(T), :T.shape[1]] = T
+            self.kinit[k, :len(T), :len(T)] = K
+        self.imod = np.array(self._imod, dtype=bool)
+        self.ctrl_disp = np.zeros((n, nb))
+        self.daq_disp = np.zeros((n, nb))
+        self.daq_force = np.zeros((n, nb))
+        self.q = np.zeros((n, nb))
+        self._plan = self._compile()
+
+    def _compile(self):
+        """
+        Build the vectorized plan for LocalSite -> OneActuator ->
+        SimUniaxialMaterials chains with one element per site.
+        """
+        fast, rows, cols, slots, f_trial, f_disp, f_force = ([] for _ in range(7))
+        used = {}
+        for k, site in enumerate(self.sites):
+            used[id(site)] = used.get(id(site), 0) + 1
+        table = None
+        for k, site in enumerate(self.sites):
+            setup = getattr(site, 'setup', None)
+            control = getattr(setup, 'control', None)
+            if (type(site) is not LocalSite or
+                    type(setup) is not OneActuator or
+                    type(control) is not SimUniaxialMaterials or
+                    control.size != 1 or used[id(site)] != 1 or
+                    setup.size_out != self.nb[k] or
+                    (table is not None and control.table is not table)):
+                continue
+            table = control.table
+            fast.append(k)
+            cols.append(setup.direction)
+            slots.append(control.slots[0])
+            f_trial.append(setup.trial_factor())
+            fd, ff = setup.out_factors()
+            f_disp.append(fd)
+            f_force.append(ff)
+        fast = np.array(fast, dtype=np.intp)
+        slow = np.setdiff1d(np.arange(len(self.sites)), fast)
+        return {
+            'table': table, 'fast': fast, 'slow': slow,
+            'slow_sites': [self.sites[k] for k in slow],
+            'cols': np.array(cols, dtype=np.intp),
+            'slots': np.array(slots, dtype=np.intp),
+            'f_trial': np.array(f_trial), 'f_disp': np.array(f_disp),
+            'f_force': np.array(f_force),
+        }
+
+    def set_trial(self, ue):
+        """
+        Compute the basic trial displacements from the stacked element node
+        displacements ue (n, nn*ndf) and send them to the sites.
+        """
+        if self._plan is None:
+            self.finalize()
+        plan = self._plan
+        phases = self.phases
+        timed = _timing
+        if timed:
+            t0 = _clock()
+        np.einsum('kij,kj->ki', self.Tb, ue, out=self.ctrl_disp)
+        if timed:
+            t1 = _clock()
+            phases[PHASE_ELEMENT] += t1 - t0
+        fast = plan['fast']
+        if len(fast):
+            command = self.ctrl_disp[fast, plan['cols']]*plan['f_trial']
+            if timed:
+                t0 = _clock()
+                phases[PHASE_SETUP] += t0 - t1
+            plan['table'].set_trial_strain(plan['slots'], command)
+            if timed:
+                t1 = _clock()
+                phases[PHASE_CONTROL] += t1 - t0
+        slow = plan['slow']
+        if len(slow):
+            self.dispatcher.start(plan['slow_sites'], [
+                self.ctrl_disp[k, :self.nb[k]] for k in slow])
+            if timed:
+                phases[PHASE_SITE] += _clock() - t1
+
+    def get_daq(self):
+        """Collect the measured responses and form the basic forces q."""
+        plan = self._plan
+        phases = self.phases
+        fast = plan['fast']
+        timed = _timing
+        if timed:
+            t0 = _clock()
+        if len(fast):
+            table = plan['table']
+            table.evaluate_if_dirty()
+            slots, cols = plan['slots'], plan['cols']
+            self.daq_disp[fast] = 0.0
+            self.daq_force[fast] = 0.0
+            self.daq_disp[fast, cols] = table.strain[slots]*plan['f_disp']
+            self.daq_force[fast, cols] = table.stress[slots]*plan['f_force']
+            if timed:
+                t1 = _clock()
+                phases[PHASE_SETUP] += t1 - t0
+                t0 = t1
+        slow = plan['slow']
+        if len(slow):
+            for k, (disp, force) in zip(slow, self.dispatcher.finish()):
+                nb = self.nb[k]
+                self.daq_disp[k, :nb] = disp
+                self.daq_force[k, :nb] = force
+            if timed:
+                t1 = _clock()
+                phases[PHASE_SITE] += t1 - t0
+                t0 = t1
+        self.q[:] = self.daq_force
+        if self.imod.any():
+            # Correct the measured force for displacement control errors
+            err = self.daq_disp - self.ctrl_disp
+            corr = np.einsum('kij,kj->ki', self.kinit, err)
+            self.q[self.imod] -= corr[self.imod]
+        if timed:
+            phases[PHASE_ELEMENT] += _clock() - t0
+        return self.q
+
+    def global_forces(self):
+        """Return the (n, nn*ndf) resisting forces of all elements."""
+        if not _timing:
+            return np.einsum('kij,ki->kj', self.Tb, self.q)
+        t0 = _clock()
+        fe = np.einsum('kij,ki->kj', self.Tb, self.q)
+        self.phases[PHASE_ELEMENT] += _clock() - t0
+        return fe
+
+    def stiffness(self):
+        """Return the (n, nn*ndf, nn*ndf) global initial stiffness matrices."""
+        return np.einsum('kia,kij,kjb->kab', self.Tb, self.kinit, self.Tb)
+
+    def commit(self):
+        # Materials of the vectorized chains are committed with the whole
+        # MaterialTable by the domain; only the per-object sites remain
+        plan = self._plan
+        if plan is None:
+            return
+        for k in plan['slow']:
+            self.sites[k].commit()
+
+    def response(self, k, args):
+        """eleResponse() of element k, or None for an unknown response."""
+        if self._plan is None:
+            self.finalize()
+        nb = self.nb[k]
+        what = args[0] if args else ''
+        if what in ('force', 'forces', 'globalForce', 'globalForces'):
+            return self.global_forces()[k, :self.width[k]]
+        if what in ('basicForce', 'basicForces'):
+            return self.q[k, :nb]
+        if what in ('ctrlDisp', 'basicDisp', 'basicDisplacement'):
+            return self.ctrl_disp[k, :nb]
+        if what == 'daqDisp':
+            return self.daq_disp[k, :nb]
+        if what == 'daqForce':
+            return self.daq_force[k, :nb]
+        return None
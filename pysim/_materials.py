@@ -0,0 +1,276 @@
+# openfrescopy/pysim/_materials.py
+"""
+Vectorized uniaxial material states for the Python stand-in backend.
+
+Every material used by an element or a SimUniaxialMaterials control is a row
+(slot) of one MaterialTable. Trial strains are written into the table and
+evaluate() updates the stress and tangent of all rows at once, so the state
+update costs a handful of NumPy operations per step no matter how many
+experimental elements and controls share the table.
+
+Supported types (arguments as in uniaxialMaterial()):
+    Elastic  E <eta> <Eneg>
+    Steel02  Fy E b <R0 cR1 cR2> <a1 a2 a3 a4> <sigInit>
+"""
+
+import numpy as np
+
+from ._errors import OpenSeesError
+
+ELASTIC = 0
+STEEL02 = 1
+
+# Parameter columns
+P_E, P_FY, P_B, P_R0, P_CR1, P_CR2, P_A1, P_A2, P_A3, P_A4, P_ENEG = range(11)
+N_PARAMS = 11
+
+# State columns (Elastic only uses EPS, SIG and TAN)
+(S_EPS, S_SIG, S_TAN, S_EPSMAX, S_EPSMIN, S_EPSPL, S_EPSS0, S_SIGS0,
+ S_EPSR, S_SIGR, S_KON) = range(11)
+N_STATES = 11
+
+
+def parse_material(args):
+    """
+    Return (kind, params) for the arguments of uniaxialMaterial() after the
+    tag, e.g. ('Steel02', 1.5, 2.8, 0.01, 18.5, ...).
+    """
+    mat_type, values = args[0], [float(v) for v in args[1:]]
+    params = np.zeros(N_PARAMS)
+    if mat_type == 'Elastic':
+        if not 1 <= len(values) <= 3:
+            raise OpenSeesError('uniaxialMaterial Elastic: want E <eta> <Eneg>')
+        if len(values) > 1 and values[1] != 0.0:
+            raise OpenSeesError('uniaxialMaterial Elastic: eta is not '
+                                'supported by the Python backend')
+        params[P_E] = values[0]
+        params[P_ENEG] = values[2] if len(values) > 2 else values[0]
+        return ELASTIC, params
+    if mat_type == 'Steel02':
+        if len(values) not in (3, 6, 10, 11):
+            raise OpenSeesError('uniaxialMaterial Steel02: want Fy E b '
+                                '<R0 cR1 cR2> <a1 a2 a3 a4> <sigInit>')
+        if len(values) == 11 and values[10] != 0.0:
+            raise OpenSeesError('uniaxialMaterial Steel02: sigInit is not '
+                                'supported by the Python backend')
+        defaults = [15.0, 0.925, 0.15, 0.0, 1.0, 0.0, 1.0]
+        values = values[:3] + values[3:10] + defaults[len(values) - 3:]
+        Fy, E, b, R0, cR1, cR2, a1, a2, a3, a4 = values[:10]
+        params[[P_FY, P_E, P_B, P_R0, P_CR1, P_CR2, P_A1, P_A2, P_A3,
+                P_A4]] = (Fy, E, b, R0, cR1, cR2, a1, a2, a3, a4)
+        return STEEL02, params
+    raise OpenSeesError(f"uniaxialMaterial '{mat_type}' is not supported by "
+                        f"the Python backend (use Elastic or Steel02)")
+
+
+def _virgin_state(kind, params):
+    state = np.zeros(N_STATES)
+    state[S_TAN] = params[P_E]
+    if kind == STEEL02:
+        epsy = params[P_FY]/params[P_E]
+        state[S_EPSMAX] = epsy
+        state[S_EPSMIN] = -epsy
+    return state
+
+
+class MaterialTable:
+    """Committed and trial states of all material instances, one per row."""
+
+    def __init__(self, capacity=16):
+        self.size = 0
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.params = np.zeros((capacity, N_PARAMS))
+        self.committed = np.zeros((capacity, N_STATES))
+        self.trial = np.zeros((capacity, N_STATES))
+        self.dirty = False
+        self._steel = None
+
+    def _grow(self, need=0):
+        capacity = max(2*len(self.kind), need)
+        for name in ('kind', 'params', 'committed', 'trial'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, kind, params):
+        """Add a virgin material instance and return its slot."""
+        if self.size == len(self.kind):
+            self._grow()
+        slot = self.size
+        self.size += 1
+        self.kind[slot] = kind
+        self.params[slot] = params
+        state = _virgin_state(kind, params)
+        self.committed[slot] = state
+        self.trial[slot] = state
+        self._steel = None
+        return slot
+
+    def add_copies(self, kind, params, n):
+        """Add n virgin instances of one material and return their slots."""
+        if self.size + n > len(self.kind):
+            self._grow(self.size + n)
+        slots = np.arange(self.size, self.size + n)
+        self.size += n
+        self.kind[slots] = kind
+        self.params[slots] = params
+        state = _virgin_state(kind, params)
+        self.committed[slots] = state
+        self.trial[slots] = state
+        self._steel = None
+        return slots
+
+    @property
+    def strain(self):
+        return self.trial[:self.size, S_EPS]
+
+    @property
+    def stress(self):
+        return self.trial[:self.size, S_SIG]
+
+    @property
+    def tangent(self):
+        return self.trial[:self.size, S_TAN]
+
+    @property
+    def initial_tangent(self):
+        return self.params[:self.size, P_E]
+
+    def set_trial_strain(self, slots, strain):
+        self.trial[slots, S_EPS] = strain
+        self.dirty = True
+
+    def evaluate_if_dirty(self):
+        if self.dirty:
+            self.evaluate()
+
+    def evaluate(self):
+        """Update stress and tangent of every row from its trial strain."""
+        n = self.size
+        self.dirty = False
+        if n == 0:
+            return
+        if self._steel is None:
+            self._steel = np.flatnonzero(self.kind[:n] == STEEL02)
+            self._elastic = np.flatnonzero(self.kind[:n] == ELASTIC)
+        if len(self._elastic):
+            self._update_elastic(self._elastic)
+        if len(self._steel):
+            self._update_steel02(self._steel)
+
+    def commit(self):
+        self.committed[:self.size] = self.trial[:self.size]
+
+    def revert(self):
+        self.trial[:self.size] = self.committed[:self.size]
+        self.dirty = False
+
+    def revert_to_start(self):
+        for slot in range(self.size):
+            self.committed[slot] = _virgin_state(self.kind[slot],
+                                                 self.params[slot])
+        self.revert()
+
+    def _update_elastic(self, rows):
+        p = self.params[rows]
+        eps = self.trial[rows, S_EPS]
+        E = np.where(eps < 0.0, p[:, P_ENEG], p[:, P_E])
+        self.trial[rows, S_SIG] = E*eps
+        self.trial[rows, S_TAN] = E
+
+    def _update_steel02(self, rows):
+        # Vectorized port of Steel02::setTrialStrain (Menegotto-Pinto with
+        # isotropic hardening); every branch is evaluated as a row mask
+        p = self.params[rows]
+        c = self.committed[rows]
+        eps = self.trial[rows, S_EPS]
+        Fy, E0, b = p[:, P_FY], p[:, P_E], p[:, P_B]
+        R0, cR1, cR2 = p[:, P_R0], p[:, P_CR1], p[:, P_CR2]
+        a1, a2, a3, a4 = p[:, P_A1], p[:, P_A2], p[:, P_A3], p[:, P_A4]
+        Esh = b*E0
+        epsy = Fy/E0
+
+        epsP, sigP = c[:, S_EPS], c[:, S_SIG]
+        epsmax = c[:, S_EPSMAX].copy()
+        epsmin = c[:, S_EPSMIN].copy()
+        epspl = c[:, S_EPSPL].copy()
+        epss0 = c[:, S_EPSS0].copy()
+        sigs0 = c[:, S_SIGS0].copy()
+        epsr = c[:, S_EPSR].copy()
+        sigr = c[:, S_SIGR].copy()
+        kon = c[:, S_KON].copy()
+        deps = eps - epsP
+
+        # Virgin material: stay elastic for a vanishing increment, otherwise
+        # start on the tension or compression envelope
+        virgin = (kon == 0) | (kon == 3)
+        still = virgin & (np.abs(deps) < 10.0*np.finfo(float).eps)
+        start = virgin & ~still
+        neg = start & (deps < 0.0)
+        pos = start & (deps >= 0.0)
+        epsmax[start] = epsy[start]
+        epsmin[start] = -epsy[start]
+        kon[neg] = 2
+        epss0[neg] = -epsy[neg]
+        sigs0[neg] = -Fy[neg]
+        epspl[neg] = -epsy[neg]
+        kon[pos] = 1
+        epss0[pos] = epsy[pos]
+        sigs0[pos] = Fy[pos]
+        epspl[pos] = epsy[pos]
+
+        # Load reversal from compression to tension
+        up = ~start & (kon == 2) & (deps > 0.0)
+        if up.any():
+            kon[up] = 1
+            epsr[up] = epsP[up]
+            sigr[up] = sigP[up]
+            epsmin[up] = np.minimum(epsP[up], epsmin[up])
+            d1 = (epsmax[up] - epsmin[up])/(2.0*a4[up]*epsy[up])
+            shft = 1.0 + a3[up]*d1**0.8
+            epss0[up] = (Fy[up]*shft - Esh[up]*epsy[up]*shft - sigr[up] +
+                         E0[up]*epsr[up])/(E0[up] - Esh[up])
+            sigs0[up] = Fy[up]*shft + Esh[up]*(epss0[up] - epsy[up]*shft)
+            epspl[up] = epsmax[up]
+
+        # Load reversal from tension to compression
+        down = ~start & (kon == 1) & (deps < 0.0)
+        if down.any():
+            kon[down] = 2
+            epsr[down] = epsP[down]
+            sigr[down] = sigP[down]
+            epsmax[down] = np.maximum(epsP[down], epsmax[down])
+            d1 = (epsmax[down] - epsmin[down])/(2.0*a2[down]*epsy[down])
+            shft = 1.0 + a1[down]*d1**0.8
+            epss0[down] = (-Fy[down]*shft + Esh[down]*epsy[down]*shft -
+                           sigr[down] + E0[down]*epsr[down])/(E0[down] -
+                                                              Esh[down])
+            sigs0[down] = -Fy[down]*shft + Esh[down]*(epss0[down] +
+                                                      epsy[down]*shft)
+            epspl[down] = epsmin[down]
+
+        # Stress and tangent on the current Menegotto-Pinto branch
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xi = np.abs((epspl - epss0)/epsy)
+            R = R0*(1.0 - (cR1*xi)/(cR2 + xi))
+            epsrat = (eps - epsr)/(epss0 - epsr)
+            dum1 = 1.0 + np.abs(epsrat)**R
+            dum2 = dum1**(1.0/R)
+            sig = (b*epsrat + (1.0 - b)*epsrat/dum2)*(sigs0 - sigr) + sigr
+            tan = (b + (1.0 - b)/(dum1*dum2))*(sigs0 - sigr)/(epss0 - epsr)
+        sig[still] = 0.0
+        tan[still] = E0[still]
+        kon[still] = 3
+
+        t = self.trial
+        t[rows, S_SIG] = sig
+        t[rows, S_TAN] = tan
+        t[rows, S_EPSMAX] = epsmax
+        t[rows, S_EPSMIN] = epsmin
+        t[rows, S_EPSPL] = epspl
+        t[rows, S_EPSS0] = epss0
+        t[rows, S_SIGS0] = sigs0
+        t[rows, S_EPSR] = epsr
+        t[rows, S_SIGR] = sigr
+        t[rows, S_KON] = kon
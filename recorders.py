@@ -0,0 +1,342 @@
+# openfrescopy/recorders.py
+"""
+Binary columnar recorder files for openfrescopy.
+
+The text recorders of OpenSees (recorder("Node", "-file", "Node_Dsp.out", ...))
+format every value as ASCII, and post-processing has to parse it all again.
+This module defines a compact binary alternative:
+
+    +----------------------+-----------------------+----------------------+
+    | 16-byte preamble     | JSON metadata, padded | rows of n_columns    |
+    | magic, version, size | to a 64-byte boundary | fixed-dtype values   |
+    +----------------------+-----------------------+----------------------+
+
+The preamble is the magic b'OFRB', a uint16 format version, a uint16 spare
+field, the uint32 total header size (data offset) and the uint32 length of the
+JSON metadata. The metadata stores the dtype, the column labels and where the
+data came from. The row count is not stored, so the file is valid after every
+appended block and can be read while it is still being written.
+
+Usage:
+    from openfrescopy import recorders
+
+    rec = recorders.open_recording('Node_Dsp.bin')
+    rec.time              # zero-copy view of the time column
+    rec['3/1']            # zero-copy view of one column
+    rec.data              # (n_rows, n_columns) memory-mapped array
+
+    recorders.convert_text('Node_Dsp.out', 'Node_Dsp.bin',
+                           labels=['time', '3/1', '4/1'])
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'OFRB'
+VERSION = 1
+_PREAMBLE = struct.Struct('<4sHHII')
+_ALIGN = 64
+
+
+# Recorder options that take no value and only affect the output format
+_FLAGS = ('-closeOnWrite',)
+# Options that name the output file like '-file', with the format they ask
+# the native recorder for
+_FILE_OPTIONS = {'-file': 'text', '-xml': 'xml', '-binary': 'binary'}
+# Recorder options that only affect the output format, with the number of
+# values each takes ('-tcp', ip, port)
+_OPTIONS = {'-tcp': 2, '-database': 1}
+
+
+def parse_recorder_args(args):
+    """
+    Parse the arguments of recorder('Node', ...) or recorder('Element', ...).
+
+    Returns a dict with the recorder 'kind', the output 'path' and its
+    'format' ('text', 'xml' or 'binary' for '-file', '-xml' or '-binary'),
+    the 'time' flag, the '-dT' sampling interval 'dT', the node or element
+    'tags', the node 'dofs', the output 'precision' and the remaining
+    'response' arguments (e.g. ['disp'] or ['ctrlDisp']). Raises ValueError
+    for missing parts.
+    """
+    args = list(args)
+    if not args or args[0] not in ('Node', 'Element'):
+        raise ValueError("only 'Node' and 'Element' recorders are supported, "
+                         f"got {args[:1]}")
+    spec = {'kind': args[0], 'path': None, 'format': None, 'time': False,
+            'dT': 0.0, 'tags': [], 'dofs': [], 'precision': 6}
+
+    def ints(i):
+        values = []
+        while i < len(args) and not isinstance(args[i], str):
+            values.append(int(args[i]))
+            i += 1
+        return values, i
+
+    i = 1
+    while i < len(args):
+        arg = args[i]
+        if arg in _FILE_OPTIONS:
+            spec['path'] = args[i + 1]
+            spec['format'] = _FILE_OPTIONS[arg]
+            i += 2
+        elif arg == '-time':
+            spec['time'] = True
+            i += 1
+        elif arg == '-dT':
+            spec['dT'] = float(args[i + 1])
+            i += 2
+        elif arg == '-precision':
+            spec['precision'] = int(args[i + 1])
+            i += 2
+        elif arg in ('-node', '-ele'):
+            values, i = ints(i + 1)
+            spec['tags'].extend(values)
+        elif arg in ('-nodeRange', '-eleRange'):
+            spec['tags'].extend(range(int(args[i + 1]), int(args[i + 2]) + 1))
+            i += 3
+        elif arg == '-dof':
+            values, i = ints(i + 1)
+            spec['dofs'].extend(values)
+        elif arg in _FLAGS:
+            i += 1
+        elif arg in _OPTIONS:
+            i += 1 + _OPTIONS[arg]
+        else:
+            break
+    spec['response'] = [str(a) for a in args[i:]]
+    if spec['path'] is None:
+        raise ValueError("recorder requires '-file', path (or '-xml' or "
+                         "'-binary', path)")
+    if not spec['tags']:
+        raise ValueError('recorder requires at least one node or element tag')
+    if spec['kind'] == 'Node' and (not spec['dofs'] or
+                                   len(spec['response']) != 1):
+        raise ValueError("Node recorder requires '-dof' and one response "
+                         "type, e.g. 'disp'")
+    if spec['kind'] == 'Element' and not spec['response']:
+        raise ValueError("Element recorder requires a response type, e.g. "
+                         "'forces'")
+    return spec
+
+
+def _header(dtype, labels, meta):
+    """Pack the preamble and JSON metadata into an aligned header block."""
+    info = dict(meta or {})
+    info['dtype'] = np.dtype(dtype).str
+    info['columns'] = list(labels)
+    text = json.dumps(info, separators=(',', ':')).encode('utf-8')
+    size = _PREAMBLE.size + len(text)
+    size += -size % _ALIGN
+    preamble = _PREAMBLE.pack(MAGIC, VERSION, 0, size, len(text))
+    return (preamble + text).ljust(size, b' ')
+
+
+def read_header(path):
+    """
+    Return (metadata, data_offset) of a binary recording.
+
+    Raises ValueError if the file is not a binary recording.
+    """
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f'{path}: file too short for a binary recording')
+        magic, version, _, size, length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: not a binary recording (bad magic)')
+        if version > VERSION:
+            raise ValueError(f'{path}: unsupported recording version {version}')
+        meta = json.loads(f.read(length).decode('utf-8'))
+    return meta, size
+
+
+class RecordingWriter:
+    """
+    Append-only writer of a binary recording.
+
+    Rows are collected in a block buffer and written in one call when the
+    block is full, so per-row cost is a copy into preallocated memory.
+    """
+
+    def __init__(self, path, labels, dtype=np.float64, meta=None,
+                 block_rows=1024):
+        self.path = os.fspath(path)
+        self.labels = list(labels)
+        self.dtype = np.dtype(dtype)
+        if self.dtype.kind != 'f':
+            raise ValueError(f'recordings store floats, not {self.dtype}')
+        self.rows = 0
+        self._block = np.empty((max(1, int(block_rows)), len(self.labels)),
+                               dtype=self.dtype)
+        self._fill = 0
+        self._file = open(self.path, 'wb')
+        self._file.write(_header(self.dtype, self.labels, meta))
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def next_row(self):
+        """Return the buffer row to fill next; it is committed by commit()."""
+        return self._block[self._fill]
+
+    def commit(self):
+        """Commit the row returned by next_row()."""
+        self._fill += 1
+        self.rows += 1
+        if self._fill == len(self._block):
+            self.flush()
+
+    def append(self, values):
+        """Append one row of values."""
+        self._block[self._fill] = values
+        self.commit()
+
+    def write_block(self, block):
+        """Append a (n_rows, n_columns) block of rows."""
+        block = np.asarray(block, dtype=self.dtype)
+        if block.ndim != 2 or block.shape[1] != len(self.labels):
+            raise ValueError(f'block has shape {block.shape}, expected '
+                             f'(n, {len(self.labels)})')
+        self.flush()
+        self._file.write(np.ascontiguousarray(block).tobytes())
+        self.rows += len(block)
+
+    def flush(self):
+        if self._fill:
+            self._file.write(self._block[:self._fill].tobytes())
+            self._fill = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    """
+    Memory-mapped, read-only view of a binary recording.
+
+    All arrays returned by this class are views into the mapped file, so
+    opening a recording and slicing columns does not copy any data.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.meta, self.offset = read_header(self.path)
+        self.dtype = np.dtype(self.meta['dtype'])
+        self.labels = list(self.meta['columns'])
+        self._index = {label: j for j, label in enumerate(self.labels)}
+        width = len(self.labels)
+        row_bytes = self.dtype.itemsize*width
+        n_rows = (os.path.getsize(self.path) - self.offset)//row_bytes
+        if n_rows > 0 and width > 0:
+            self.data = np.memmap(self.path, dtype=self.dtype, mode='r',
+                                  offset=self.offset, shape=(n_rows, width))
+        else:
+            self.data = np.empty((0, width), dtype=self.dtype)
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, label):
+        """Return the column with the given label (or index) as a view."""
+        if isinstance(label, str):
+            try:
+                label = self._index[label]
+            except KeyError:
+                raise KeyError(f'{self.path}: no column {label!r}') from None
+        return self.data[:, label]
+
+    def __repr__(self):
+        return (f'Recording({self.path!r}, rows={len(self)}, '
+                f'columns={len(self.labels)}, dtype={self.dtype})')
+
+    @property
+    def time(self):
+        """The 'time' column, or None if the recording has none."""
+        if 'time' not in self._index:
+            return None
+        return self['time']
+
+    def columns(self, *labels):
+        """Return {label: column view} for the given (or all) labels."""
+        return {label: self[label] for label in (labels or self.labels)}
+
+
+def open_recording(path):
+    """Memory-map a binary recording for reading."""
+    return Recording(path)
+
+
+def convert_text(src, dst, labels=None, dtype=np.float64, block_rows=4096,
+                 meta=None):
+    """
+    Convert a whitespace-separated recorder .out file to a binary recording.
+
+    The text file is parsed in blocks of block_rows lines, so memory use does
+    not grow with the file size.
+
+    Args:
+        src: path of the text recorder output
+        dst: path of the binary recording to create
+        labels: column labels; defaults to 'c0', 'c1', ... Pass 'time' as the
+            first label for recorders created with '-time'.
+        dtype: float dtype of the stored values
+        block_rows: number of lines parsed per block
+
+    Returns:
+        Number of rows written.
+    """
+    writer = None
+    lines = []
+
+    def write(lines):
+        nonlocal writer
+        values = np.array(' '.join(lines).split(), dtype=np.float64)
+        if writer is None:
+            width = len(lines[0].split())
+            names = list(labels) if labels is not None else [
+                f'c{j}' for j in range(width)]
+            if len(names) != width:
+                raise ValueError(f'{src}: {width} columns but {len(names)} '
+                                 f'labels given')
+            info = {'source': os.path.basename(os.fspath(src))}
+            info.update(meta or {})
+            writer = RecordingWriter(dst, names, dtype=dtype, meta=info)
+        width = len(writer.labels)
+        if values.size % width:
+            raise ValueError(f'{src}: ragged rows in block ending at row '
+                             f'{writer.rows + len(lines)}')
+        writer.write_block(values.reshape(-1, width))
+
+    try:
+        with open(src, 'r') as f:
+            for line in f:
+                if line.strip():
+                    lines.append(line)
+                    if len(lines) == block_rows:
+                        write(lines)
+                        lines = []
+        if lines:
+            write(lines)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # Empty input: still leave a valid (empty) recording behind
+        RecordingWriter(dst, list(labels or []), dtype=dtype).close()
+        return 0
+    return writer.rows
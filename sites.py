@@ -0,0 +1,479 @@
+# openfrescopy/sites.py
+"""
+asyncio messaging layer for remote experimental sites.
+
+In a distributed test the finite element side sends the trial response of
+every step to a remote site and waits for the measured response. This module
+implements that exchange on top of asyncio:
+
+    SiteServer   serves any expSetup-like object (anything with
+                 set_trial_response(disp), get_daq_response() -> (disp,
+                 force) and optionally commit()) on a TCP port
+    RemoteSite   asyncio client of a SiteServer
+    BlockingRemoteSite
+                 synchronous wrapper of RemoteSite with a private event loop,
+                 used by the Python backend's expSite('RemoteSite', ...)
+
+Connections are persistent and messages are fixed-layout binary frames:
+
+    +--------+-------+--------+--------+---------------------------+
+    | action | flags | count  | seq    | count little-endian f8    |
+    | uint8  | uint8 | uint16 | uint32 | (count bytes of UTF-8 for |
+    |        |       |        |        | ERROR frames)             |
+    +--------+-------+--------+--------+---------------------------+
+
+Both sides receive straight into a preallocated buffer (asyncio
+BufferedProtocol) and build frames in a preallocated send buffer. Each frame
+is handed to the transport as its own small bytes copy, because the
+transport may queue it unsent while the next frame is built (the selector
+transports keep a view of the written data instead of copying it since
+Python 3.12).
+
+With pipeline=True, set_trial_response() and commit() are sent without
+waiting for an acknowledgement; the server handles frames in order, so the
+following get_daq_response() reply confirms them, and a failure is reported
+by the next call. A step then costs one round trip instead of two.
+
+The protocol is specific to this package; it does not talk to the native
+OpenFresco ActorSite/RemoteSite TCP channels.
+
+Usage:
+    # lab side
+    server = SiteServer(setup, port=8090)
+    server.serve(once=True)
+
+    # simulation side
+    site = await RemoteSite('127.0.0.1', 8090, pipeline=True).connect()
+    await site.set_trial_response(disp)
+    disp, force = await site.get_daq_response()
+"""
+
+import asyncio
+import socket
+import struct
+
+import numpy as np
+
+# Frame header: action, flags, count, sequence number
+_HEADER = struct.Struct('<BBHI')
+
+HELLO = 1
+SET_TRIAL = 2
+ACK = 3
+GET_DAQ = 4
+DAQ = 5
+COMMIT = 6
+BYE = 7
+ERROR = 255
+
+# Flag bit asking the server to acknowledge SET_TRIAL or COMMIT
+_WANT_ACK = 1
+
+# Default largest number of doubles in one message (like OpenFresco's
+# -dataSize option)
+DATA_SIZE = 256
+
+
+class SiteError(RuntimeError):
+    """A remote site reported an error or the connection was lost."""
+
+
+class _FrameProtocol(asyncio.BufferedProtocol):
+    """
+    Receive frames into one preallocated buffer and dispatch them.
+
+    frame_received() gets a memoryview of the payload that is only valid
+    during the call, so handlers copy what they keep.
+    """
+
+    def __init__(self, data_size):
+        self.data_size = data_size
+        self.frame_size = _HEADER.size + 8*data_size
+        # Room for several pipelined frames per read
+        self._buf = bytearray(4*self.frame_size)
+        self._view = memoryview(self._buf)
+        self._fill = 0
+        self._send = bytearray(self.frame_size)
+        self._send_view = memoryview(self._send)
+        self._send_values = np.frombuffer(self._send, dtype='<f8',
+                                          offset=_HEADER.size)
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        if sock is not None and sock.family in (socket.AF_INET,
+                                                socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def get_buffer(self, sizehint):
+        return self._view[self._fill:]
+
+    def buffer_updated(self, nbytes):
+        end = self._fill + nbytes
+        buf = self._buf
+        start = 0
+        while end - start >= _HEADER.size:
+            action, flags, count, seq = _HEADER.unpack_from(buf, start)
+            size = _HEADER.size + (count if action == ERROR else 8*count)
+            if size > self.frame_size:
+                self.protocol_error(f'frame of {size} bytes exceeds the data '
+                                    f'size of {self.data_size} values')
+                return
+            if end - start < size:
+                break
+            self.frame_received(action, flags, seq,
+                                self._view[start + _HEADER.size:start + size])
+            start += size
+        if start:
+            buf[:end - start] = buf[start:end]
+        self._fill = end - start
+
+    def send(self, action, seq, values=None, flags=0):
+        """Send one frame built in the preallocated send buffer."""
+        count = 0
+        if values is not None:
+            count = len(values)
+            if count > self.data_size:
+                raise SiteError(f'{count} values exceed the data size of '
+                                f'{self.data_size}')
+            self._send_values[:count] = values
+        _HEADER.pack_into(self._send, 0, action, flags, count, seq)
+        # A copy: the send buffer is reused for the next frame while this
+        # one may still be queued in the transport
+        self.transport.write(bytes(self._send_view[:_HEADER.size + 8*count]))
+
+    def send_error(self, seq, message):
+        text = message.encode('utf-8')[:8*self.data_size]
+        _HEADER.pack_into(self._send, 0, ERROR, 0, len(text), seq)
+        self._send[_HEADER.size:_HEADER.size + len(text)] = text
+        self.transport.write(bytes(self._send_view[:_HEADER.size +
+                                                   len(text)]))
+
+    def frame_received(self, action, flags, seq, payload):
+        """Handle one frame; subclasses handle the actions they expect."""
+        self.protocol_error(f'unexpected frame with action {action}')
+
+    def protocol_error(self, message):
+        self.transport.close()
+
+
+class _ServerProtocol(_FrameProtocol):
+    """One client connection of a SiteServer."""
+
+    def __init__(self, server):
+        super().__init__(server.data_size)
+        self.server = server
+        self.setup = server.setup
+        self._trial = np.zeros(server.data_size)
+
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        self.server._connections.add(self)
+
+    def connection_lost(self, exc):
+        self.server._connections.discard(self)
+        self.server._client_done()
+
+    def frame_received(self, action, flags, seq, payload):
+        server = self.server
+        server.messages += 1
+        try:
+            if action == SET_TRIAL:
+                n = len(payload)//8
+                trial = self._trial[:n]
+                trial[:] = np.frombuffer(payload, dtype='<f8')
+                self.setup.set_trial_response(trial)
+                if flags & _WANT_ACK:
+                    self.send(ACK, seq)
+            elif action == GET_DAQ:
+                disp, force = self.setup.get_daq_response()
+                n = len(disp)
+                if 2*n > self.data_size:
+                    raise SiteError(f'{2*n} response values exceed the data '
+                                    f'size of {self.data_size}')
+                self._send_values[:n] = disp
+                self._send_values[n:2*n] = force
+                self.send(DAQ, seq, self._send_values[:2*n])
+            elif action == COMMIT:
+                commit = getattr(self.setup, 'commit', None)
+                if commit is not None:
+                    commit()
+                if flags & _WANT_ACK:
+                    self.send(ACK, seq)
+            elif action == HELLO:
+                self.send(HELLO, seq, (
+                    getattr(self.setup, 'size_trial', 0),
+                    getattr(self.setup, 'size_out', 0), self.data_size))
+            elif action == BYE:
+                self.send(ACK, seq)
+                self.transport.close()
+            else:
+                raise SiteError(f'unknown action {action}')
+        except Exception as e:
+            self.send_error(seq, f'{type(e).__name__}: {e}')
+
+
+class SiteServer:
+    """
+    Serve an expSetup-like object to RemoteSite clients over TCP.
+
+    Args:
+        setup: object with set_trial_response(disp) and get_daq_response()
+            -> (disp, force), optionally commit(), size_trial and size_out
+        host, port: address to listen on (port 0 picks a free port)
+        data_size: largest number of values in one message
+
+    Requests are handled in the order they arrive, on the event loop thread.
+    """
+
+    def __init__(self, setup, host='127.0.0.1', port=0, data_size=DATA_SIZE):
+        self.setup = setup
+        self.host = host
+        self.port = int(port)
+        self.data_size = int(data_size)
+        self.messages = 0
+        self._server = None
+        self._connections = set()
+        self._once = None
+
+    @property
+    def address(self):
+        return self.host, self.port
+
+    async def start(self):
+        """Start listening; self.port is the bound port afterwards."""
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: _ServerProtocol(self), self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def serve_once(self):
+        """Serve until the first client disconnects."""
+        self._once = asyncio.get_running_loop().create_future()
+        if self._server is None:
+            await self.start()
+        try:
+            await self._once
+        finally:
+            await self.close()
+
+    def _client_done(self):
+        if self._once is not None and not self._once.done():
+            self._once.set_result(None)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for conn in list(self._connections):
+                conn.transport.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def serve(self, once=False):
+        """Run the server in this thread (until one client is done if once)."""
+        asyncio.run(self.serve_once() if once else self.serve_forever())
+
+
+class _ClientProtocol(_FrameProtocol):
+    """Connection of a RemoteSite; routes replies to waiting requests."""
+
+    def __init__(self, site):
+        super().__init__(site.data_size)
+        self.site = site
+
+    def frame_received(self, action, flags, seq, payload):
+        site = self.site
+        future = site._waiting.pop(seq, None)
+        if action == ERROR:
+            error = SiteError(bytes(payload).decode('utf-8', 'replace'))
+            if future is None:
+                # Failure of a pipelined request: report it on the next call
+                site._error = error
+            elif not future.done():
+                future.set_exception(error)
+            return
+        if action == DAQ:
+            n = len(payload)//16
+            values = np.frombuffer(payload, dtype='<f8')
+            site.daq_disp[:n] = values[:n]
+            site.daq_force[:n] = values[n:2*n]
+            site._daq_n = n
+        elif action == HELLO:
+            values = np.frombuffer(payload, dtype='<f8')
+            site.size_trial, site.size_out = int(values[0]), int(values[1])
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def connection_lost(self, exc):
+        site = self.site
+        error = SiteError(f'connection to {site.host}:{site.port} lost'
+                          + (f': {exc}' if exc else ''))
+        for future in site._waiting.values():
+            if not future.done():
+                future.set_exception(error)
+        site._waiting.clear()
+        if not site._closing:
+            site._error = error
+
+
+class RemoteSite:
+    """
+    asyncio client of a SiteServer.
+
+    Args:
+        host, port: address of the SiteServer
+        pipeline: send trial responses and commits without waiting for the
+            acknowledgement (errors surface on the next call)
+        data_size: largest number of values in one message; must not exceed
+            the server's
+
+    get_daq_response() returns the preallocated daq_disp and daq_force
+    arrays, which are overwritten by the next call.
+    """
+
+    def __init__(self, host, port, pipeline=False, data_size=DATA_SIZE):
+        self.host = host
+        self.port = int(port)
+        self.pipeline = bool(pipeline)
+        self.data_size = int(data_size)
+        self.size_trial = 0
+        self.size_out = 0
+        self.daq_disp = np.zeros(self.data_size//2)
+        self.daq_force = np.zeros(self.data_size//2)
+        self._daq_n = 0
+        self._protocol = None
+        self._waiting = {}
+        self._seq = 0
+        self._error = None
+        self._closing = False
+
+    async def connect(self):
+        """Open the connection and exchange sizes with the server."""
+        loop = asyncio.get_running_loop()
+        _, self._protocol = await loop.create_connection(
+            lambda: _ClientProtocol(self), self.host, self.port)
+        await self._request(HELLO)
+        return self
+
+    def _send(self, action, values=None, flags=0):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        if self._protocol is None:
+            raise SiteError(f'not connected to {self.host}:{self.port}')
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        self._protocol.send(action, self._seq, values, flags)
+        return self._seq
+
+    def _request(self, action, values=None, flags=0):
+        future = asyncio.get_running_loop().create_future()
+        seq = self._send(action, values, flags)
+        self._waiting[seq] = future
+        return future
+
+    async def set_trial_response(self, disp):
+        if self.pipeline:
+            self._send(SET_TRIAL, disp)
+        else:
+            await self._request(SET_TRIAL, disp, _WANT_ACK)
+
+    async def get_daq_response(self):
+        await self._request(GET_DAQ)
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        n = self._daq_n
+        return self.daq_disp[:n], self.daq_force[:n]
+
+    async def exchange(self, disp):
+        """Send a trial response and return the measured (disp, force)."""
+        await self.set_trial_response(disp)
+        return await self.get_daq_response()
+
+    async def commit(self):
+        if self.pipeline:
+            self._send(COMMIT)
+        else:
+            await self._request(COMMIT, flags=_WANT_ACK)
+
+    async def close(self):
+        """Tell the server this client is done and close the connection."""
+        if self._protocol is None:
+            return
+        self._closing = True
+        try:
+            if not self._protocol.transport.is_closing():
+                await self._request(BYE)
+        except SiteError:
+            pass
+        finally:
+            self._protocol.transport.close()
+            self._protocol = None
+
+
+# Event loop shared by the BlockingRemoteSites of this process
+_loop = None
+
+
+def blocking_loop():
+    """Return the event loop that BlockingRemoteSite runs its clients on."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+class BlockingRemoteSite:
+    """
+    Synchronous RemoteSite running on an event loop owned by this module.
+
+    This is the site object behind expSite('RemoteSite', ...) in the Python
+    backend, where elements call the site from plain (non-async) code. All
+    blocking sites share blocking_loop(), so several of them can also be
+    driven concurrently by gathering their `site` coroutines on that loop.
+    """
+
+    def __init__(self, host, port, pipeline=False, data_size=DATA_SIZE,
+                 tag=None):
+        self.tag = tag
+        self.loop = blocking_loop()
+        self.site = RemoteSite(host, port, pipeline, data_size)
+        self._run(self.site.connect())
+
+    def _run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    @property
+    def size_trial(self):
+        return self.site.size_trial
+
+    @property
+    def size_out(self):
+        return self.site.size_out
+
+    def set_trial_response(self, disp):
+        if self.site.pipeline:
+            # Nothing to wait for: write the frame without a loop iteration
+            self.site._send(SET_TRIAL, disp)
+        else:
+            self._run(self.site.set_trial_response(disp))
+
+    def get_daq_response(self):
+        return self._run(self.site.get_daq_response())
+
+    def commit(self):
+        if self.site.pipeline:
+            self.site._send(COMMIT)
+        else:
+            self._run(self.site.commit())
+
+    def close(self):
+        if not self.loop.is_closed():
+            self._run(self.site.close())
@@ -0,0 +1,694 @@
+# openfrescopy/substructure.py
+"""
+Multi-process substructuring for openfrescopy.
+
+OpenSees keeps its model in process-wide global state, so a hybrid model
+like examples/OneBayFrame holds all of its numerical and experimental
+elements in one interpreter and steps them on one core. This module splits
+the numerical part into substructures that are each built and solved in a
+worker process of their own, and couples them to a coordinator model
+through experimental sites:
+
+    coordinator (this process)                 workers
+    interface nodes, masses, loads,
+    integrator, recorders
+    expElement('generic', ...) -- site -->     Subdomain: impose the trial
+        one per substructure                   interface displacements,
+                                               solve the interior, return
+                                               the interface forces
+
+Every worker exposes the DOFs it shares with the coordinator as an
+expSetup-like Subdomain, served either by a sites.SiteServer on a loopback
+socket (expSite 'RemoteSite') or through a shared-memory channel
+(expSite 'SharedMemorySite'). The interior of a substructure is condensed
+quasi-statically, so mass belongs on the interface nodes of the
+coordinator. All sites of a step receive their trial displacements before
+any answer is awaited, so the workers solve their substructures at the same
+time, on as many cores as there are workers.
+
+Usage:
+    import openfrescopy.opensees as ops
+    from openfrescopy import substructure
+
+    def build_column(ops, k):          # module level, runs in the worker
+        ops.model('BasicBuilder', '-ndm', 2, '-ndf', 2)
+        ...                            # node 3 is shared with the coordinator
+
+    subs = [substructure.Substructure(build_column, [(3, [1])], (2.8,)),
+            substructure.Substructure(build_column, [(4, [1])], (5.6,),
+                                      transport='shm')]
+    substructure.start_all(subs)       # build the workers in parallel
+
+    ops.model('BasicBuilder', '-ndm', 2, '-ndf', 2)
+    ...                                # interface nodes 3 and 4 with masses
+    substructure.couple(subs, 1)       # sites and generic elements 1 and 2
+    ...
+    ops.analyze(1790, dtAna)
+    ops.wipeExp()                      # ends the workers' sessions
+    for sub in subs:
+        sub.close()
+
+Both ends need the Python backend. Start the substructures before the
+coordinator model is built: with the default start method the workers are
+forked and would inherit it.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import socket
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from .monitor import _attach
+from .sites import SiteError, SiteServer
+
+MAGIC = 0x4F465353      # 'OFSS'
+VERSION = 1
+
+# Header fields (int64 indices)
+(_MAGIC, _VERSION, _SIZE, _REQUEST, _ACTION, _REPLY, _STATUS, _STATE,
+ _MESSAGE) = range(9)
+_HEADER = 16
+# Bytes reserved for the text of an error
+_MESSAGE_SIZE = 512
+
+# Requests
+EXCHANGE, COMMIT, BYE = 1, 2, 3
+
+# Worker states
+STARTING, SERVING, STOPPED = range(3)
+
+# Channels created in this process, by name
+_created = {}
+
+# Spin waits give up the CPU on every check so that workers and the
+# coordinator sharing cores still make progress
+_yield = getattr(os, 'sched_yield', lambda: time.sleep(0))
+# Sleep of an idle worker once it has stopped spinning
+_NAP = 5.0e-5
+
+# Interior systems up to this many equations are factorized densely
+DENSE_LIMIT = 64
+
+
+class Channel:
+    """
+    Views of the shared memory block between a coordinator and a worker.
+
+    Attributes:
+        header: int64 request/reply counters and flags (see the _* indices)
+        trial: trial interface displacements (written by the coordinator)
+        disp, force: interface response (written by the worker)
+    """
+
+    def __init__(self, shm, owner, shared=False):
+        self.shm = shm
+        self.owner = owner
+        self.shared = shared
+        self.name = shm.name
+        self.header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        if self.header[_MAGIC] != MAGIC:
+            raise ValueError(f'{shm.name}: not a substructure channel')
+        n = self.size = int(self.header[_SIZE])
+        values = np.ndarray((3, n), dtype=np.float64, buffer=shm.buf,
+                            offset=8*_HEADER)
+        self.trial, self.disp, self.force = values
+        self.message = shm.buf[8*(_HEADER + 3*n):
+                               8*(_HEADER + 3*n) + _MESSAGE_SIZE]
+
+    @classmethod
+    def create(cls, size, name=None):
+        if name is None:
+            name = f'ofp-sub-{os.getpid()}-{os.urandom(4).hex()}'
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=8*(_HEADER + 3*size) + _MESSAGE_SIZE)
+        header = np.ndarray((_HEADER,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_VERSION] = VERSION
+        header[_SIZE] = size
+        header[_MAGIC] = MAGIC
+        channel = cls(shm, owner=True)
+        _created[channel.name] = channel
+        return channel
+
+    @classmethod
+    def attach(cls, name, track=False):
+        """Attach to a channel (see monitor.SharedRing.attach for track)."""
+        channel = _created.get(name)
+        if channel is not None:
+            # Created in this process: share its mapping
+            return cls(channel.shm, owner=False, shared=True)
+        return cls(_attach(name, track), owner=False)
+
+    def set_error(self, text):
+        data = text.encode('utf-8')[:_MESSAGE_SIZE]
+        self.message[:len(data)] = data
+        self.header[_MESSAGE] = len(data)
+        self.header[_STATUS] = 1
+
+    def error(self):
+        """Return and clear the error text of the last request, or None."""
+        h = self.header
+        if not h[_STATUS]:
+            return None
+        text = bytes(self.message[:int(h[_MESSAGE])]).decode('utf-8',
+                                                              'replace')
+        h[_STATUS] = 0
+        return text
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.header = self.trial = self.disp = self.force = None
+        self.message.release()
+        self.message = None
+        if self.shared:
+            self.shm = None
+            return
+        try:
+            self.shm.close()
+        except BufferError:
+            # A site still holds views of the block; the mapping goes away
+            # with them
+            pass
+        if self.owner:
+            _created.pop(self.name, None)
+            self.shm.unlink()
+        self.shm = None
+
+
+def serve_shared(setup, name, spin=1.0e-3, track=False):
+    """
+    Serve an expSetup-like object on the channel `name` until BYE.
+
+    After a request the worker busy-waits for the next one for `spin`
+    seconds, yielding the CPU on every check, and then naps between checks
+    so an idle worker does not hold a core.
+    """
+    channel = Channel.attach(name, track)
+    h = channel.header
+    clock = time.perf_counter
+    served = int(h[_REPLY])
+    idle = clock()
+    count = 0
+    h[_STATE] = SERVING
+    try:
+        while True:
+            request = int(h[_REQUEST])
+            if request == served:
+                count += 1
+                if count & 63 == 0 and clock() - idle > spin:
+                    time.sleep(_NAP)
+                else:
+                    _yield()
+                continue
+            action = int(h[_ACTION])
+            try:
+                if action == EXCHANGE:
+                    setup.set_trial_response(channel.trial)
+                    disp, force = setup.get_daq_response()
+                    channel.disp[:] = disp
+                    channel.force[:] = force
+                elif action == COMMIT:
+                    commit = getattr(setup, 'commit', None)
+                    if commit is not None:
+                        commit()
+                elif action != BYE:
+                    raise ValueError(f'unknown request {action}')
+            except Exception as e:
+                channel.set_error(f'{type(e).__name__}: {e}')
+            # Written last: the coordinator reads the results after it
+            served = request
+            h[_REPLY] = request
+            if action == BYE:
+                break
+            idle = clock()
+            count = 0
+    finally:
+        h[_STATE] = STOPPED
+        channel.close()
+
+
+class SharedMemorySite:
+    """
+    Coordinator side of a channel, with the interface of an expSite.
+
+    set_trial_response() posts the trial displacements and returns at once;
+    get_daq_response() waits for the answer and returns views of the
+    channel, which are overwritten by the next exchange. Commits are not
+    waited for either: a failure is reported by the next call. A wait longer
+    than timeout seconds raises SiteError.
+    """
+
+    def __init__(self, name, tag=None, timeout=10.0):
+        self.tag = tag
+        self.channel = Channel.attach(name)
+        self.size_trial = self.size_out = self.channel.size
+        self.timeout = timeout
+
+    def _wait(self):
+        channel = self.channel
+        h = channel.header
+        clock = time.perf_counter
+        deadline = None
+        count = 0
+        while h[_REPLY] != h[_REQUEST]:
+            _yield()
+            count += 1
+            if count & 255 == 0:
+                now = clock()
+                if deadline is None:
+                    deadline = now + self.timeout
+                elif now > deadline:
+                    raise SiteError(f'expSite SharedMemorySite {self.tag}: '
+                                    f'no answer from {channel.name}')
+                if h[_STATE] == STOPPED:
+                    raise SiteError(f'expSite SharedMemorySite {self.tag}: '
+                                    f'the worker of {channel.name} has '
+                                    f'stopped')
+        error = channel.error()
+        if error is not None:
+            raise SiteError(error)
+
+    def _post(self, action):
+        h = self.channel.header
+        h[_ACTION] = action
+        h[_REQUEST] += 1
+
+    def set_trial_response(self, disp):
+        self._wait()
+        self.channel.trial[:] = disp
+        self._post(EXCHANGE)
+
+    def get_daq_response(self):
+        self._wait()
+        return self.channel.disp, self.channel.force
+
+    def commit(self):
+        self._wait()
+        self._post(COMMIT)
+
+    def close(self):
+        if self.channel is None:
+            return
+        try:
+            if self.channel.header[_STATE] != STOPPED:
+                self._wait()
+                self._post(BYE)
+                self._wait()
+        except SiteError:
+            pass
+        finally:
+            self.channel.close()
+            self.channel = None
+
+
+def _dense(A):
+    return A if isinstance(A, np.ndarray) else A.toarray()
+
+
+def _factorize(K):
+    """Return a function solving K x = r for a dense or sparse K."""
+    if isinstance(K, np.ndarray):
+        try:
+            inverse = np.linalg.inv(K)
+        except np.linalg.LinAlgError:
+            raise ValueError('the interior stiffness is singular') from None
+        return lambda r: inverse @ r
+    from scipy.sparse.linalg import splu
+    try:
+        lu = splu(K.tocsc())
+    except RuntimeError:
+        raise ValueError('the interior stiffness is singular') from None
+    return lu.solve
+
+
+class Subdomain:
+    """
+    expSetup-like view of the interface DOFs of the model in this process.
+
+    Args:
+        interface: [(node, dofs), ...] interface nodes and their 1-based
+            DOFs, in the order of the -node/-dof lists of the coordinator's
+            generic element; the DOFs must not be fixed
+        algorithm: 'Newton' iterates the interior with the current tangent,
+            'ModifiedNewton' with the initial stiffness, factorized once
+        tol: norm of the interior unbalance at which a trial has converged
+        max_iter: largest number of interior iterations per trial
+        ops: the openfrescopy.opensees module (default: imported)
+
+    set_trial_response() imposes the trial displacements on the interface
+    DOFs, moves the interior with them through the initially condensed
+    stiffness (-Kii^-1 Kib), which is exact for a linear substructure, and
+    iterates the interior to equilibrium; get_daq_response() returns the
+    interface displacements and the forces the substructure resists them
+    with (loads applied to the interface nodes subtracted). Loads are taken
+    at their value when the Subdomain is created. Needs the Python backend,
+    and SciPy, if available, for interiors larger than DENSE_LIMIT
+    equations.
+
+    Attributes:
+        size, size_trial, size_out: number of interface DOFs
+        iterations: interior iterations so far
+    """
+
+    def __init__(self, interface, algorithm='Newton', tol=1.0e-8,
+                 max_iter=25, ops=None):
+        if algorithm not in ('Newton', 'ModifiedNewton'):
+            raise ValueError(f"algorithm must be 'Newton' or "
+                             f"'ModifiedNewton', not {algorithm!r}")
+        if ops is None:
+            from . import opensees as ops
+        if ops.backend() != 'python':
+            raise RuntimeError('Subdomain needs the Python backend; the '
+                               'native interpreter does not expose its '
+                               'domain')
+        from .pysim._commands import _session
+        d = self.domain = _session.require_domain()
+        d.build()
+        flat = []
+        for node, dofs in interface:
+            i = d.node(int(node))
+            for dof in dofs:
+                if not 1 <= int(dof) <= d.ndf:
+                    raise ValueError(f'node {node}: dof {dof} out of range')
+                if d.eq[i, int(dof) - 1] < 0:
+                    raise ValueError(f'node {node}: dof {dof} is fixed in '
+                                     f'the substructure')
+                flat.append(i*d.ndf + int(dof) - 1)
+        if len(set(flat)) != len(flat):
+            raise ValueError('an interface DOF is listed twice')
+        self.interface = [(int(n), [int(x) for x in dofs])
+                          for n, dofs in interface]
+        self.size = self.size_trial = self.size_out = len(flat)
+        eq = d.eq.reshape(-1)
+        self._eq_b = eq[flat]
+        self._eq_i = np.setdiff1d(np.arange(d.neq), self._eq_b)
+        # Flat indices into the (n_nodes, ndf) nodal arrays
+        self._b = np.array(flat, dtype=np.intp)
+        self._i = d.free[self._eq_i]
+        self.algorithm = algorithm
+        self.tol = tol
+        self.max_iter = int(max_iter)
+        self.iterations = 0
+        d.update()
+        self._load = d.load(d.time).reshape(-1).copy()
+        self._load_i = self._load[self._i]
+        self._force = d.resisting_force().reshape(-1)
+        self._disp = np.zeros(self.size)
+        self._out = np.zeros(self.size)
+        self._solve = None
+        if len(self._i):
+            self._solve, self._modes = self._condense('initial')
+
+    def _matrix(self, which):
+        d = self.domain
+        n = d.neq
+        rows, cols, vals = d.stiffness_triplets(which)
+        sparse = None
+        if len(self._i) > DENSE_LIMIT:
+            try:
+                from scipy import sparse
+            except ImportError:
+                pass
+        if sparse is None:
+            K = np.zeros((n, n))
+            np.add.at(K, (rows, cols), vals)
+            return K
+        # Duplicate entries are summed by the conversion
+        return sparse.csr_matrix((vals, (rows, cols)), shape=(n, n))
+
+    def _condense(self, which, modes=True):
+        """
+        Factorize Kii; return the solver and, if modes, the interior
+        displacements -Kii^-1 Kib due to unit interface displacements.
+        """
+        K = self._matrix(which)
+        i = self._eq_i
+        solve = _factorize(K[i][:, i])
+        if not modes:
+            return solve, None
+        return solve, -solve(_dense(K[i][:, self._eq_b]))
+
+    def stiffness(self, which='initial'):
+        """
+        Return the (size, size) stiffness of the substructure condensed to
+        its interface DOFs: Kbb - Kbi Kii^-1 Kib.
+        """
+        K = self._matrix(which)
+        b, i = self._eq_b, self._eq_i
+        Kbb = _dense(K[b][:, b])
+        if not len(i):
+            return Kbb
+        modes = self._modes if which == 'initial' else self._condense(which)[1]
+        return Kbb + _dense(K[b][:, i] @ modes)
+
+    def set_trial_response(self, disp):
+        d = self.domain
+        U = d.U.reshape(-1)
+        solve = self._solve
+        if solve is not None:
+            U[self._i] += self._modes @ (disp - U[self._b])
+        U[self._b] = disp
+        for iteration in range(self.max_iter + 1):
+            d.update()
+            F = d.resisting_force().reshape(-1)
+            if solve is None:
+                break
+            r = self._load_i - F[self._i]
+            if np.sqrt(r @ r) <= self.tol:
+                break
+            if iteration == self.max_iter:
+                raise RuntimeError(f'the interior did not converge in '
+                                   f'{self.max_iter} iterations (unbalance '
+                                   f'{np.sqrt(r @ r):.3e})')
+            if self.algorithm == 'Newton':
+                solve = self._condense('current', modes=False)[0]
+            U[self._i] += solve(r)
+            self.iterations += 1
+        self._force = F
+
+    def get_daq_response(self):
+        self._disp[:] = self.domain.U.reshape(-1)[self._b]
+        self._out[:] = self._force[self._b] - self._load[self._b]
+        return self._disp, self._out
+
+    def commit(self):
+        self.domain.commit()
+
+
+def _worker(conn, build, build_args, interface, transport, options, spin):
+    """Entry point of a substructure process."""
+    from . import opensees as ops
+    try:
+        build(ops, *build_args)
+        setup = Subdomain(interface, ops=ops, **options)
+        info = {'size': setup.size, 'stiffness': setup.stiffness()}
+        if transport == 'socket':
+            server = SiteServer(setup)
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(server.start())
+                info['address'] = server.address
+                conn.send(('ready', info))
+                # Until the coordinator's site disconnects (wipeExp)
+                loop.run_until_complete(server.serve_once())
+            finally:
+                loop.close()
+        else:
+            conn.send(('ready', info))
+            kind, name = conn.recv()
+            if kind == 'channel':
+                serve_shared(setup, name, spin, track=True)
+    except BaseException as e:
+        conn.send(('error', f'{type(e).__name__}: {e}'))
+    finally:
+        conn.close()
+
+
+class Substructure:
+    """
+    A worker process that builds one substructure and serves its interface.
+
+    Args:
+        build: function(ops, *build_args) that builds the substructure in
+            the worker (must be picklable, e.g. a module-level function)
+        interface: [(node, dofs), ...] interface DOFs (see Subdomain)
+        build_args: extra arguments of build
+        transport: 'socket' (a SiteServer on the loopback interface) or
+            'shm' (a shared-memory channel)
+        algorithm, tol, max_iter: interior iteration options (see
+            Subdomain)
+        spin: seconds an 'shm' worker busy-waits for the next request
+        name: shared memory name of the channel (default: generated)
+        mp_context: multiprocessing start method
+
+    Attributes (after start()):
+        size: number of interface DOFs
+        stiffness: (size, size) initial stiffness condensed to the interface
+        address: (host, port) of the worker's SiteServer ('socket')
+        name: name of the channel ('shm')
+    """
+
+    def __init__(self, build, interface, build_args=(), transport='socket',
+                 algorithm='Newton', tol=1.0e-8, max_iter=25, spin=1.0e-3,
+                 name=None, mp_context=None):
+        if transport not in ('socket', 'shm'):
+            raise ValueError(f"transport must be 'socket' or 'shm', not "
+                             f"{transport!r}")
+        self.build = build
+        self.interface = [(int(n), [int(d) for d in dofs])
+                          for n, dofs in interface]
+        self.build_args = tuple(build_args)
+        self.transport = transport
+        self.options = dict(algorithm=algorithm, tol=tol,
+                            max_iter=max_iter)
+        self.spin = spin
+        self._name = name
+        self._mp_context = mp_context
+        self.size = None
+        self.stiffness = None
+        self.address = None
+        self.channel = None
+        self.process = None
+        self._conn = None
+
+    @property
+    def name(self):
+        return None if self.channel is None else self.channel.name
+
+    def _launch(self):
+        if self.process is not None:
+            raise RuntimeError('the substructure has already been started')
+        if self.transport == 'shm':
+            # The channel is created after the worker has started; with the
+            # resource tracker already running, the worker shares it
+            resource_tracker.ensure_running()
+        ctx = multiprocessing.get_context(self._mp_context)
+        self._conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker, daemon=True, name='openfrescopy-substructure',
+            args=(child, self.build, self.build_args, self.interface,
+                  self.transport, self.options, self.spin))
+        self.process.start()
+        child.close()
+
+    def _ready(self):
+        try:
+            kind, value = self._conn.recv()
+        except EOFError:
+            kind, value = 'error', 'the substructure process exited'
+        if kind == 'error':
+            self.close()
+            raise RuntimeError(f'building the substructure failed: {value}')
+        self.size = value['size']
+        self.stiffness = value['stiffness']
+        if self.transport == 'socket':
+            self.address = tuple(value['address'])
+        else:
+            self.channel = Channel.create(self.size, self._name)
+            self._conn.send(('channel', self.channel.name))
+        return self
+
+    def start(self):
+        """Start the worker and wait until its substructure is built."""
+        self._launch()
+        return self._ready()
+
+    def site_args(self, tag):
+        """expSite arguments that connect to this worker."""
+        if self.transport == 'socket':
+            host, port = self.address
+            return ('RemoteSite', tag, host, port, '-pipeline')
+        return ('SharedMemorySite', tag, self.name)
+
+    def element_args(self):
+        """
+        The -node, -dof and -initStif arguments of the coordinator's
+        expElement('generic', ...) for this substructure.
+        """
+        args = ['-node'] + [node for node, _ in self.interface]
+        for _, dofs in self.interface:
+            args += ['-dof'] + dofs
+        return args + ['-initStif'] + self.stiffness.ravel().tolist()
+
+    def _stop(self):
+        """Ask a worker that is still serving to finish."""
+        if self.channel is not None:
+            h = self.channel.header
+            if h[_STATE] != STOPPED:
+                h[_ACTION] = BYE
+                h[_REQUEST] += 1
+        elif self.address is not None:
+            # serve_once() returns when a client disconnects
+            try:
+                socket.create_connection(self.address, 1.0).close()
+            except OSError:
+                pass
+
+    def close(self, timeout=5.0):
+        """
+        Stop the worker and remove the channel.
+
+        The worker normally ends when the coordinator's site disconnects
+        (wipeExp()); one still serving is asked to finish, and terminated
+        if it has not after timeout seconds.
+        """
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.join(0.05)
+            if self.process.is_alive():
+                self._stop()
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def start_all(substructures):
+    """Start several substructures, building them at the same time."""
+    for sub in substructures:
+        sub._launch()
+    error = None
+    for sub in substructures:
+        try:
+            sub._ready()
+        except RuntimeError as e:
+            error = error or e
+    if error is not None:
+        for sub in substructures:
+            sub.close(timeout=0.0)
+        raise error
+    return substructures
+
+
+def couple(substructures, tag=1, ops=None):
+    """
+    Add a site and a generic element per substructure to the coordinator
+    model; both are numbered from `tag`. Returns the tags used.
+    """
+    if ops is None:
+        from . import opensees as ops
+    tags = []
+    for k, sub in enumerate(substructures):
+        t = tag + k
+        ops.expSite(*sub.site_args(t))
+        ops.expElement('generic', t, *sub.element_args(), '-site', t)
+        tags.append(t)
+    return tags